@@ -0,0 +1 @@
+import admission.controller
\ No newline at end of file
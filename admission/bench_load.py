@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from typing import Optional
+
+# Load test for the streaming /stocks_info endpoint: finds the concurrency at
+# which throughput stops growing and shows time-to-first-byte (TTFB) and
+# 429/503 refusals under load.
+# Everything runs in this process, without Ollama or Weaviate:
+# - a mock Ollama server (/api/chat) answers the query optimizer and answer
+#   LLM calls with a simple latency model: at most --ollama-parallel
+#   generations at once (like OLLAMA_NUM_PARALLEL, the rest wait), --prefill-ms
+#   before the first token, then --tokens-per-second
+# - the API app (endpoints.chat) with admission control, retrieving from a
+#   synthetic corpus held by weaviate_database.local_hybrid_store.LocalClientPool
+#   (Weaviate's gRPC API is not practical to mock, so the stand-in takes the
+#   client pool's place)
+# A closed loop of N concurrent clients (unique queries, --clients distinct
+# X-Client-ID values) is run for --duration seconds per concurrency level.
+# Admission limits come from the settings as usual (ADMISSION_* / STAGE_LIMIT_*
+# environment variables or the settings file), or the flags below.
+# p3 -m admission.bench_load --levels 1,2,4,8,16,32,64 --duration 15
+# p3 -m admission.bench_load --max-in-flight 4 --max-queue 8 --ollama-parallel 2
+
+ANSWER_TEXT = (
+    "Based on the holdings data, the portfolio management services listed above hold this stock "
+    "with the quantities and market values shown. The largest position by market value is in the "
+    "first row, and the share of assets under management stays below five percent for most of them."
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def create_mock_ollama(parallel: int, prefill_ms: float, tokens_per_second: float, answer_tokens: int):
+    """
+    Builds a FastAPI app speaking enough of Ollama's /api/chat for ChatOllama:
+    NDJSON chunks when "stream" is true, one JSON response otherwise.
+    Replies depend on the system prompt: the query classifier gets "rewrite",
+    the query transformers echo the query, the one-shot optimizer gets its JSON,
+    and anything else (the answer LLM) gets `answer_tokens` words of ANSWER_TEXT.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from prompts.query_prompt import QUERY_CLASSIFIER_PROPMT, QUERY_CLASSIFY_AND_TRANSFORM_PROMPT, QUERY_TRANS_PROMPT
+
+    app = FastAPI()
+    slots = asyncio.Semaphore(parallel)
+    words = ANSWER_TEXT.split()
+    answer = [f"{words[i % len(words)]} " for i in range(answer_tokens)]
+    stats = {"requests": 0, "active": 0, "peak_active": 0}
+
+    def reply_tokens(messages: list[dict]) -> list[str]:
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if system == QUERY_CLASSIFIER_PROPMT:
+            return ["rewrite"]
+        if system in QUERY_TRANS_PROMPT.values():
+            return [user]
+        if system == QUERY_CLASSIFY_AND_TRANSFORM_PROMPT:
+            return [json.dumps({"query_class": "rewrite", "optimized_query": user})]
+        return answer
+
+    def chunk(model: str, content: str, done: bool, eval_count: int = 0) -> dict:
+        body = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content}, "done": done}
+        if done:
+            body.update(done_reason="stop", prompt_eval_count=1, eval_count=eval_count)
+        return body
+
+    async def generate(tokens: list[str]):
+        # Holds one of the `parallel` slots from prefill until the last token
+        async with slots:
+            stats["active"] += 1
+            stats["peak_active"] = max(stats["peak_active"], stats["active"])
+            try:
+                await asyncio.sleep(prefill_ms / 1000)
+                for token in tokens:
+                    yield token
+                    await asyncio.sleep(1 / tokens_per_second)
+            finally:
+                stats["active"] -= 1
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        model = body.get("model", "mock")
+        tokens = reply_tokens(body.get("messages", []))
+        if not body.get("stream", True):
+            content = "".join([token async for token in generate(tokens)])
+            return JSONResponse(chunk(model, content, True, len(tokens)))
+
+        async def stream():
+            async for token in generate(tokens):
+                yield json.dumps(chunk(model, token, False)) + "\n"
+            yield json.dumps(chunk(model, "", True, len(tokens))) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/api/stats")
+    async def mock_stats():
+        return stats
+
+    return app
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn in a background thread (own event loop)."""
+    def __init__(self, app, port: int):
+        import uvicorn
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+async def run_level(url: str, concurrency: int, duration: float, queries: itertools.cycle, clients: int,
+                    request_body: dict, retry_pause: float, timeout: float) -> dict:
+    """
+    Closed-loop load: `concurrency` workers each send a request, read the
+    streamed answer to the end and send the next one, for `duration` seconds.
+    Refused workers wait `retry_pause` seconds before trying again.
+    """
+    import httpx
+
+    results: list[tuple[str, Optional[float], float]] = []
+    stop_at = time.perf_counter() + duration
+
+    async def worker(worker_id: int, http: httpx.AsyncClient) -> None:
+        headers = {"X-Client-ID": f"client-{worker_id % clients}"}
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            first_byte = None
+            try:
+                async with http.stream("POST", url, json={**request_body, "message": next(queries)},
+                                       headers=headers) as response:
+                    async for data in response.aiter_raw():
+                        if first_byte is None and data:
+                            first_byte = time.perf_counter() - start
+                    status = str(response.status_code)
+            except httpx.HTTPError:
+                status = "error"
+            results.append((status, first_byte, time.perf_counter() - start))
+            if status != "200":
+                await asyncio.sleep(retry_pause)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        await asyncio.gather(*(worker(i, http) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = [(ttfb, total) for status, ttfb, total in results if status == "200" and ttfb is not None]
+    ttfbs = [ttfb * 1000 for ttfb, _ in ok]
+    totals = [total * 1000 for _, total in ok]
+    statuses = [status for status, _, _ in results]
+
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 1) if value is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "429": statuses.count("429"),
+        "503": statuses.count("503"),
+        "errors": len(results) - len(ok) - statuses.count("429") - statuses.count("503"),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "ttfb_p50_ms": rounded(percentile(ttfbs, 50)),
+        "ttfb_p95_ms": rounded(percentile(ttfbs, 95)),
+        "ttfb_p99_ms": rounded(percentile(ttfbs, 99)),
+        "total_p50_ms": rounded(percentile(totals, 50)),
+        "total_p95_ms": rounded(percentile(totals, 95)),
+        "mean_total_ms": rounded(statistics.mean(totals)) if totals else None,
+    }
+
+
+def saturation_point(results: list[dict], share: float = 0.95) -> Optional[int]:
+    """Lowest concurrency reaching `share` of the best throughput; more load only adds latency."""
+    best = max((result["throughput_rps"] for result in results), default=0)
+    if not best:
+        return None
+    return next(result["concurrency"] for result in results if result["throughput_rps"] >= share * best)
+
+
+async def fetch_json(url: str) -> dict:
+    import httpx
+    async with httpx.AsyncClient(timeout=10) as http:
+        response = await http.get(url)
+        return response.json()
+
+
+def run_load_test(args: argparse.Namespace) -> list[dict]:
+    ollama_port = args.ollama_port or free_port()
+    api_port = args.api_port or free_port()
+
+    # The app reads these at import time, so set them before importing it
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{ollama_port}"
+    os.environ["EMBEDDING_MODE"] = "server"
+    if not args.cache:
+        os.environ["QUERY_CACHE_ENABLED"] = "0"
+    # Entity filters use a vocabulary of the synthetic corpus, written below
+    vocab_file = os.path.join(tempfile.mkdtemp(prefix="bench_load_"), "entity_vocabulary.json")
+    os.environ["ENTITY_VOCAB_PATH"] = vocab_file
+    overrides = {"ADMISSION_MAX_IN_FLIGHT": args.max_in_flight, "ADMISSION_MAX_QUEUE": args.max_queue,
+                 "ADMISSION_MAX_PER_CLIENT": args.max_per_client, "ADMISSION_QUEUE_TIMEOUT": args.queue_timeout,
+                 "STAGE_LIMIT_LLM": args.llm_limit, "STAGE_LIMIT_QUERY_OPTIMIZER": args.optimizer_limit,
+                 "STAGE_LIMIT_RETRIEVAL": args.retrieval_limit}
+    for env_name, value in overrides.items():
+        if value is not None:
+            os.environ[env_name] = str(value)
+
+    # The logger is already set up (the admission package imports it); only adjust its level
+    from debug.logger_config import dbg
+    dbg.setLevel(args.log_level)
+
+    from data_process.entity_vocabulary import EntityVocabulary
+    from data_process.synthetic_corpus import generate_corpus, generate_queries
+
+    start = time.perf_counter()
+    corpus = generate_corpus(args.rows, seed=args.seed)
+    EntityVocabulary.from_rows(corpus).save(vocab_file)
+
+    import weaviate_database.db_collection as ds
+    from admission.controller import get_admission_controller
+    from endpoints.chat import app
+    from weaviate_database.local_hybrid_store import LocalClientPool, LocalHybridCollection
+
+    # Serves retrieval for the API's lifespan (init_db_pool keeps an existing pool)
+    ds.db_pool = LocalClientPool([LocalHybridCollection(corpus)], size=ds.DB_POOL_SIZE,
+                                 latency=args.db_latency_ms / 1000)
+    levels = [int(level) for level in args.levels.split(",") if level]
+    # Queries cycle through a large distinct set and caches are off by default, so caching does not hide the load
+    queries = [q["query"] for q in generate_queries(corpus, args.queries, seed=args.seed + 1)]
+    query_cycle = itertools.cycle(queries)
+    request_body = {key: value for key, value in (("optimizer_mode", args.optimizer_mode),
+                                                  ("search_profile", args.search_profile)) if value}
+    print(f"\n========== Load test: {len(corpus)} rows, levels {levels}, {args.duration:g} s per level ==========")
+    print(f"Corpus generated and indexed in {time.perf_counter() - start:.1f} s")
+    print(f"Mock Ollama: {args.ollama_parallel} parallel, prefill {args.prefill_ms:g} ms, "
+          f"{args.tokens_per_second:g} tokens/s, {args.answer_tokens} answer tokens")
+    print(f"Admission: {get_admission_controller().stats()['limits']}")
+
+    mock_ollama = create_mock_ollama(args.ollama_parallel, args.prefill_ms, args.tokens_per_second, args.answer_tokens)
+    results = []
+    with ServerThread(mock_ollama, ollama_port), ServerThread(app, api_port):
+        base_url = f"http://127.0.0.1:{api_port}"
+        print(f"\n{'conc':>5} {'reqs':>6} {'ok':>6} {'429':>5} {'503':>5} {'err':>4} {'ok/s':>7} "
+              f"{'ttfb p50':>9} {'p95':>8} {'p99':>8} {'total p50':>10} {'p95':>8}")
+        for level in levels:
+            result = asyncio.run(run_level(f"{base_url}/stocks_info", level, args.duration, query_cycle,
+                                           args.clients or level, request_body, args.retry_pause, args.timeout))
+            results.append(result)
+
+            def ms(key: str) -> str:
+                return "-" if result[key] is None else f"{result[key]:.0f}"
+            print(f"{level:5d} {result['requests']:6d} {result['ok']:6d} {result['429']:5d} {result['503']:5d} "
+                  f"{result['errors']:4d} {result['throughput_rps']:7.2f} {ms('ttfb_p50_ms'):>9} "
+                  f"{ms('ttfb_p95_ms'):>8} {ms('ttfb_p99_ms'):>8} {ms('total_p50_ms'):>10} {ms('total_p95_ms'):>8}")
+        server_stats = asyncio.run(fetch_json(f"{base_url}/admission_stats"))
+        ollama_stats = asyncio.run(fetch_json(f"http://127.0.0.1:{ollama_port}/api/stats"))
+
+    saturation = saturation_point(results)
+    print(f"\nSaturation point: {saturation} concurrent clients "
+          f"(>= 95% of the best {max(r['throughput_rps'] for r in results):.2f} ok/s)" if saturation
+          else "\nNo successful requests; no saturation point")
+    print(f"Server admission: {json.dumps(server_stats['requests'])}")
+    print(f"Server stages: {json.dumps(server_stats['stages'])}")
+    print(f"Mock Ollama: {ollama_stats['requests']} calls, peak {ollama_stats['peak_active']} generating at once")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of /stocks_info against a mock Ollama and a local retrieval stand-in")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--clients", type=int, help="distinct X-Client-ID values (default: one per worker)")
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=5_000, help="distinct queries to cycle through")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--optimizer-mode", choices=["two_step", "one_shot"])
+    parser.add_argument("--search-profile")
+    parser.add_argument("--cache", action="store_true", help="keep the query/context caches enabled")
+    parser.add_argument("--retry-pause", type=float, default=0.25, help="seconds a refused client waits")
+    parser.add_argument("--timeout", type=float, default=120, help="client request timeout (seconds)")
+    # Mock backends
+    parser.add_argument("--ollama-parallel", type=int, default=4, help="generations the mock Ollama runs at once")
+    parser.add_argument("--prefill-ms", type=float, default=150, help="mock Ollama delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="mock Ollama generation speed")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="tokens per streamed answer")
+    parser.add_argument("--db-latency-ms", type=float, default=5, help="added to every hybrid query")
+    parser.add_argument("--ollama-port", type=int)
+    parser.add_argument("--api-port", type=int)
+    # Admission settings (default: from the settings)
+    parser.add_argument("--max-in-flight", type=int)
+    parser.add_argument("--max-queue", type=int)
+    parser.add_argument("--max-per-client", type=int)
+    parser.add_argument("--queue-timeout", type=float)
+    parser.add_argument("--llm-limit", type=int, help="concurrent LLM calls (stage_limits.llm)")
+    parser.add_argument("--optimizer-limit", type=int,
+                        help="concurrent query optimizer LLM calls (stage_limits.query_optimizer)")
+    parser.add_argument("--retrieval-limit", type=int, help="concurrent retrievals (stage_limits.retrieval)")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the test")
+    parser.add_argument("--output", help="write the per-level results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run_load_test(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
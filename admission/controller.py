@@ -0,0 +1,204 @@
+import asyncio
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from config.settings import get_settings
+from debug.logger_config import dbg
+from debug.metrics import observe_stage_latency
+
+# Backpressure for the streaming /stocks_info endpoint, which otherwise starts
+# LLM and vector DB work for every request against a single Ollama instance.
+# - AdmissionController: at most max_in_flight requests run at once; up to
+#   max_queue more wait (fairly, round-robin across clients) for queue_timeout
+#   seconds. Beyond that requests are refused with 503, and a client with more
+#   than max_per_client requests in flight or waiting gets 429.
+# - stage_slot: caps concurrent calls of one pipeline stage ("llm",
+#   "query_optimizer", "retrieval") across all admitted requests.
+# Limits come from the "admission" and "stage_limits" settings (config.settings)
+# and are read when the controller / stage semaphore is first used.
+
+
+class AdmissionRejected(Exception):
+    """A request was refused; status_code is 429 (client over its share) or 503 (server busy)."""
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admits requests up to max_in_flight and queues the rest with per-client
+    fairness: when a slot frees up it goes to the next client in round-robin
+    order (FIFO within a client), so one busy client cannot starve the others.
+    Not thread-safe; used from the server's event loop.
+    """
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32, max_per_client: int = 4,
+                 queue_timeout: float = 10.0, retry_after: int = 2):
+        if max_in_flight <= 0 or max_queue < 0 or max_per_client <= 0:
+            raise ValueError("Admission limits must be positive")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self._per_client: Counter[str] = Counter()
+        # Waiting requests per client; dict order is the round-robin order
+        self._waiting: dict[str, deque[asyncio.Future]] = {}
+        self.admitted = self.rejected_client = self.rejected_busy = self.timed_out = 0
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        if status_code == 429:
+            self.rejected_client += 1
+        else:
+            self.rejected_busy += 1
+        dbg.warning("Request refused (%d): %s", status_code, reason)
+        return AdmissionRejected(status_code, reason, self.retry_after)
+
+    async def acquire(self, client_id: str) -> None:
+        """
+        Waits for a processing slot. Raises AdmissionRejected when the client has
+        too many requests, the queue is full, or no slot frees up within queue_timeout.
+        Every successful acquire must be paired with release(client_id).
+        """
+        if self._per_client[client_id] >= self.max_per_client:
+            raise self._reject(429, f"Too many concurrent requests from client '{client_id}'")
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self._per_client[client_id] += 1
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue:
+            raise self._reject(503, "Server busy, request queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._waiting.setdefault(client_id, deque())
+        queue.append(future)
+        self.queued += 1
+        self._per_client[client_id] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(client_id, future)
+            self.timed_out += 1
+            raise self._reject(503, f"Server busy, no slot within {self.queue_timeout:g}s")
+        except asyncio.CancelledError:
+            # Client went away while waiting; hand back a slot that was granted meanwhile
+            if future.done() and not future.cancelled():
+                self.release(client_id)
+            else:
+                self._forget(client_id, future)
+            raise
+        observe_stage_latency("admission_wait", time.perf_counter() - start)
+        self.admitted += 1
+
+    def _forget(self, client_id: str, future: asyncio.Future) -> None:
+        queue = self._waiting.get(client_id)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.queued -= 1
+            if not queue:
+                del self._waiting[client_id]
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+
+    def release(self, client_id: str) -> None:
+        """Frees the slot of a finished request and grants it to the next waiting client."""
+        self.in_flight -= 1
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+        while self._waiting and self.in_flight < self.max_in_flight:
+            client = next(iter(self._waiting))
+            queue = self._waiting.pop(client)
+            future = queue.popleft()
+            if queue:
+                self._waiting[client] = queue  # back of the round-robin order
+            self.queued -= 1
+            if future.done():  # timed out or cancelled, its waiter cleans up the client count
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, client_id: str) -> AsyncIterator[None]:
+        await self.acquire(client_id)
+        try:
+            yield
+        finally:
+            self.release(client_id)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "clients": len(self._per_client),
+            "admitted": self.admitted,
+            "rejected_client": self.rejected_client,
+            "rejected_busy": self.rejected_busy,
+            "timed_out": self.timed_out,
+            "limits": {"max_in_flight": self.max_in_flight, "max_queue": self.max_queue,
+                       "max_per_client": self.max_per_client, "queue_timeout": self.queue_timeout},
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """Returns the process-wide controller, created from the "admission" settings on first use."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(**get_settings().values["admission"])
+    return _controller
+
+
+# Stage semaphores per stage, bound to the event loop that created them
+_stage_semaphores: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+# Waits for a stage slot that gave up after their timeout, per stage
+_stage_wait_timeouts: Counter = Counter()
+
+@asynccontextmanager
+async def stage_slot(stage: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+    """
+    Holds one of the stage's concurrency slots (stage_limits setting) for the
+    duration of the block; time spent waiting is recorded as "<stage>_wait".
+    Raises asyncio.TimeoutError (counted as the stage's wait_timeouts) if no
+    slot frees up within `timeout` seconds.
+    """
+    limit = get_settings().values["stage_limits"].get(stage, 0)
+    if not limit:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    entry = _stage_semaphores.get(stage)
+    if entry is None or entry[0] is not loop:
+        entry = _stage_semaphores[stage] = (loop, asyncio.Semaphore(limit))
+    semaphore = entry[1]
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _stage_wait_timeouts[stage] += 1
+        raise
+    observe_stage_latency(f"{stage}_wait", time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def stage_stats() -> dict[str, dict]:
+    limits = get_settings().values["stage_limits"]
+    return {
+        stage: {"limit": limit,
+                "available": _stage_semaphores[stage][1]._value if stage in _stage_semaphores else limit,
+                "wait_timeouts": _stage_wait_timeouts[stage]}
+        for stage, limit in limits.items()
+    }
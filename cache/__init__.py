@@ -0,0 +1 @@
+import cache.semantic_cache
\ No newline at end of file
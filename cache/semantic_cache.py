@@ -0,0 +1,236 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import numpy as np
+from langchain_ollama import OllamaEmbeddings
+
+from debug.logger_config import dbg
+
+QUERY_CACHE_ENABLED = os.environ.get("QUERY_CACHE_ENABLED", "1") == "1"
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "600"))
+QUERY_CACHE_MAX_SIZE = int(os.environ.get("QUERY_CACHE_MAX_SIZE", "1024"))
+# Optional embedding-similarity tier, off by default since it costs one embedding call per lookup
+QUERY_CACHE_SEMANTIC = os.environ.get("QUERY_CACHE_SEMANTIC", "0") == "1"
+QUERY_CACHE_SIMILARITY = float(os.environ.get("QUERY_CACHE_SIMILARITY", "0.95"))
+
+# Ingestion runs in a separate process from the API server, so collection changes are
+# signalled through a per-collection marker file whose mtime acts as a version number.
+CACHE_VERSION_DIR = os.environ.get("CACHE_VERSION_DIR", os.path.join(os.path.expanduser("~"), "var_cache"))
+
+EmbedFn = Callable[[str], Awaitable[list[float]]]
+
+_SPACES_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?.!]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases a query and collapses whitespace and trailing punctuation for cache keys."""
+    return _TRAILING_PUNCT_RE.sub("", _SPACES_RE.sub(" ", query.strip().lower()))
+
+
+def _version_file(collection_name: str) -> str:
+    return os.path.join(CACHE_VERSION_DIR, f"{collection_name}.version")
+
+
+def collection_version(collection_name: str) -> int:
+    """Returns the current cache version of a collection (0 if it was never bumped)."""
+    try:
+        return os.stat(_version_file(collection_name)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def bump_collection_version(collection_name: str) -> None:
+    """
+    Marks a collection as changed, invalidating cached entries derived from it
+    in every process that shares CACHE_VERSION_DIR.
+    """
+    os.makedirs(CACHE_VERSION_DIR, exist_ok=True)
+    path = _version_file(collection_name)
+    with open(path, "a", encoding="utf-8"):
+        pass
+    now_ns = time.time_ns()
+    os.utime(path, ns=(now_ns, now_ns))
+    dbg.info("Cache version bumped for collection '%s'", collection_name)
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire `ttl` seconds after insertion.
+    """
+    def __init__(self, max_size: int = QUERY_CACHE_MAX_SIZE, ttl: float = QUERY_CACHE_TTL):
+        if max_size <= 0:
+            raise ValueError("Cache size must be a positive integer")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> list[Hashable]:
+        """Stores a value and returns the keys evicted to make room for it."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_size:
+            old_key, _ = self._entries.popitem(last=False)
+            evicted.append(old_key)
+        return evicted
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SemanticCache:
+    """
+    Two-tier query cache tied to a Weaviate collection.
+
+    1. Exact tier: TTL + LRU cache keyed on (namespace, normalized query).
+    2. Optional similarity tier: if no exact entry exists, the query is embedded
+       and the closest cached query in the same namespace is reused when its
+       cosine similarity is at least `similarity_threshold`.
+
+    Entries remember the collection version they were computed against and are
+    dropped once the collection is re-ingested (see bump_collection_version).
+    """
+    def __init__(
+        self,
+        name: str,
+        collection_name: str,
+        max_size: int = QUERY_CACHE_MAX_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+        semantic: bool = QUERY_CACHE_SEMANTIC,
+        similarity_threshold: float = QUERY_CACHE_SIMILARITY,
+        embed_fn: Optional[EmbedFn] = None,
+    ):
+        self.name = name
+        self.collection_name = collection_name
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._entries = TTLCache(max_size=max_size, ttl=ttl)
+        self._vectors: dict[tuple[str, str], np.ndarray] = {}
+        self._recent_embeddings = TTLCache(max_size=256, ttl=ttl)
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.semantic_hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.semantic_hits) / total, 4) if total else 0.0,
+        }
+
+    def _get_valid(self, key: tuple[str, str], version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._vectors.pop(key, None)
+            return None
+        entry_version, value = entry
+        if entry_version != version:
+            self._entries.pop(key)
+            self._vectors.pop(key, None)
+            return None
+        return value
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            self.embed_fn = default_embed_fn()
+        vector = self._recent_embeddings.get(text)
+        if vector is None:
+            try:
+                vector = np.asarray(await self.embed_fn(text), dtype=np.float32)
+            except Exception as e:
+                dbg.warning("Cache '%s': embedding failed, similarity tier skipped: %s", self.name, e)
+                return None
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else vector
+            self._recent_embeddings.set(text, vector)
+        return vector
+
+    async def get(self, query: str, namespace: str = "") -> Optional[Any]:
+        """
+        Returns the cached value for a query, or None on a miss.
+        """
+        if not QUERY_CACHE_ENABLED:
+            return None
+        version = collection_version(self.collection_name)
+        key = (namespace, normalize_query(query))
+        value = self._get_valid(key, version)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.semantic:
+            candidates = [k for k in self._vectors if k[0] == namespace]
+            vector = await self._embed(key[1]) if candidates else None
+            if vector is not None:
+                matrix = np.vstack([self._vectors[k] for k in candidates])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    value = self._get_valid(candidates[best], version)
+                    if value is not None:
+                        self.semantic_hits += 1
+                        dbg.debug("Cache '%s': '%s' matched '%s' (similarity %.3f)",
+                                  self.name, query, candidates[best][1], similarities[best])
+                        return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, query: str, value: Any, namespace: str = "") -> None:
+        """
+        Caches a value for a query under the current collection version.
+        """
+        if not QUERY_CACHE_ENABLED:
+            return
+        key = (namespace, normalize_query(query))
+        evicted = self._entries.set(key, (collection_version(self.collection_name), value))
+        for old_key in evicted:
+            self._vectors.pop(old_key, None)
+        if self.semantic:
+            vector = await self._embed(key[1])
+            if vector is not None:
+                self._vectors[key] = vector
+
+
+def default_embed_fn() -> EmbedFn:
+    """
+    Embeds cache keys with the same Ollama model the collection is vectorized with.
+    """
+    embeddings = OllamaEmbeddings(
+        model=os.environ.get("QUERY_CACHE_EMBEDDING_MODEL", "nomic-embed-text:latest"),
+        base_url=os.environ.get("QUERY_CACHE_OLLAMA_URL", "http://localhost:11434"),
+    )
+    return embeddings.aembed_query
@@ -0,0 +1 @@
+import config.settings
\ No newline at end of file
@@ -0,0 +1,255 @@
+import copy
+import json
+import os
+import tomllib
+from typing import Any, Optional
+
+from debug.logger_config import dbg
+
+# Central settings for the Weaviate connection and retrieval.
+# Values come from, in increasing priority: DEFAULT_SETTINGS below, a TOML or
+# JSON file named by ANALYST_SETTINGS_FILE, and individual environment variables.
+# The file is re-read when it changes, so search profiles can be tuned on a
+# running server; connection settings are only read when the pool starts.
+
+SETTINGS_FILE = os.environ.get("ANALYST_SETTINGS_FILE", "")
+
+FUSION_TYPES = ("relative_score", "ranked")
+
+DEFAULT_SETTINGS: dict[str, Any] = {
+    "weaviate": {
+        "host": "127.0.0.1",
+        "port": 80,
+        "grpc_port": 50051,
+        "pool_size": 4,
+        "pool_health_check_interval": 30.0,
+    },
+    "search": {
+        "default_profile": "default",
+    },
+    # Admission control of /stocks_info (see admission.controller)
+    "admission": {
+        "max_in_flight": 8,        # requests processed at once
+        "max_queue": 32,           # requests waiting for a slot; more get 503
+        "max_per_client": 4,       # in-flight + waiting requests of one client; more get 429
+        "queue_timeout": 10.0,     # seconds a request may wait for a slot before 503
+        "retry_after": 2,          # Retry-After seconds sent with 429/503
+    },
+    # Concurrent calls per pipeline stage across all requests; 0 means unlimited
+    "stage_limits": {
+        "llm": 2,                  # streamed answer generations
+        # Query optimizer LLM calls, separate from "llm" so they never queue behind a streamed answer.
+        # Unlimited by default: a small limit serializes every user's rewrite and, past
+        # QUERY_OPTIMIZER_QUEUE_TIMEOUT, falls back to the raw query (counted in wait_timeouts).
+        # Set it (e.g. to OLLAMA_NUM_PARALLEL) only to cap the load the rewrites put on Ollama.
+        "query_optimizer": 0,
+        "retrieval": 8,            # vector DB searches and aggregations
+    },
+    "search_profiles": {
+        # Today's behaviour: cut at the first score jump, drop hits below 0.3
+        "default": {
+            "alpha": 0.7,
+            "max_vector_distance": 0.4,
+            "fusion": "relative_score",
+            "min_score": 0.3,
+            "limit": None,
+            "reranker": "none",
+            "rerank_candidates": 100,
+            "rerank_top_k": 20,
+            "context_token_budget": None,
+            "speculative": False,
+            "speculative_min_margin": 0.2,
+            "speculative_wait_ms": 1500,
+        },
+        # Lower latency: tighter vector radius, few candidates, small prompt
+        "fast": {
+            "alpha": 0.5,
+            "max_vector_distance": 0.3,
+            "fusion": "relative_score",
+            "min_score": 0.4,
+            "limit": 20,
+            "reranker": "none",
+            "context_token_budget": 800,
+            "speculative": True,
+        },
+        # Higher recall: wide vector radius, many candidates, reranked down to the best rows
+        "recall": {
+            "alpha": 0.6,
+            "max_vector_distance": 0.6,
+            "fusion": "ranked",
+            "min_score": 0.0,
+            "limit": None,
+            "reranker": "lexical",
+            "rerank_candidates": 200,
+            "rerank_top_k": 40,
+            "context_token_budget": 2500,
+        },
+    },
+}
+
+# Environment variables overriding single settings: name -> (section, key, type)
+ENV_OVERRIDES = {
+    "WEAVIATE_HOST": ("weaviate", "host", str),
+    "WEAVIATE_PORT": ("weaviate", "port", int),
+    "WEAVIATE_GRPC_PORT": ("weaviate", "grpc_port", int),
+    "WEAVIATE_POOL_SIZE": ("weaviate", "pool_size", int),
+    "WEAVIATE_POOL_HEALTH_CHECK_INTERVAL": ("weaviate", "pool_health_check_interval", float),
+    "SEARCH_PROFILE": ("search", "default_profile", str),
+    "ADMISSION_MAX_IN_FLIGHT": ("admission", "max_in_flight", int),
+    "ADMISSION_MAX_QUEUE": ("admission", "max_queue", int),
+    "ADMISSION_MAX_PER_CLIENT": ("admission", "max_per_client", int),
+    "ADMISSION_QUEUE_TIMEOUT": ("admission", "queue_timeout", float),
+    "STAGE_LIMIT_LLM": ("stage_limits", "llm", int),
+    "STAGE_LIMIT_QUERY_OPTIMIZER": ("stage_limits", "query_optimizer", int),
+    "STAGE_LIMIT_RETRIEVAL": ("stage_limits", "retrieval", int),
+}
+# Environment variables overriding the "default" search profile (kept from before profiles existed)
+PROFILE_ENV_OVERRIDES = {
+    "RERANKER": ("reranker", str),
+    "RERANK_CANDIDATES": ("rerank_candidates", int),
+    "RERANK_TOP_K": ("rerank_top_k", int),
+    "SPECULATIVE_SEARCH": ("speculative", lambda value: value == "1"),
+}
+
+
+class SearchProfile:
+    """
+    Named set of retrieval parameters.
+    Attributes:
+        name (str): Profile name, selectable per request.
+        alpha (float): Hybrid weight of the vector search (0 = keyword only, 1 = vector only).
+        max_vector_distance (float): Largest vector distance a hit may have.
+        fusion (str): "relative_score" or "ranked" fusion of keyword and vector results.
+        min_score (float): Hits scoring below this are dropped (not applied to rerank candidates).
+        limit (int, optional): Fixed number of hits per query; None cuts at the first score jump (auto_limit).
+        reranker (str): "none", "lexical" or "cross_encoder".
+        rerank_candidates (int): Hits fetched per query for the reranker.
+        rerank_top_k (int): Rows kept after reranking.
+        context_token_budget (int, optional): Prompt token budget; None uses CONTEXT_TOKEN_BUDGET.
+        speculative (bool): Search the raw query while the LLM rewrites it.
+        speculative_min_margin (float): Raw-query results whose best hit leads the runner-up by this
+            share of its score are used without waiting for the rewrite (fused scores themselves
+            saturate: relative_score fusion normalizes the top hit to about 1).
+        speculative_wait_ms (int): How long to wait for the rewrite once the raw-query results are in.
+    """
+    def __init__(self, name: str, alpha: float = 0.7, max_vector_distance: float = 0.4, fusion: str = "relative_score",
+                 min_score: float = 0.3, limit: Optional[int] = None, reranker: str = "none",
+                 rerank_candidates: int = 100, rerank_top_k: int = 20, context_token_budget: Optional[int] = None,
+                 speculative: bool = False, speculative_min_margin: float = 0.2, speculative_wait_ms: int = 1500):
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError(f"Search profile '{name}': alpha must be between 0 and 1")
+        if fusion not in FUSION_TYPES:
+            raise ValueError(f"Search profile '{name}': fusion must be one of {FUSION_TYPES}")
+        if (limit is not None and limit <= 0) or rerank_candidates <= 0 or rerank_top_k <= 0 or speculative_wait_ms < 0:
+            raise ValueError(f"Search profile '{name}': limits must be positive integers")
+        self.name = name
+        self.alpha = float(alpha)
+        self.max_vector_distance = float(max_vector_distance)
+        self.fusion = fusion
+        self.min_score = float(min_score)
+        self.limit = limit
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.rerank_top_k = rerank_top_k
+        self.context_token_budget = context_token_budget
+        self.speculative = bool(speculative)
+        self.speculative_min_margin = float(speculative_min_margin)
+        self.speculative_wait_ms = speculative_wait_ms
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        return f"SearchProfile({self.as_dict()})"
+
+
+class Settings:
+    """
+    Loaded settings: the merged `values` plus parsed search profiles.
+    """
+    def __init__(self, values: dict[str, Any]):
+        self.values = values
+        defaults = values["search_profiles"]["default"]
+        self.search_profiles = {
+            name: SearchProfile(name, **{**defaults, **profile})
+            for name, profile in values["search_profiles"].items()
+        }
+        self.default_profile = values["search"]["default_profile"]
+        if self.default_profile not in self.search_profiles:
+            raise ValueError(f"Default search profile '{self.default_profile}' is not defined")
+
+    @property
+    def db_config(self) -> dict[str, Any]:
+        weaviate = self.values["weaviate"]
+        return {"host": weaviate["host"], "port": weaviate["port"], "grpc_port": weaviate["grpc_port"]}
+
+    def search_profile(self, name: Optional[str] = None) -> SearchProfile:
+        """
+        Returns the named search profile, or the default one when name is None.
+        Raises ValueError for unknown names.
+        """
+        name = name or self.default_profile
+        if name not in self.search_profiles:
+            raise ValueError(f"Unknown search profile '{name}', expected one of {sorted(self.search_profiles)}")
+        return self.search_profiles[name]
+
+
+def _merge(base: dict, override: dict) -> dict:
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def read_settings_file(path: str) -> dict[str, Any]:
+    """Reads a TOML (.toml) or JSON settings file."""
+    if path.endswith(".toml"):
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_settings(path: str = SETTINGS_FILE) -> Settings:
+    """
+    Builds settings from the defaults, the settings file (if any) and the environment.
+    """
+    values = copy.deepcopy(DEFAULT_SETTINGS)
+    if path:
+        values = _merge(values, read_settings_file(path))
+    for env_name, (section, key, cast) in ENV_OVERRIDES.items():
+        if env_name in os.environ:
+            values[section][key] = cast(os.environ[env_name])
+    for env_name, (key, cast) in PROFILE_ENV_OVERRIDES.items():
+        if env_name in os.environ:
+            values["search_profiles"]["default"][key] = cast(os.environ[env_name])
+    return Settings(values)
+
+
+_settings_cache: dict[str, tuple[float, Settings]] = {}
+
+def get_settings(path: str = SETTINGS_FILE) -> Settings:
+    """
+    Returns the current settings, re-reading the settings file when it changes.
+    A file that fails to load keeps the previous settings.
+    """
+    try:
+        mtime = os.path.getmtime(path) if path else 0.0
+    except OSError:
+        mtime = -1.0
+    cached = _settings_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        if mtime < 0:
+            # Logged once when the file goes missing, not on every call
+            dbg.warning("Settings file %s not found, using defaults and environment", path)
+        try:
+            _settings_cache[path] = (mtime, load_settings(path if mtime >= 0 else ""))
+        except Exception as e:
+            if cached is None:
+                raise
+            dbg.error("Could not reload settings from %s, keeping the previous ones: %s", path, e)
+            _settings_cache[path] = (mtime, cached[1])
+    return _settings_cache[path][1]
@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+import data_process.parse_xlsx_sheet as pe
+
+# Benchmarks the column-wise parse/clean pipeline against the previous
+# iterrows + per-row clean_row_text implementation on a synthetic workbook.
+# p3 -m data_process.bench_parse_xlsx [rows]
+
+COMPANIES = ["HDFC Bank Ltd.", "ICICI Bank Ltd", "Infosys Ltd", "Tata Motors Ltd.", "Reliance\nIndustries Ltd",
+             "Sun Pharmaceutical Industries", "Bajaj Finance Ltd", "Larsen & Toubro Ltd", "Axis Bank", "Wipro Ltd"]
+SECTORS = ["Banks", "IT", "Automobiles", "Pharma", "Finance", "Construction", "Retailing"]
+PMS_NAMES = ["Helios PMS", "Axis PMS", "WhiteOak\nCapital PMS", "Marcellus PMS"]
+MONTHS = ["June 2025", "July 2025", "August 2025"]
+
+
+def legacy_records_from_dataframe(df: pd.DataFrame) -> List[Dict]:
+    records = []
+    for _, row in df.iterrows():
+        record = {k: v for k, v in row.items() if pd.notnull(v)}
+        if record:
+            records.append(record)
+    return pe.clean_row_text(records)
+
+
+def make_workbook(path: str, rows: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    data = {
+        "Company_Or_Stock_Name": [rng.choice(COMPANIES) for _ in range(rows)],
+        "Industry_\nSector": [rng.choice(SECTORS) for _ in range(rows)],
+        "Quantity_Of_Shares": [rng.randint(100, 5_000_000) if rng.random() > 0.02 else None for _ in range(rows)],
+        "Market_Value_\nLacs_INR": [round(rng.uniform(1, 50_000), 2) for _ in range(rows)],
+        "Asset_Under_Managment_\nPercentage": [round(rng.uniform(0.01, 9.5), 2) if rng.random() > 0.05 else None for _ in range(rows)],
+        "Portfolio_Management_Services_Name": [rng.choice(PMS_NAMES) for _ in range(rows)],
+        "Data_Month": [rng.choice(MONTHS) for _ in range(rows)],
+    }
+    pd.DataFrame(data).to_excel(path, index=False)
+
+
+def timed(fn, *args, repeats: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(rows: int = 100_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "synthetic_holdings.xlsx")
+        print(f"Writing synthetic workbook with {rows} rows ...")
+        make_workbook(path, rows)
+
+        read_s, df = timed(pe.read_xlsx_to_dataframe, path, repeats=1)
+        legacy_s, legacy_records = timed(legacy_records_from_dataframe, df)
+        new_s, new_records = timed(lambda frame: pe.dataframe_to_records(pe.clean_dataframe_text(frame)), df)
+
+        assert legacy_records == new_records, "column-wise pipeline output differs from the iterrows pipeline"
+
+        print(f"read_excel:                    {read_s:8.3f} s")
+        print(f"iterrows + clean_row_text:     {legacy_s:8.3f} s")
+        print(f"column-wise clean + records:   {new_s:8.3f} s  ({legacy_s / new_s:.1f}x faster)")
+        print(f"end-to-end per workbook:       {read_s + legacy_s:8.3f} s -> {read_s + new_s:.3f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
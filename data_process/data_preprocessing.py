@@ -1,23 +1,72 @@
 import re
+from functools import lru_cache
+from typing import Iterable, Iterator
 import data_process.parse_xlsx_sheet as pe
 from debug.logger_config import dbg
 
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")  # Everything except word characters and spaces
+
+# Abbreviation expansions, applied in this order by the original sequential rules
+ABBREVIATION_RULES = [
+    (r"\bltd\.?\b", "limited"),
+    (r"\bpvt\.?\b", "private"),
+    (r"\bco\.?\b", "company"),
+    (r"\bcorp\.?\b", "corporation"),
+    (r"\binc\.?\b", "incorporated"),
+    (r"\bplc\b", "public limited company"),
+    (r"\bgroup\b", ""),
+]
+_ABBREVIATION_RULES_COMPILED = [(re.compile(pattern), repl) for pattern, repl in ABBREVIATION_RULES]
+
+# All rules folded into one alternation, expanded through a lookup table in a single scan
+_ABBREVIATIONS = {
+    "ltd": "limited",
+    "pvt": "private",
+    "co": "company",
+    "corp": "corporation",
+    "inc": "incorporated",
+    "plc": "public limited company",
+    "group": "",
+}
+_ABBREVIATION_RE = re.compile(r"\b(?:(ltd|pvt|co|corp|inc)\.?|(plc|group))\b")
+# A dotted abbreviation glued to the next word ("co.ltd", "ltd.co"): expanding it removes the word
+# boundary in front of that word, which the sequential rules observe and a single scan cannot.
+_GLUED_ABBREVIATION_RE = re.compile(r"\b(?:ltd|pvt|co|corp|inc)\.\w")
+
+NORMALIZE_CACHE_SIZE = 65536
+
+
+def _expand_abbreviation(match: re.Match) -> str:
+    return _ABBREVIATIONS[match.group(1) or match.group(2)]
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_text(text: str) -> str:
+    text = _WHITESPACE_RE.sub(' ', text.strip().lower())
+    text = text.replace("&", "and")
+    if _GLUED_ABBREVIATION_RE.search(text):
+        for pattern, repl in _ABBREVIATION_RULES_COMPILED:
+            text = pattern.sub(repl, text)
+    else:
+        text = _ABBREVIATION_RE.sub(_expand_abbreviation, text)
+    text = _PUNCTUATION_RE.sub("", text)  # Remove punctuation except spaces
+    text = _WHITESPACE_RE.sub(' ', text)  # Clean up spaces again
+    return text.strip()
+
+
 def data_normalize_text(text: str) -> str:
+    """
+    Normalizes company / sector / PMS / month text: lower-case, single spaces,
+    '&' -> 'and', common abbreviations expanded (ltd, pvt, co, corp, inc, plc),
+    'group' dropped and punctuation removed.
+
+    Patterns are compiled once and the abbreviations are expanded in a single
+    pass; results are memoized since the same names repeat across rows.
+    """
     if not text:
         return ""
-    text = text.strip().lower()
-    text = re.sub(r'\s+', ' ', text)
-    text = text.replace("&", "and")
-    text = re.sub(r"\bltd\.?\b", "limited", text)
-    text = re.sub(r"\bpvt\.?\b", "private", text)
-    text = re.sub(r"\bco\.?\b", "company", text)
-    text = re.sub(r"\bcorp\.?\b", "corporation", text)
-    text = re.sub(r"\binc\.?\b", "incorporated", text)
-    text = re.sub(r"\bplc\b", "public limited company", text)
-    text = re.sub(r"\bgroup\b", "", text)
-    text = re.sub(r"[^\w\s]", "", text)  # Remove punctuation except spaces
-    text = re.sub(r'\s+', ' ', text)  # Clean up spaces again
-    return text.strip()
+    return _normalize_text(text)
 
 
 SECTOR_MAPPING = {
@@ -77,6 +126,14 @@ def data_preprocess_stock(stocks_info: list[dict[str, str]]) -> list[dict[str, s
 
     return processed_data
 
+def iter_preprocess_stock(stock_chunks: Iterable[list[dict[str, str]]]) -> Iterator[list[dict[str, str]]]:
+    """
+    Lazily preprocess chunks of stock rows (e.g. from iter_stock_info_from_xlsx),
+    yielding one processed chunk per input chunk.
+    """
+    for chunk in stock_chunks:
+        yield data_preprocess_stock(chunk)
+
 # Test code
 if __name__ == "__main__":
     stocks_info = pe.get_stock_info_from_xlsx(pe.STOCK_INFO_PATH)
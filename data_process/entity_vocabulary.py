@@ -0,0 +1,201 @@
+import json
+import os
+import re
+from typing import Iterable, Optional
+
+import data_process.parse_xlsx_sheet as pe
+from data_process.data_preprocessing import data_normalize_text, data_preprocess_stock, SECTOR_MAPPING
+from debug.logger_config import dbg
+
+ENTITY_VOCAB_PATH = os.environ.get("ENTITY_VOCAB_PATH", os.path.join(pe.STOCK_INFO_PATH, "entity_vocabulary.json"))
+
+VOCAB_FIELDS = [
+    "company_or_stock_name",
+    "industry_sector",
+    "portfolio_management_services_name",
+    "data_month",
+]
+
+MONTH_NAMES = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+MONTH_ALIASES = {name[:3]: name for name in MONTH_NAMES} | {"sept": "september"} | {name: name for name in MONTH_NAMES}
+
+# Generic trailing words that users usually leave out when naming a company or a PMS
+GENERIC_SUFFIXES = {
+    "limited", "private", "company", "corporation", "incorporated", "public",
+    "pms", "portfolio", "management", "services", "india",
+}
+
+# Words that follow the house name of a PMS ("helios capital pms" is asked for as "helios pms")
+PMS_FIRM_WORDS = {
+    "capital", "investment", "investments", "investors", "managers", "asset", "assets",
+    "advisors", "advisory", "wealth", "partners", "fund", "funds", "securities",
+}
+
+# Aliases that collide with common English words; only matched when written in upper case
+# in the raw query ("IT") or right after a preposition ("in may")
+AMBIGUOUS_ALIASES = {"it", "may"}
+AMBIGUOUS_ALIAS_PREPOSITIONS = {"in", "of", "for", "during"}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class EntityVocabulary:
+    """
+    Known company, sector, PMS and month values collected at ingestion time.
+
+    Values are stored normalized (the same way data_preprocess_stock stores
+    them in Weaviate). `match` finds mentions of these values in a free-text
+    query with a longest-first n-gram lookup, so it costs a handful of dict
+    lookups per query.
+    """
+    def __init__(self, values: Optional[dict[str, Iterable[str]]] = None):
+        values = values or {}
+        self.values: dict[str, list[str]] = {
+            field: sorted({v for v in values.get(field, []) if v}) for field in VOCAB_FIELDS
+        }
+        self._index: Optional[dict[str, set[tuple[str, str]]]] = None
+        self._max_ngram = 1
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.values.values())
+
+    @classmethod
+    def from_rows(cls, processed_rows: Iterable[dict]) -> "EntityVocabulary":
+        """
+        Builds a vocabulary from rows produced by data_preprocess_stock.
+        """
+        vocab = cls()
+        vocab.update(processed_rows)
+        return vocab
+
+    def update(self, processed_rows: Iterable[dict]) -> None:
+        """
+        Adds the entity values of the given preprocessed rows to the vocabulary.
+        """
+        values = {field: set(self.values[field]) for field in VOCAB_FIELDS}
+        for row in processed_rows:
+            for field in VOCAB_FIELDS:
+                value = row.get(field)
+                if isinstance(value, str) and value:
+                    values[field].add(value)
+        self.values = {field: sorted(values[field]) for field in VOCAB_FIELDS}
+        # Rebuilt on the next match(), so streaming many chunks through update() stays cheap
+        self._index = None
+
+    def _aliases(self, field: str, value: str) -> set[str]:
+        aliases = {value}
+        words = value.split()
+        if field in ("company_or_stock_name", "portfolio_management_services_name"):
+            while len(words) > 1 and words[-1] in GENERIC_SUFFIXES:
+                words = words[:-1]
+            aliases.add(" ".join(words))
+            if field == "portfolio_management_services_name":
+                house = []
+                for word in value.split():
+                    if word in GENERIC_SUFFIXES or word in PMS_FIRM_WORDS:
+                        break
+                    house.append(word)
+                if house:
+                    aliases.update({" ".join(house), " ".join(house) + " pms"})
+        elif field == "industry_sector":
+            aliases.update(short for short, full in SECTOR_MAPPING.items() if data_normalize_text(full) == value)
+        elif field == "data_month":
+            aliases.update(alias for alias, month in MONTH_ALIASES.items() if month in words)
+        return aliases
+
+    def _build_index(self) -> None:
+        self._index = {}
+        for field, values in self.values.items():
+            for value in values:
+                for alias in self._aliases(field, value):
+                    self._index.setdefault(alias, set()).add((field, value))
+        self._max_ngram = max((len(alias.split()) for alias in self._index), default=1)
+
+    def match_phrases(self, user_query: str) -> list[tuple[str, set[tuple[str, str]]]]:
+        """
+        Finds the phrases of a user query that name known entity values.
+        Returns:
+            list[tuple[str, set[tuple[str, str]]]]: (normalized phrase, {(field, value)}) per match,
+                in query order. One phrase can name values of several fields.
+        """
+        if self._index is None:
+            self._build_index()
+        raw_tokens = _WORD_RE.findall(user_query)
+        tokens = data_normalize_text(user_query).split()
+        phrases: list[tuple[str, set[tuple[str, str]]]] = []
+        i = 0
+        while i < len(tokens):
+            for n in range(min(self._max_ngram, len(tokens) - i), 0, -1):
+                phrase = " ".join(tokens[i:i + n])
+                entries = self._index.get(phrase)
+                if not entries:
+                    continue
+                if phrase in AMBIGUOUS_ALIASES and phrase.upper() not in raw_tokens \
+                        and (i == 0 or tokens[i - 1] not in AMBIGUOUS_ALIAS_PREPOSITIONS):
+                    continue
+                phrases.append((phrase, entries))
+                i += n
+                break
+            else:
+                i += 1
+        return phrases
+
+    def match(self, user_query: str) -> dict[str, list[str]]:
+        """
+        Finds known entity values mentioned in a user query.
+        Args:
+            user_query (str): Raw user query.
+        Returns:
+            dict[str, list[str]]: Matched vocabulary values per field (only fields with hits).
+        """
+        matches: dict[str, set[str]] = {}
+        for _, entries in self.match_phrases(user_query):
+            for field, value in entries:
+                matches.setdefault(field, set()).add(value)
+        return {field: sorted(values) for field, values in matches.items()}
+
+    def save(self, path: str = ENTITY_VOCAB_PATH) -> None:
+        """Writes the vocabulary as JSON."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.values, f, ensure_ascii=False, indent=2)
+        dbg.info("Entity vocabulary with %d values saved to %s", len(self), path)
+
+    @classmethod
+    def load(cls, path: str = ENTITY_VOCAB_PATH) -> "EntityVocabulary":
+        """Reads a vocabulary written by `save`."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+_vocab_cache: dict[str, tuple[float, EntityVocabulary]] = {}
+
+def get_entity_vocabulary(path: str = ENTITY_VOCAB_PATH) -> EntityVocabulary:
+    """
+    Returns the vocabulary saved at `path`, reloading it when the file changes
+    (e.g. after a re-ingestion). Returns an empty vocabulary if none was saved yet.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        if path not in _vocab_cache:
+            dbg.warning("Entity vocabulary not found at %s, entity matching is disabled", path)
+            _vocab_cache[path] = (0.0, EntityVocabulary())
+        return _vocab_cache[path][1]
+    cached = _vocab_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        _vocab_cache[path] = (mtime, EntityVocabulary.load(path))
+    return _vocab_cache[path][1]
+
+
+# Build the vocabulary from the xlsx folder without touching Weaviate
+# p3 -m data_process.entity_vocabulary
+if __name__ == "__main__":
+    stocks_info = pe.get_stock_info_from_xlsx(pe.STOCK_INFO_PATH)
+    vocab = EntityVocabulary.from_rows(data_preprocess_stock(stocks_info))
+    vocab.save()
+    for field, values in vocab.values.items():
+        print(f"{field}: {len(values)} values")
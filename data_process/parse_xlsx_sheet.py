@@ -1,26 +1,66 @@
 import pandas as pd
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import List, Dict, Iterator, Optional, Tuple
 import os
 import glob
+import time
+
+from debug.logger_config import dbg
 
 HOME_DIR = os.path.expanduser("~")
 STOCK_INFO_PATH = os.path.join(HOME_DIR, "factory/public/stocks_xlsx/")
+# Number of worker processes used to parse workbooks; 1 parses sequentially, 0 uses all CPUs
+XLSX_PARSE_WORKERS = int(os.environ.get("XLSX_PARSE_WORKERS", "1"))
+# Number of rows handed downstream at a time by iter_stock_info_from_xlsx
+XLSX_CHUNK_SIZE = int(os.environ.get("XLSX_CHUNK_SIZE", "1000"))
 
-def parse_xlsx_to_dicts(file_path: str) -> List[Dict]:
+def read_xlsx_to_dataframe(file_path: str) -> pd.DataFrame:
     """
-    Parse an Excel (.xlsx) file into a list of dictionaries.
-    
-    Each row becomes a dict where keys = column names.
+    Read an Excel (.xlsx) file into a DataFrame, dropping empty rows and columns.
     """
     df = pd.read_excel(file_path)
     df = df.dropna(how="all")
     df = df.dropna(axis=1, how="all")
-    records = []
-    for _, row in df.iterrows():
-        record = {k: v for k, v in row.items() if pd.notnull(v)}
-        if record:
-            records.append(record)
-    return records
+    return df
+
+def clean_dataframe_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column-wise equivalent of clean_row_text: strips newlines from and
+    lower-cases column names and string cells. Non-string cells are kept as is.
+    """
+    df = df.copy()
+    df.columns = [str(col).replace('\n', '').lower() for col in df.columns]
+    for position in range(df.shape[1]):
+        values = df.iloc[:, position]
+        if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+            continue
+        # .str yields NaN for non-string cells in mixed columns; keep the original value there
+        cleaned = values.str.replace('\n', '', regex=False).str.lower()
+        df.isetitem(position, cleaned.where(cleaned.notna(), values))
+    return df
+
+def dataframe_to_records(df: pd.DataFrame) -> List[Dict]:
+    """
+    Convert a DataFrame into a list of dicts (keys = column names), leaving out null cells.
+    """
+    records = df.to_dict("records")
+    notnull = df.notna().to_numpy()
+    has_null = ~notnull.all(axis=1)
+    columns = list(df.columns)
+    for i in has_null.nonzero()[0]:
+        record = records[i]
+        records[i] = {col: record[col] for col, keep in zip(columns, notnull[i]) if keep}
+    return [record for record in records if record]
+
+def parse_xlsx_to_dicts(file_path: str) -> List[Dict]:
+    """
+    Parse an Excel (.xlsx) file into a list of dictionaries.
+
+    Each row becomes a dict where keys = column names.
+    """
+    return dataframe_to_records(read_xlsx_to_dataframe(file_path))
 
 def clean_row_text(List_of_dicts: List[Dict]) -> List[Dict]:
     stocks_info : List[dict] = []
@@ -29,21 +69,93 @@ def clean_row_text(List_of_dicts: List[Dict]) -> List[Dict]:
         stocks_info.append(clean_row)
     return stocks_info
 
-def get_stock_info_from_xlsx(xls_folder_path: str) -> List[Dict[str, str]]:
+def parse_and_clean_xlsx(file_path: str) -> List[Dict]:
+    """
+    Parse an Excel (.xlsx) file into cleaned row dicts, same output as
+    clean_row_text(parse_xlsx_to_dicts(file_path)) but cleaned column-wise.
+    """
+    return dataframe_to_records(clean_dataframe_text(read_xlsx_to_dataframe(file_path)))
+
+def list_xlsx_files(xls_folder_path: str) -> List[str]:
+    """
+    List the Excel files of a folder in a stable (sorted) order.
+    """
+    return sorted(glob.glob(os.path.join(xls_folder_path, "*.xls*")))
+
+def resolve_parse_workers(workers: Optional[int] = None) -> int:
+    workers = XLSX_PARSE_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def report_parse_progress(done: int, total: int, file_path: str, rows: int, started: float) -> None:
+    dbg.info("Parsed file %d/%d: %s (%d rows, %.1fs elapsed)", done, total, os.path.basename(file_path), rows,
+             time.perf_counter() - started)
+
+def iter_parsed_xlsx(excel_files: List[str], workers: int = 1) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Yield (file_path, cleaned rows) per workbook, in the order of `excel_files`.
+
+    With more than one worker, at most `workers` workbooks are parsed ahead in a
+    process pool (pd.read_excel is CPU-bound), so memory stays bounded by the
+    window instead of the whole folder.
+    """
+    if workers <= 1:
+        for file_path in excel_files:
+            yield file_path, parse_and_clean_xlsx(file_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        files = iter(excel_files)
+        pending = deque((file_path, executor.submit(parse_and_clean_xlsx, file_path)) for file_path in islice(files, workers))
+        while pending:
+            file_path, future = pending.popleft()
+            rows = future.result()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file, executor.submit(parse_and_clean_xlsx, next_file)))
+            yield file_path, rows
+
+def iter_stock_info_from_xlsx(xls_folder_path: str, workers: Optional[int] = None, chunk_size: int = XLSX_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """
+    Lazily yield stock information from Excel files in chunks of at most `chunk_size` rows.
+
+    Files are read in sorted order; rows come out in the same order whatever the worker count.
+    Args:
+        xls_folder_path (str): Folder containing the .xls/.xlsx files.
+        workers (int, optional): Worker processes; defaults to XLSX_PARSE_WORKERS, 0 means all CPUs.
+        chunk_size (int): Maximum number of rows per yielded chunk.
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be a positive integer.")
+    excel_files = list_xlsx_files(xls_folder_path)
+    workers = min(resolve_parse_workers(workers), max(len(excel_files), 1))
+    dbg.info("Parsing %d workbooks from %s with %d worker(s)", len(excel_files), xls_folder_path, workers)
+    started = time.perf_counter()
+
+    for done, (file_path, rows) in enumerate(iter_parsed_xlsx(excel_files, workers), start=1):
+        report_parse_progress(done, len(excel_files), file_path, len(rows), started)
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+def get_stock_info_from_xlsx(xls_folder_path: str, workers: Optional[int] = None) -> List[Dict[str, str]]:
     """
     Get stock information from an Excel files.
+
+    With more than one worker the workbooks are parsed concurrently in a
+    process pool. Rows are always returned in sorted file order, whatever the
+    worker count. Use iter_stock_info_from_xlsx to stream instead of
+    materializing every row.
+    Args:
+        xls_folder_path (str): Folder containing the .xls/.xlsx files.
+        workers (int, optional): Worker processes; defaults to XLSX_PARSE_WORKERS, 0 means all CPUs.
     """
     stocks_info = []
-    excel_files = glob.glob(os.path.join(xls_folder_path, "*.xls*"))
-    for file_path in excel_files:
-        print(f"Processing file: {file_path}")
-        rows = parse_xlsx_to_dicts(file_path)
-        stocks_info.extend(clean_row_text(rows))
+    for chunk in iter_stock_info_from_xlsx(xls_folder_path, workers=workers):
+        stocks_info.extend(chunk)
     return stocks_info
 
 
 # Test code
 if __name__ == "__main__":
     stocks_info = get_stock_info_from_xlsx(STOCK_INFO_PATH)
-    for row in stocks_info:        
+    for row in stocks_info:
         print(row)
@@ -0,0 +1,151 @@
+import math
+import random
+from typing import Optional
+
+from data_process.data_preprocessing import data_preprocess_stock
+
+# Synthetic PMS holdings corpus for offline benchmarks.
+# Rows look like the parsed monthly PMS sheets (company, sector, PMS, month,
+# shares, market value, AUM %) and go through data_preprocess_stock, so they
+# carry the same normalized fields and combined_text as ingested data.
+# Every (company, PMS, month) appears at most once, like the real sheets.
+
+COMPANY_WORDS = [
+    "Aurora", "Bharat", "Cosmos", "Deccan", "Everest", "Fortune", "Ganga", "Himalaya", "Indus", "Jupiter",
+    "Kaveri", "Lotus", "Meridian", "Narmada", "Orion", "Pinnacle", "Quantum", "Radiant", "Sahyadri", "Triveni",
+    "Unity", "Vedanta", "Western", "Yamuna", "Zenith", "Apex", "Banyan", "Crescent", "Dhruv", "Emerald",
+    "Falcon", "Garuda", "Horizon", "Ivory", "Jasmine", "Kohinoor", "Lakshmi", "Monsoon", "Nilgiri", "Onyx",
+    "Peacock", "Ruby", "Saffron", "Tulsi", "Vaibhav", "Vista", "Sapphire", "Sterling", "Summit", "Trident",
+]
+COMPANY_KINDS = [
+    "Textiles", "Motors", "Pharma", "Finance", "Steel", "Cement", "Power", "Foods", "Chemicals", "Infotech",
+    "Logistics", "Realty", "Agro", "Bank", "Polymers", "Electricals", "Paints", "Tyres", "Hotels", "Telecom",
+]
+COMPANY_SUFFIXES = ["Ltd", "Industries Ltd", "Enterprises Ltd", "Corporation Ltd"]
+SECTORS = [
+    "Banks", "Finance", "IT", "Pharma", "Auto", "Cement", "Steel", "Power", "FMCG", "Chemicals",
+    "Textiles", "Realty", "Telecom", "Logistics", "Retailing", "Capital Goods", "Hotels", "Agriculture",
+]
+PMS_HOUSES = [
+    "Helios", "Sapient", "Marcellus", "Alchemy", "Carnelian", "Abakkus", "Renaissance", "Buoyant", "Unifi",
+    "Negen", "Equitree", "Ambit", "Valentis", "Stallion", "Aequitas", "Counter Cyclical", "Sameeksha", "Invesco",
+    "Nine Rivers", "Green Lantern", "Basant Maheshwari", "Roha", "Quest", "Asit", "Girik",
+]
+PMS_STRATEGIES = ["Growth", "Value", "Multicap", "Smallcap", "Midcap", "Focused", "Dividend", "Emerging Leaders"]
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+
+def _company_names(count: int, rng: random.Random) -> list[str]:
+    parts = [(word, kind, suffix) for word in COMPANY_WORDS for kind in COMPANY_KINDS
+             for suffix in COMPANY_SUFFIXES]
+    rng.shuffle(parts)
+    names = []
+    # Past the word combinations, names are numbered ("Aurora Textiles 2 Ltd")
+    for round_number in range(math.ceil(count / len(parts))):
+        number = f" {round_number + 1}" if round_number else ""
+        names.extend(f"{word} {kind}{number} {suffix}" for word, kind, suffix in parts)
+    return names[:count]
+
+
+def _pms_names(count: int) -> list[str]:
+    names = [f"{house} {strategy} PMS" for strategy in PMS_STRATEGIES for house in PMS_HOUSES]
+    if count > len(names):
+        raise ValueError(f"At most {len(names)} synthetic PMS names are available")
+    return names[:count]
+
+
+def generate_corpus(rows: int = 10_000, seed: int = 7, months: int = 12, year: int = 2025,
+                    pms_count: Optional[int] = None, company_count: Optional[int] = None) -> list[dict]:
+    """
+    Generates about `rows` preprocessed holding rows.
+    Args:
+        rows (int): Target row count (10k-1M are practical).
+        seed (int): Random seed; the same arguments give the same corpus.
+        months (int): Number of consecutive months covered.
+        pms_count (int, optional): Number of PMS; grows with sqrt(rows) by default.
+        company_count (int, optional): Number of companies; rows / 200 (at least 200) by default.
+    Returns:
+        list[dict]: Rows as produced by data_preprocess_stock.
+    """
+    rng = random.Random(seed)
+    pms_count = pms_count or min(len(PMS_HOUSES) * len(PMS_STRATEGIES), max(10, round(math.sqrt(rows) / 5)))
+    company_count = company_count or max(200, rows // 200)
+    holdings_per_month = math.ceil(rows / (pms_count * months))
+    if holdings_per_month > company_count:
+        raise ValueError("Not enough companies for the requested rows; raise company_count")
+
+    companies = _company_names(company_count, rng)
+    sectors = {company: rng.choice(SECTORS) for company in companies}
+    # Share prices (INR) fixed per company, so value = shares * price stays consistent across PMS
+    prices = {company: round(rng.lognormvariate(6, 1.2), 2) for company in companies}
+    month_names = [f"{MONTHS[m % 12]} {year + m // 12}" for m in range(months)]
+
+    raw_rows = []
+    for pms in _pms_names(pms_count):
+        portfolio = rng.sample(companies, holdings_per_month)
+        for month in month_names:
+            # Roughly 5% of a portfolio is replaced every month
+            for i in range(len(portfolio)):
+                if rng.random() < 0.05:
+                    candidate = rng.choice(companies)
+                    if candidate not in portfolio:
+                        portfolio[i] = candidate
+            weights = [rng.random() for _ in portfolio]
+            total_weight = sum(weights)
+            for company, weight in zip(portfolio, weights):
+                if len(raw_rows) >= rows:
+                    break
+                shares = rng.randint(1_000, 2_000_000)
+                raw_rows.append({
+                    "company_or_stock_name": company,
+                    "industry_sector": sectors[company],
+                    "quantity_of_shares": shares,
+                    "market_value_lacs_inr": round(shares * prices[company] / 100_000, 2),
+                    "asset_under_managment_percentage": round(100 * weight / total_weight, 2),
+                    "data_month": month,
+                    "portfolio_management_services_name": pms,
+                })
+    return data_preprocess_stock(raw_rows)
+
+
+# Labeled query templates: (kind, query template, fields that must match for a row to be relevant)
+QUERY_TEMPLATES = [
+    ("point", "{company} holdings of {pms} in {month}",
+     ("company_or_stock_name", "portfolio_management_services_name", "data_month")),
+    ("company_month", "which pms held {company} in {month}", ("company_or_stock_name", "data_month")),
+    ("pms_sector", "{sector} stocks held by {pms} in {month}",
+     ("industry_sector", "portfolio_management_services_name", "data_month")),
+    ("company", "how many shares of {company} do pms hold", ("company_or_stock_name",)),
+]
+QUERY_FIELDS = {
+    "company": "company_or_stock_name",
+    "pms": "portfolio_management_services_name",
+    "month": "data_month",
+    "sector": "industry_sector",
+}
+
+
+def generate_queries(corpus: list[dict], count: int = 200, seed: int = 11) -> list[dict]:
+    """
+    Builds labeled queries from corpus rows: each query names the fields of a
+    sampled row, and every row matching those fields is relevant.
+    Returns:
+        list[dict]: {"kind", "query", "relevant"} with the relevant row indexes (a set).
+    """
+    rng = random.Random(seed)
+    index: dict[tuple, set[int]] = {}
+    for _, _, fields in QUERY_TEMPLATES:
+        for i, row in enumerate(corpus):
+            index.setdefault((fields, tuple(row[field] for field in fields)), set()).add(i)
+
+    queries = []
+    for n in range(count):
+        kind, template, fields = QUERY_TEMPLATES[n % len(QUERY_TEMPLATES)]
+        row = corpus[rng.randrange(len(corpus))]
+        query = template.format(**{name: row[field] for name, field in QUERY_FIELDS.items()})
+        relevant = index[(fields, tuple(row[field] for field in fields))]
+        queries.append({"kind": kind, "query": query, "relevant": relevant})
+    return queries
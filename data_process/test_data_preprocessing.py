@@ -0,0 +1,108 @@
+import random
+import re
+import sys
+import time
+
+import data_process.data_preprocessing as data
+
+# Equivalence test and throughput benchmark for data_normalize_text.
+# p3 -m pytest data_process/test_data_preprocessing.py
+# p3 -m data_process.test_data_preprocessing [rows]
+
+
+def reference_normalize_text(text: str) -> str:
+    """The original sequential implementation, kept as the specification."""
+    if not text:
+        return ""
+    text = text.strip().lower()
+    text = re.sub(r'\s+', ' ', text)
+    text = text.replace("&", "and")
+    text = re.sub(r"\bltd\.?\b", "limited", text)
+    text = re.sub(r"\bpvt\.?\b", "private", text)
+    text = re.sub(r"\bco\.?\b", "company", text)
+    text = re.sub(r"\bcorp\.?\b", "corporation", text)
+    text = re.sub(r"\binc\.?\b", "incorporated", text)
+    text = re.sub(r"\bplc\b", "public limited company", text)
+    text = re.sub(r"\bgroup\b", "", text)
+    text = re.sub(r"[^\w\s]", "", text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+SAMPLE_VALUES = [
+    "HDFC Bank Ltd.", "ICICI Bank Ltd", "Larsen & Toubro Ltd.", "Tata Consultancy Services Ltd",
+    "Bajaj Finance Ltd.", "Reliance Industries Ltd", "Aditya Birla Group", "Sun Pharma Co. Ltd",
+    "Hindustan Unilever Pvt. Ltd.", "Info Edge (India) Ltd", "Dr. Reddy's Laboratories Ltd.",
+    "Helios Capital PMS", "WhiteOak Capital\nPMS", "Marcellus Investment Managers Pvt Ltd",
+    "  July 2025 ", "AUGUST-2025", "Banks", "IT - Software", "Finance & Investments", "Vodafone PLC",
+    "Apple Inc.", "Microsoft Corp.", "co.ltd", "ltd.co", "co.group", "inc.plc", "pvt.ltd.", "corp.co",
+]
+
+FUZZ_TOKENS = [
+    "ltd", "ltd.", "Ltd.", "pvt", "pvt.", "co", "co.", "CO.", "corp", "corp.", "inc", "inc.",
+    "plc", "group", "Group", "&", "and", " ", "  ", "\t", "\n", ".", ",", "-", "(", ")", "'",
+    "bank", "a", "é", "_", "1", "2.5", "company", "corporation", "limited", "cop", "colt",
+]
+
+
+def fuzz_values(count: int, seed: int = 11) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+
+def test_data_normalize_text_matches_reference():
+    for value in SAMPLE_VALUES + fuzz_values(50_000) + ["", " ", "&", "."]:
+        assert data.data_normalize_text(value) == reference_normalize_text(value), repr(value)
+
+
+def test_data_preprocess_stock_is_unchanged_for_repeated_rows():
+    row = {
+        "company_or_stock_name": "HDFC Bank Ltd.",
+        "industry_sector": "Banks",
+        "portfolio_management_services_name": "Helios Capital PMS",
+        "data_month": "July 2025",
+        "quantity_of_shares": 1200,
+        "market_value_lacs_inr": 210.5,
+        "asset_under_managment_percentage": 3.2,
+    }
+    first, second = data.data_preprocess_stock([row, dict(row)])
+    assert first == second
+    assert first["company_or_stock_name"] == "hdfc bank limited"
+    assert first["industry_sector"] == "banking"
+
+
+def benchmark(rows: int = 200_000) -> None:
+    rng = random.Random(3)
+    values = [rng.choice(SAMPLE_VALUES) for _ in range(rows)]
+
+    start = time.perf_counter()
+    for value in values:
+        reference_normalize_text(value)
+    reference_s = time.perf_counter() - start
+
+    data._normalize_text.cache_clear()
+    start = time.perf_counter()
+    for value in values:
+        data.data_normalize_text(value)
+    engine_s = time.perf_counter() - start
+
+    unique = fuzz_values(rows)
+    data._normalize_text.cache_clear()
+    start = time.perf_counter()
+    for value in unique:
+        data.data_normalize_text(value)
+    uncached_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in unique:
+        reference_normalize_text(value)
+    reference_unique_s = time.perf_counter() - start
+
+    print(f"repeated values ({rows}):  reference {rows / reference_s:12,.0f}/s   engine {rows / engine_s:12,.0f}/s")
+    print(f"unique values   ({rows}):  reference {rows / reference_unique_s:12,.0f}/s   engine {rows / uncached_s:12,.0f}/s")
+
+
+if __name__ == "__main__":
+    test_data_normalize_text_matches_reference()
+    test_data_preprocess_stock_is_unchanged_for_repeated_rows()
+    print("data_normalize_text matches the reference implementation")
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
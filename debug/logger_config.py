@@ -1,12 +1,100 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import uuid
+from typing import Optional
 
 LOGGER_NAME = 'APP_LOGGER'
 
+# LOG_FORMAT: "text" (human readable) or "json" (one JSON object per line)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# LOG_ASYNC=1 hands records to a background thread (QueueListener) that does the
+# file and stdout writes, so logging calls never block the event loop on I/O
+LOG_ASYNC = os.environ.get('LOG_ASYNC', '1') == '1'
+# Log file rotation by size: LOG_MAX_BYTES per file, LOG_BACKUP_COUNT old files kept
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '5'))
+
+# Correlation id of the request being handled; set per request by the API, "-" outside requests
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar('request_id', default='-')
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def set_request_id(request_id: Optional[str] = None) -> contextvars.Token:
+    """
+    Sets the correlation id for log records of the current request (context).
+    Returns the token for reset_request_id.
+    """
+    return request_id_var.set(request_id or new_request_id())
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    request_id_var.reset(token)
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps records with the current request id. Runs in the calling thread,
+    before records are queued, so the id of the calling request is kept.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'source': f'{record.filename}:{record.lineno}',
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _make_formatter() -> logging.Formatter:
+    if LOG_FORMAT == 'json':
+        return JsonFormatter()
+    return logging.Formatter(
+        '%(asctime)s [%(levelname)s] (%(name)s) [%(request_id)s] [%(filename)s:%(lineno)d]: %(message)s'
+    )
+
+
+def _stop_listener() -> None:
+    # Flushes queued records on interpreter exit
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
 def get_logger():
+    global _listener
     dbg = logging.getLogger(LOGGER_NAME)
-    dbg.setLevel(logging.INFO)
+    dbg.setLevel(LOG_LEVEL)
     dbg.propagate = False
 
     if not dbg.handlers:
@@ -17,23 +105,36 @@ def get_logger():
             os.makedirs(log_dir, exist_ok=True)
             log_file = os.path.join(log_dir, 'app.log')
 
-        formatter = logging.Formatter(
-            '%(asctime)s [%(levelname)s] (%(name)s) [%(filename)s:%(lineno)d]: %(message)s'
-        )
+        formatter = _make_formatter()
 
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
         file_handler.setFormatter(formatter)
-        dbg.addHandler(file_handler)
 
         stream_handler = logging.StreamHandler(sys.stdout)
         stream_handler.setFormatter(formatter)
-        dbg.addHandler(stream_handler)
 
-        dbg.info(f"Custom logger '{LOGGER_NAME}' initialized. Log file path: {log_file}")
+        if LOG_ASYNC:
+            queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+            queue_handler.addFilter(RequestIdFilter())
+            dbg.addHandler(queue_handler)
+            _listener = logging.handlers.QueueListener(
+                queue_handler.queue, file_handler, stream_handler, respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(_stop_listener)
+        else:
+            for handler in (file_handler, stream_handler):
+                handler.addFilter(RequestIdFilter())
+                dbg.addHandler(handler)
+
+        dbg.info("Custom logger '%s' initialized (%s, async=%s). Log file path: %s",
+                 LOGGER_NAME, LOG_FORMAT, LOG_ASYNC, log_file)
 
     return dbg
 
 # Usage: from logger_config import dbg
-# dbg.info("Your message")
+# dbg.info("Your message: %s", value)  (arguments are only formatted if the level is enabled)
 
 dbg = get_logger()
@@ -0,0 +1,126 @@
+import functools
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator, Optional
+
+from debug.logger_config import dbg
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+except ImportError:  # optional dependency, only needed for the /metrics endpoint
+    Histogram = None
+
+try:
+    from opentelemetry import trace
+except ImportError:  # optional dependency; spans are exported when an OpenTelemetry SDK is configured
+    trace = None
+
+# Per-stage latency instrumentation for the RAG pipeline.
+# Stage timings, time-to-first-token, generation speed and retrieved-object
+# counts are recorded as Prometheus histograms (served on /metrics) and, when
+# OpenTelemetry is installed, as spans (e.g. run under `opentelemetry-instrument`
+# with an exporter configured). Without either package the calls are no-ops.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+TRACING_ENABLED = os.environ.get("OTEL_TRACING_ENABLED", "1") == "1"
+
+# Buckets in seconds: cache hits take milliseconds, LLM round trips several seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+
+metrics_available = METRICS_ENABLED and Histogram is not None
+
+if metrics_available:
+    STAGE_SECONDS = Histogram(
+        "rag_stage_seconds", "Latency of one RAG pipeline stage", ["stage"], buckets=LATENCY_BUCKETS,
+    )
+    TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+        "rag_time_to_first_token_seconds", "Request start until the first answer token is streamed",
+        buckets=LATENCY_BUCKETS,
+    )
+    GENERATION_TOKENS_PER_SECOND = Histogram(
+        "rag_generation_tokens_per_second", "Answer tokens per second after the first token",
+        buckets=TOKENS_PER_SECOND_BUCKETS,
+    )
+    RETRIEVED_OBJECTS = Histogram(
+        "rag_retrieved_objects", "Objects per retrieval step (retrieved, selected, in context)", ["stage"],
+        buckets=COUNT_BUCKETS,
+    )
+elif METRICS_ENABLED:
+    dbg.info("prometheus_client not installed, /metrics is disabled")
+
+tracer = trace.get_tracer("analyst.rag") if TRACING_ENABLED and trace is not None else None
+
+
+def observe_stage_latency(stage: str, seconds: float) -> None:
+    """Records the latency of a finished stage."""
+    if metrics_available:
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Records the latency of a finished stage, and adds it as an event to the current span."""
+    observe_stage_latency(stage, seconds)
+    if tracer is not None:
+        trace.get_current_span().add_event(stage, {"duration_ms": round(seconds * 1000, 1)})
+
+
+def observe_retrieved(stage: str, count: int) -> None:
+    """Records how many objects a retrieval step returned."""
+    if metrics_available:
+        RETRIEVED_OBJECTS.labels(stage=stage).observe(count)
+    if tracer is not None:
+        trace.get_current_span().set_attribute(f"rag.objects.{stage}", count)
+
+
+def observe_generation(time_to_first_token: Optional[float], tokens: int, generation_seconds: float) -> None:
+    """Records time-to-first-token and generation speed of one streamed answer."""
+    tokens_per_second = tokens / generation_seconds if tokens and generation_seconds > 0 else None
+    if metrics_available:
+        if time_to_first_token is not None:
+            TIME_TO_FIRST_TOKEN_SECONDS.observe(time_to_first_token)
+        if tokens_per_second is not None:
+            GENERATION_TOKENS_PER_SECOND.observe(tokens_per_second)
+    if tracer is not None:
+        span = trace.get_current_span()
+        span.set_attribute("rag.output_tokens", tokens)
+        if time_to_first_token is not None:
+            span.set_attribute("rag.ttft_ms", round(time_to_first_token * 1000, 1))
+
+
+@contextmanager
+def stage_span(stage: str, **attributes: Any) -> Iterator[None]:
+    """
+    Times a block as a pipeline stage: a child span (when tracing) plus a
+    rag_stage_seconds observation. Works in sync and async code.
+    """
+    span = tracer.start_as_current_span(stage, attributes=attributes) if tracer is not None else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            observe_stage_latency(stage, time.perf_counter() - start)
+
+
+def traced_stage(stage: str) -> Callable:
+    """Decorator running an async function inside stage_span(stage)."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage_span(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def metrics_response() -> tuple[bytes, str]:
+    """
+    Returns the Prometheus exposition (body, content type).
+    Raises RuntimeError when prometheus_client is not installed or metrics are disabled.
+    """
+    if not metrics_available:
+        raise RuntimeError("Metrics unavailable: install prometheus_client and set METRICS_ENABLED=1")
+    return generate_latest(), CONTENT_TYPE_LATEST
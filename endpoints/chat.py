@@ -1,14 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from rag.chat_functions import app_stocks_info
+from query_optimizer.query_transformer import QUERY_OPTIMIZER_MODES
+from query_optimizer.rule_classifier import rule_classifier_stats
+from query_optimizer.query_transformer import optimized_query_cache
+import weaviate_database.db_collection as ds
+from config.settings import get_settings
+from admission.controller import AdmissionRejected, get_admission_controller, stage_stats
+from typing import Callable
 import uvicorn
 
-from debug.logger_config import dbg
-from fastapi.responses import StreamingResponse
+from debug.logger_config import dbg, get_request_id, reset_request_id, set_request_id
+from fastapi.responses import StreamingResponse, Response
+from debug.metrics import metrics_response
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep one Weaviate connection pool for the whole process instead of connecting per request
+    await ds.init_db_pool()
+    try:
+        yield
+    finally:
+        await ds.close_db_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # For development allow the UI origin (or use ["*"] temporarily)
@@ -21,25 +41,120 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    # Correlation id for every log line of the request (also of its streamed body); taken
+    # from the X-Request-ID header when the caller sends one, and echoed in the response
+    token = set_request_id(request.headers.get("X-Request-ID"))
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = get_request_id()
+        return response
+    finally:
+        reset_request_id(token)
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that frees the request's admission slot once it is done,
+    also when the client disconnected before the body started streaming.
+    """
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
 @app.post("/stocks_info")
 async def chat_endpoint(request: Request):
     data = await request.json()
     user_message = data.get("message")
-    dbg.info(f"Received message: {user_message}")
+    dbg.info("Received message: %s", user_message)
 
     if not user_message:
         return JSONResponse(status_code=400, content={"error": "Missing 'message' in request body."})
 
+    # Optional per-request query optimizer mode: "two_step" (default) or "one_shot"
+    optimizer_mode = data.get("optimizer_mode")
+    if optimizer_mode is not None and optimizer_mode not in QUERY_OPTIMIZER_MODES:
+        return JSONResponse(status_code=400, content={"error": f"'optimizer_mode' must be one of {list(QUERY_OPTIMIZER_MODES)}."})
+
+    # Optional per-request search profile, e.g. "fast" or "recall" (see config.settings)
+    search_profile = data.get("search_profile")
+    if search_profile is not None:
+        try:
+            get_settings().search_profile(search_profile)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+    # Admission control: bounded concurrency and queue, fair across clients.
+    # Clients identify themselves with X-Client-ID; otherwise the remote address is used.
+    client_id = request.headers.get("X-Client-ID") or (request.client.host if request.client else "unknown")
+    admission = get_admission_controller()
+    try:
+        await admission.acquire(client_id)
+    except AdmissionRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": e.reason},
+                            headers={"Retry-After": str(e.retry_after)})
+
     async def stream_response():
-        # Assuming chat_with_user yields chunks of text
-        async for chunk in app_stocks_info(user_message):
-            yield chunk
+        # Assuming chat_with_user yields chunks of text.
+        # When the client disconnects Starlette cancels this generator, which cancels
+        # any in-flight query optimizer / Weaviate / LLM awaits further down.
+        try:
+            async for chunk in app_stocks_info(user_message, optimizer_mode=optimizer_mode, search_profile=search_profile):
+                yield chunk
+        except asyncio.CancelledError:
+            dbg.info("Client disconnected, cancelled response for: %s", user_message)
+            raise
+
+    return AdmittedStreamingResponse(stream_response(), release=lambda: admission.release(client_id),
+                                     media_type="text/plain")
+
+
+@app.get("/query_classifier_stats")
+async def query_classifier_stats_endpoint():
+    # Hit rate of the rule-based query classifier vs. LLM fallbacks since process start
+    return rule_classifier_stats()
+
+
+@app.get("/search_profiles")
+async def search_profiles_endpoint():
+    # Profiles selectable with "search_profile" on /stocks_info
+    settings = get_settings()
+    return {"default": settings.default_profile,
+            "profiles": {name: profile.as_dict() for name, profile in settings.search_profiles.items()}}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus scrape target: per-stage latency, time-to-first-token, tokens/sec, retrieved objects
+    try:
+        body, content_type = metrics_response()
+    except RuntimeError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/admission_stats")
+async def admission_stats_endpoint():
+    # Requests in flight / queued / refused, and free slots per pipeline stage
+    return {"requests": get_admission_controller().stats(), "stages": stage_stats()}
+
 
-    return StreamingResponse(stream_response(), media_type="text/plain")
+@app.get("/cache_stats")
+async def cache_stats_endpoint():
+    return {cache.name: cache.stats() for cache in (optimized_query_cache, ds.context_cache)}
 
 
 if __name__ == "__main__":
     uvicorn.run("endpoints.chat:app", host="0.0.0.0", port=8000, reload=True)
 
 # Example curl command to test the /stocks_info endpoint:
-# curl -X POST "http://localhost:8000/stocks_info" -H "Content-Type: application/json" -d '{"message": "Hello"}'
\ No newline at end of file
+# curl -X POST "http://localhost:8000/stocks_info" -H "Content-Type: application/json" -d '{"message": "Hello"}'
+# curl -X POST "http://localhost:8000/stocks_info" -H "Content-Type: application/json" -d '{"message": "Hello", "optimizer_mode": "one_shot"}'
\ No newline at end of file
@@ -46,4 +46,19 @@ FINANCE_EXPERT_SYSTEM_PROMPTS: dict[str, str] = {
         "V1": FINANCE_EXPERT_SYSTEM_PROMPT_V1,
         "V2": FINANCE_EXPERT_SYSTEM_PROMPT_V2
     }
-    
\ No newline at end of file
+    
+
+# Appended after a server-side aggregation table (see get_aggregate_context)
+AGGREGATE_CONTEXT_INSTRUCTION = (
+    "The table above was computed by the database over every matching row; "
+    "use its numbers as they are, do not re-add or estimate them. "
+    "Values of market_value_lacs_inr are in lakh rupees.\n"
+)
+
+# Mixed questions: retrieved rows plus the aggregate table
+AGGREGATE_WITH_ROWS_INSTRUCTION = (
+    "The rows above are the most relevant matching holdings and may not be all of them; "
+    "the aggregate table was computed by the database over every matching row. "
+    "List holdings from the rows, and take totals, averages and counts only from the table, "
+    "do not re-add or estimate them. Values of market_value_lacs_inr are in lakh rupees.\n"
+)
@@ -0,0 +1,161 @@
+import os
+import re
+from typing import Optional
+
+from debug.logger_config import dbg
+
+# Detects numeric questions ("total market value of IT companies", "top 5 stocks
+# held by Helios", "average AUM % per sector") that are answered exactly by
+# Weaviate's aggregate API instead of by retrieving rows for the LLM to add up.
+
+AGGREGATE_ROUTE_ENABLED = os.environ.get("AGGREGATE_ROUTE_ENABLED", "1") == "1"
+
+NUMERIC_PROPERTIES = ["market_value_lacs_inr", "quantity_of_shares", "asset_under_managment_percentage"]
+GROUP_BY_FIELDS = ["industry_sector", "portfolio_management_services_name", "data_month", "company_or_stock_name"]
+AGGREGATE_METRICS = ("sum", "mean", "count", "top")
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+
+_METRIC_PATTERNS = [
+    ("top", re.compile(r"\b(top|largest|biggest|highest|most|bottom|smallest|lowest|least)\b")),
+    ("mean", re.compile(r"\b(average|avg|mean)\b")),
+    ("sum", re.compile(r"\b(total|sum|overall|combined|aggregate|altogether)\b")),
+    ("count", re.compile(r"\b(how many|count|number of)\b")),
+]
+_PROPERTY_PATTERNS = [
+    ("asset_under_managment_percentage", re.compile(r"\b(aum|allocation|weight|weightage|percentage|percent)\b|%")),
+    ("quantity_of_shares", re.compile(r"\b(shares|quantity|units)\b")),
+    ("market_value_lacs_inr", re.compile(r"\b(market value|value|worth|invested|investment|exposure|holding value|lacs|lakhs?|inr|rupees)\b")),
+]
+# "at least 5%" / "at most 100 shares" are range predicates, not top-k rankings
+_BOUND_PHRASE_RE = re.compile(r"\bat (least|most)\b")
+_FIELD_WORDS = [
+    ("industry_sector", r"sectors?|industr(?:y|ies)"),
+    ("portfolio_management_services_name", r"pms|portfolio managers?|portfolio management services|fund houses?|managers?"),
+    ("data_month", r"months?|monthly"),
+    ("company_or_stock_name", r"compan(?:y|ies)|stocks?|holdings?|names"),
+]
+# "by sector", "per PMS", "for each month", "sector wise", "month-wise"
+_GROUP_BY_PATTERNS = [
+    (field, re.compile(rf"\b(?:by|per|each|every|across|wise)\s+(?:{words})\b|\b(?:{words})[\s-]?wise\b"))
+    for field, words in _FIELD_WORDS
+]
+# The noun ranked by a top-k question: "top 5 sectors", "largest holdings"
+_TOP_NOUN_PATTERNS = [
+    (field, re.compile(rf"\b(?:top|largest|biggest|highest|most|bottom|smallest|lowest|least)\s+(?:\d+\s+)?(?:{words})\b"))
+    for field, words in _FIELD_WORDS
+]
+# The noun asked about: "which PMS hold the most ...", "what sectors have the highest ..."
+_WHICH_NOUN_PATTERNS = [
+    (field, re.compile(rf"\b(?:which|what)\s+(?:{words})\b"))
+    for field, words in _FIELD_WORDS
+]
+_TOP_K_RE = re.compile(r"\b(?:top|bottom)\s+(\d+)\b|\b(\d+)\s+(?:largest|biggest|highest|smallest|lowest)\b")
+_ASCENDING_RE = re.compile(r"\b(bottom|smallest|lowest|least)\b")
+# "how many companies" counts distinct values rather than rows
+_COUNT_DISTINCT_PATTERNS = [
+    (field, re.compile(rf"\b(?:how many|number of|count of)\s+(?:different\s+|distinct\s+|unique\s+)?(?:{words})\b"))
+    for field, words in _FIELD_WORDS
+]
+# "how many shares of HDFC Bank does Helios hold" asks for a quantity, not a count of rows
+_COUNT_QUANTITY_RE = re.compile(r"\b(?:how many|number of)\s+(?:shares|units)\b")
+
+# Mixed questions also ask for the matching rows next to the numbers:
+# "find all banks held by Helios and their total value", "list the holdings along with the total"
+_ROW_REQUEST_RE = re.compile(
+    r"\b(?:list|find|show|display|name|give)\b(?:\s+me)?\s+(?:all|every)\b"
+    r"|\blist\b|\b(?:their|along with|together with|details?)\b"
+)
+
+
+class AggregateIntent:
+    """
+    A numeric question expressed as an aggregation.
+    Attributes:
+        metric (str): "sum", "mean", "count" or "top".
+        property_name (str): Numeric property aggregated (ranked by, for "top").
+        group_by (str, optional): Field the rows are grouped by.
+        top_k (int): Number of groups kept for "top".
+        ascending (bool): Rank smallest first for "top".
+    """
+    def __init__(self, metric: str, property_name: str, group_by: Optional[str] = None,
+                 top_k: int = DEFAULT_TOP_K, ascending: bool = False):
+        if metric not in AGGREGATE_METRICS:
+            raise ValueError(f"Unknown aggregate metric '{metric}', expected one of {AGGREGATE_METRICS}")
+        if property_name not in NUMERIC_PROPERTIES:
+            raise ValueError(f"Property '{property_name}' cannot be aggregated")
+        if group_by is not None and group_by not in GROUP_BY_FIELDS:
+            raise ValueError(f"Cannot group by '{group_by}'")
+        self.metric = metric
+        self.property_name = property_name
+        self.group_by = group_by
+        self.top_k = top_k
+        self.ascending = ascending
+
+    def key(self) -> str:
+        """Stable string form, used as a cache namespace."""
+        return f"{self.metric}:{self.property_name}:{self.group_by}:{self.top_k}:{int(self.ascending)}"
+
+    def __repr__(self) -> str:
+        return f"AggregateIntent({self.key()})"
+
+
+def detect_numeric_property(text: str) -> Optional[str]:
+    """
+    Returns the numeric property a text talks about ("value" -> market_value_lacs_inr), or None.
+    """
+    text = text.lower()
+    return next((name for name, pattern in _PROPERTY_PATTERNS if pattern.search(text)), None)
+
+
+def asks_for_rows(user_query: str) -> bool:
+    """
+    True if an aggregate question also asks for the matching rows themselves,
+    e.g. "find all companies in banking owned by Helios and their total value",
+    so retrieval has to run next to the aggregation.
+    """
+    return bool(_ROW_REQUEST_RE.search(" ".join(user_query.lower().split())))
+
+
+def detect_aggregate_intent(user_query: str) -> Optional[AggregateIntent]:
+    """
+    Detects an aggregate question with keyword rules.
+    Args:
+        user_query (str): Raw user query.
+    Returns:
+        Optional[AggregateIntent]: The aggregation to run, or None for a regular retrieval question.
+    """
+    if not AGGREGATE_ROUTE_ENABLED or not user_query:
+        return None
+    query = _BOUND_PHRASE_RE.sub(" ", " ".join(user_query.lower().split()))
+    metric = next((name for name, pattern in _METRIC_PATTERNS if pattern.search(query)), None)
+    if metric is None:
+        return None
+    property_name = detect_numeric_property(query)
+    group_by = next((field for field, pattern in _GROUP_BY_PATTERNS if pattern.search(query)), None)
+
+    if metric == "top":
+        noun = next((field for field, pattern in _WHICH_NOUN_PATTERNS + _TOP_NOUN_PATTERNS if pattern.search(query)), None)
+        if noun is None and property_name is None:
+            # "most popular", "highest growth": not something the numeric columns answer
+            return None
+        group_by = noun or group_by or "company_or_stock_name"
+        top_k_match = _TOP_K_RE.search(query)
+        top_k = int(next(g for g in top_k_match.groups() if g)) if top_k_match else DEFAULT_TOP_K
+        intent = AggregateIntent("top", property_name or "market_value_lacs_inr", group_by,
+                                 top_k=min(max(top_k, 1), MAX_TOP_K), ascending=bool(_ASCENDING_RE.search(query)))
+    elif metric == "count" and _COUNT_QUANTITY_RE.search(query):
+        intent = AggregateIntent("sum", "quantity_of_shares", group_by)
+    elif metric == "count":
+        distinct = next((field for field, pattern in _COUNT_DISTINCT_PATTERNS if pattern.search(query)), None)
+        if distinct is None:
+            # "how many times was HDFC bought": no countable noun, leave it to retrieval
+            return None
+        intent = AggregateIntent("count", property_name or "market_value_lacs_inr", group_by or distinct)
+    else:
+        if property_name is None:
+            # "overall view of ..." without a numeric column is not an aggregate question
+            return None
+        intent = AggregateIntent(metric, property_name, group_by)
+    dbg.info("Aggregate intent detected: %s", intent)
+    return intent
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from query_optimizer.query_transformer import optimized_query_cache, query_optimizer, QUERY_OPTIMIZER_MODES
+from weaviate_database.db_collection import context_cache, get_context_for_queries
+
+# Compares the "two_step" and "one_shot" query optimizer modes.
+# Needs a running Ollama and Weaviate (same setup as the /stocks_info endpoint).
+# p3 -m query_optimizer.bench_query_optimizer
+
+bench_queries = [
+    "HDFC Bank July Helios PMS",
+    "List all companies in the automobile sector.",
+    "Show holdings of Helios PMS in the month of August.",
+    "What is the total market value of companies in the IT industry?",
+    "Get the quantity and market value of HDFC Bank held by Axis PMS in July.",
+    "Compare the AUM percentage of HDFC Bank and ICICI Bank in August.",
+    "Which PMS holds the highest number of shares in the IT industry?",
+    "Find all companies in the banking sector owned by Helios PMS and show their total market value in August.",
+    "Can you tell me which companies were held in July or August by Helios or Axis PMS?",
+    "I just want to know the companies managed by Helios PMS last month, but I don’t care about their exact quantity.",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def jaccard(a: list[str], b: list[str]) -> float:
+    set_a, set_b = set(a), set(b)
+    if not set_a and not set_b:
+        return 1.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+async def run_mode(mode: str, query: str) -> dict:
+    # Every repeat has to reach the LLM and the vector DB, not the previous run's cache entries
+    optimized_query_cache.clear()
+    context_cache.clear()
+
+    start = time.perf_counter()
+    search_queries = await query_optimizer(query, mode=mode)
+    optimize_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    context = await get_context_for_queries(search_queries)
+    retrieve_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "optimized_query": " | ".join(search_queries),
+        "optimize_ms": round(optimize_ms, 1),
+        "retrieve_ms": round(retrieve_ms, 1),
+        "context": context,
+    }
+
+
+async def run_benchmark(repeats: int = 3):
+    print("\n================= Query Optimizer Mode Benchmark =================\n")
+
+    results = []
+    latencies: dict[str, list[float]] = {mode: [] for mode in QUERY_OPTIMIZER_MODES}
+    overlaps: list[float] = []
+
+    for i, query in enumerate(bench_queries, start=1):
+        print(f"\n================= Query {i} =================")
+        print(f"User Query: {query}\n")
+        entry = {"query_number": i, "user_query": query}
+
+        for mode in QUERY_OPTIMIZER_MODES:
+            runs = [await run_mode(mode, query) for _ in range(repeats)]
+            latencies[mode].extend(run["optimize_ms"] for run in runs)
+            last = runs[-1]
+            entry[mode] = {
+                "optimized_query": last["optimized_query"],
+                "optimize_ms": [run["optimize_ms"] for run in runs],
+                "retrieve_ms": [run["retrieve_ms"] for run in runs],
+                "context_rows": len(last["context"]),
+                "context": last["context"],
+            }
+            print(f"🔹 {mode}: {last['optimized_query']!r} "
+                  f"({statistics.median(entry[mode]['optimize_ms']):.0f} ms, {len(last['context'])} rows)")
+
+        # Retrieval quality of one_shot measured against the two_step baseline context
+        overlap = jaccard(entry["one_shot"]["context"], entry["two_step"]["context"])
+        entry["context_jaccard_vs_two_step"] = round(overlap, 3)
+        overlaps.append(overlap)
+        print(f"🔹 context overlap (jaccard): {overlap:.2f}")
+        results.append(entry)
+
+    summary = {}
+    for mode, values in latencies.items():
+        summary[mode] = {
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "mean_ms": round(statistics.mean(values), 1),
+        }
+    summary["mean_context_jaccard"] = round(statistics.mean(overlaps), 3)
+
+    print("\n================= Summary =================")
+    print(json.dumps(summary, indent=4))
+
+    json_filename = f"query_optimizer_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(json_filename, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "results": results}, f, ensure_ascii=False, indent=4)
+
+    print(f"\n✅ All results saved to:\n- {json_filename}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,115 @@
+import os
+import re
+from typing import Optional
+
+from data_process.entity_vocabulary import VOCAB_FIELDS, EntityVocabulary, get_entity_vocabulary
+from query_optimizer.aggregate_intent import detect_numeric_property
+from debug.logger_config import dbg
+
+# Query-understanding stage in front of the hybrid search.
+# Entity values named in the user query (company, sector, PMS, month) and
+# numeric bounds ("above 5% AUM", "more than 10,000 shares") are turned into
+# structured filters, so Weaviate only scores the matching rows instead of
+# relying on BM25 / vector similarity to find them.
+
+QUERY_FILTERS_ENABLED = os.environ.get("QUERY_FILTERS_ENABLED", "1") == "1"
+# Fields that become hard filters when named in the query; all are index_filterable in the schema
+FILTER_FIELDS = list(VOCAB_FIELDS)
+
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+_UNIT = r"\s*(%|(?:percent|lakhs?|lacs?|crores?|cr|shares)\b)?"
+_COMPARATORS = {
+    "gte": ["at least", "minimum of", "not less than", ">="],
+    "lte": ["at most", "up to", "upto", "maximum of", "not more than", "<="],
+    "gt": ["above", "over", "more than", "greater than", "higher than", "exceeding", ">"],
+    "lt": ["below", "under", "less than", "lower than", "<"],
+}
+_COMPARATOR_OPS = {words: op for op, comparators in _COMPARATORS.items() for words in comparators}
+_COMPARATOR_RE = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(words) for words in sorted(_COMPARATOR_OPS, key=len, reverse=True)) + r")\s*"
+    + _NUMBER + _UNIT
+)
+_BETWEEN_RE = re.compile(rf"\bbetween\s+{_NUMBER}{_UNIT}\s+and\s+{_NUMBER}{_UNIT}")
+# Words around a bound that are searched for the property it applies to when it has no unit
+_PROPERTY_CONTEXT_WORDS = 4
+
+
+def _unit_property(unit: Optional[str]) -> tuple[Optional[str], float]:
+    """Maps a unit to (numeric property, multiplier to the stored unit)."""
+    if not unit:
+        return None, 1.0
+    if unit in ("%", "percent"):
+        return "asset_under_managment_percentage", 1.0
+    if unit == "shares":
+        return "quantity_of_shares", 1.0
+    if unit.startswith("cr"):
+        # market values are stored in lakh rupees; 1 crore = 100 lakh
+        return "market_value_lacs_inr", 100.0
+    return "market_value_lacs_inr", 1.0
+
+def _bound_property(query: str, start: int, end: int, unit: Optional[str]) -> tuple[Optional[str], float]:
+    property_name, scale = _unit_property(unit)
+    if property_name is None:
+        before = " ".join(query[:start].split()[-_PROPERTY_CONTEXT_WORDS:])
+        after = " ".join(query[end:].split()[:_PROPERTY_CONTEXT_WORDS])
+        property_name = detect_numeric_property(before) or detect_numeric_property(after)
+    return property_name, scale
+
+def extract_range_filters(user_query: str) -> dict[str, dict[str, float]]:
+    """
+    Extracts numeric bounds from a raw user query, e.g. "above 5% AUM" ->
+    {"asset_under_managment_percentage": {"gt": 5.0}}.
+
+    The property is taken from the unit of the number (%, lakh, crore, shares)
+    or else from the words around the bound; bounds whose property cannot be
+    told are ignored.
+    Returns:
+        dict[str, dict[str, float]]: Bounds per numeric property, keyed by "gt", "gte", "lt" or "lte".
+    """
+    query = user_query.lower()
+    ranges: dict[str, dict[str, float]] = {}
+    for match in _BETWEEN_RE.finditer(query):
+        low, low_unit, high, high_unit = match.groups()
+        property_name, scale = _bound_property(query, match.start(), match.end(), low_unit or high_unit)
+        if property_name:
+            ranges.setdefault(property_name, {}).update(
+                gte=float(low.replace(",", "")) * scale, lte=float(high.replace(",", "")) * scale
+            )
+        query = query[:match.start()] + " " * (match.end() - match.start()) + query[match.end():]
+    for match in _COMPARATOR_RE.finditer(" ".join(query.split())):
+        comparator, value, unit = match.groups()
+        property_name, scale = _bound_property(match.string, match.start(), match.end(), unit)
+        if property_name:
+            ranges.setdefault(property_name, {})[_COMPARATOR_OPS[comparator]] = float(value.replace(",", "")) * scale
+    return ranges
+
+def extract_query_filters(user_query: str, vocab: Optional[EntityVocabulary] = None) -> dict[str, list[str] | dict[str, float]]:
+    """
+    Extracts filter values per field from a raw user query.
+
+    Phrases that name values of more than one field (e.g. "axis" as a PMS
+    and as part of a company alias) are left to the free-text search instead
+    of being guessed into a filter.
+    Args:
+        user_query (str): Raw user query.
+        vocab (EntityVocabulary, optional): Entity vocabulary; defaults to the one saved at ingestion.
+    Returns:
+        dict: Allowed values per text field, plus bounds per numeric field (see
+            extract_range_filters); empty when nothing is filterable.
+    """
+    if not QUERY_FILTERS_ENABLED or not user_query:
+        return {}
+    vocab = vocab if vocab is not None else get_entity_vocabulary()
+    filters: dict[str, set[str]] = {}
+    for phrase, entries in vocab.match_phrases(user_query):
+        fields = {field for field, _ in entries}
+        if len(fields) > 1:
+            dbg.info("Entity '%s' is ambiguous across %s, not filtering on it", phrase, sorted(fields))
+            continue
+        for field, value in entries:
+            if field in FILTER_FIELDS:
+                filters.setdefault(field, set()).add(value)
+    result = {field: sorted(values) for field, values in filters.items()} | extract_range_filters(user_query)
+    if result:
+        dbg.info("Query filters extracted: %s", result)
+    return result
@@ -3,39 +3,102 @@ from langchain_core.messages import HumanMessage
 from langchain_core.messages import SystemMessage
 from langchain_ollama import ChatOllama
 import asyncio
+import json
+import os
+import re
+from typing import Optional
 from debug.logger_config import dbg
+from debug.metrics import traced_stage
+from admission.controller import stage_slot
+from query_optimizer.rule_classifier import classify_query_by_rules
+from cache.semantic_cache import SemanticCache
+from weaviate_database.db_collection import COLLECTION_NAME
 from prompts.query_prompt import QUERY_TRANS_PROMPT, QUERY_CLASSIFIER_PROPMT
+from prompts.query_prompt import QUERY_CLASSIFY_AND_TRANSFORM_PROMPT, QUERY_CLASSIFY_AND_TRANSFORM_SCHEMA
+
+# Ollama server used by the query optimizer and answer LLMs
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 
 query_optimizer_llm = ChatOllama(
     model="llama3.2:latest",
     # model = "deepseek-r1:1.5b",
-    base_url="http://localhost:11434",
+    base_url=OLLAMA_BASE_URL,
     temperature=0.1,
     reasoning=False
     )
 
+# Upper bound (seconds) for a single query optimizer LLM round trip
+QUERY_OPTIMIZER_TIMEOUT = float(os.environ.get("QUERY_OPTIMIZER_TIMEOUT", "15"))
+# Upper bound (seconds) for waiting for a "query_optimizer" stage slot, on top of the round trip
+QUERY_OPTIMIZER_QUEUE_TIMEOUT = float(os.environ.get("QUERY_OPTIMIZER_QUEUE_TIMEOUT", "10"))
+
+# "two_step": classifier call followed by a transformer call (two LLM round trips)
+# "one_shot": a single structured-output call returning both the class and the transformed query
+QUERY_OPTIMIZER_MODES = ("two_step", "one_shot")
+QUERY_OPTIMIZER_MODE = os.environ.get("QUERY_OPTIMIZER_MODE", "two_step")
+
+# Optimized queries per (mode, normalized user query), invalidated when the collection is re-ingested
+optimized_query_cache = SemanticCache("optimized_query", collection_name=COLLECTION_NAME)
+
+
+async def ainvoke_query_llm(messages: list[BaseMessage], timeout: Optional[float] = None, **kwargs) -> BaseMessage:
+    """
+    Awaits the query optimizer LLM without blocking the event loop.
+
+    Raises asyncio.TimeoutError if the call takes longer than `timeout` seconds
+    (QUERY_OPTIMIZER_TIMEOUT when not given).
+    If the calling task is cancelled (e.g. the HTTP client disconnected and the
+    streaming response was torn down) the in-flight Ollama request is cancelled too.
+    Extra keyword arguments (e.g. `format`) are passed through to ChatOllama.
+    Waiting for a "query_optimizer" stage slot does not count towards the
+    timeout; it is bounded by QUERY_OPTIMIZER_QUEUE_TIMEOUT and also raises
+    asyncio.TimeoutError (counted in the stage's wait_timeouts).
+    """
+    try:
+        async with stage_slot("query_optimizer", timeout=QUERY_OPTIMIZER_QUEUE_TIMEOUT):
+            return await asyncio.wait_for(
+                query_optimizer_llm.ainvoke(messages, **kwargs),
+                timeout=QUERY_OPTIMIZER_TIMEOUT if timeout is None else timeout,
+            )
+    except asyncio.CancelledError:
+        dbg.info("Query optimizer LLM call cancelled")
+        raise
+
+
+@traced_stage("query_classifier")
 async def query_classifier(user_query: str) -> str:
     """
     Classify the user query into one of the transformation types:
-    'rewrite', 'expand', or 'decompose', using an LLM.
+    'rewrite', 'expand', or 'decompose'. Obvious cases are handled by the
+    rule-based classifier; the LLM is only called when the rules are unsure.
     """
-    dbg.info(f"Classifying user query: {user_query}")
+    dbg.info("Classifying user query: %s", user_query)
+    rule_class = classify_query_by_rules(user_query)
+    if rule_class is not None:
+        dbg.info("Rule-based classification result: %s", rule_class)
+        return rule_class
+
     system_message = SystemMessage(content=QUERY_CLASSIFIER_PROPMT)
     human_message = HumanMessage(content=user_query)
 
-    response = query_optimizer_llm.invoke([system_message, human_message])
-    dbg.debug(f"LLM response for classification: {response}")
+    try:
+        response = await ainvoke_query_llm([system_message, human_message])
+    except asyncio.TimeoutError:
+        dbg.warning("Query classification timed out after %ss, defaulting to 'rewrite'", QUERY_OPTIMIZER_TIMEOUT)
+        return "rewrite"
+    dbg.debug("LLM response for classification: %s", response)
     res = response.content
     classification  = res
 
-    dbg.info(f"Classification result: {classification}")
+    dbg.info("Classification result: %s", classification)
     if classification not in ["rewrite", "expand", "decompose"]:
-        dbg.warning(f"Unknown classification '{classification}', defaulting to 'rewrite'")
+        dbg.warning("Unknown classification '%s', defaulting to 'rewrite'", classification)
         classification = "rewrite"
 
     return classification
 
 
+@traced_stage("query_transformer")
 async def query_transformer(user_input: str, transformer: str) -> str:
     """
     Asynchronously transforms a user query using a specified transformer model.
@@ -46,48 +109,143 @@ async def query_transformer(user_input: str, transformer: str) -> str:
 
     Returns:
         str: The transformed query or response generated by the transformer.
+             The original query is returned if the LLM call times out.
     """
     system_message = SystemMessage(content=transformer)
     human_message = HumanMessage(content=user_input)
 
-    response = query_optimizer_llm.invoke([system_message, human_message])
-    dbg.debug(f"LLM response for transformation: {response}")
+    try:
+        response = await ainvoke_query_llm([system_message, human_message])
+    except asyncio.TimeoutError:
+        dbg.warning("Query transformation timed out after %ss, using the original query", QUERY_OPTIMIZER_TIMEOUT)
+        return user_input
+    dbg.debug("LLM response for transformation: %s", response)
     res = response.content
 
     if not isinstance(res, str):
-        dbg.warning(f"Transformation result is not a string: {res}, converting to string.")
+        dbg.warning("Transformation result is not a string: %s, converting to string.", res)
         res = str(res)
     return res
 
 
-async def query_optimizer(user_query: str) -> str:
+@traced_stage("query_classify_and_transform")
+async def query_classify_and_transform(user_query: str) -> tuple[str, str]:
+    """
+    Classifies and transforms a user query with a single structured-output LLM call.
+
+    Args:
+        user_query (str): The input query from the user.
+
+    Returns:
+        tuple[str, str]: The query class ('rewrite', 'expand' or 'decompose') and the transformed query.
+                         Falls back to ('rewrite', user_query) if the call times out or the output cannot be parsed.
+    """
+    dbg.info("Classifying and transforming user query: %s", user_query)
+    system_message = SystemMessage(content=QUERY_CLASSIFY_AND_TRANSFORM_PROMPT)
+    human_message = HumanMessage(content=user_query)
+
+    try:
+        response = await ainvoke_query_llm([system_message, human_message], format=QUERY_CLASSIFY_AND_TRANSFORM_SCHEMA)
+    except asyncio.TimeoutError:
+        dbg.warning("Query optimization timed out after %ss, using the original query", QUERY_OPTIMIZER_TIMEOUT)
+        return "rewrite", user_query
+    dbg.debug("LLM response for classification and transformation: %s", response)
+
+    try:
+        result = json.loads(response.content)
+        query_class = result["query_class"]
+        optimized_query = result["optimized_query"]
+    except (TypeError, ValueError, KeyError) as e:
+        dbg.warning("Could not parse one-shot optimizer output '%s': %s, using the original query", response.content, e)
+        return "rewrite", user_query
+
+    if query_class not in ["rewrite", "expand", "decompose"]:
+        dbg.warning("Unknown classification '%s', defaulting to 'rewrite'", query_class)
+        query_class = "rewrite"
+    if not isinstance(optimized_query, str) or not optimized_query.strip():
+        dbg.warning("Empty one-shot transformation result: %s, using the original query", optimized_query)
+        optimized_query = user_query
+
+    return query_class, optimized_query
+
+
+_NUMBERED_ITEM_RE = re.compile(r"(?:^|\s)\d+[.)]\s+")
+
+def parse_sub_queries(optimized_query: str, max_sub_queries: int = 3) -> list[str]:
+    """
+    Splits decomposer output ("1. companies in finance sector. 2. total quantity in July.")
+    into individual sub-queries. Output that is not a numbered list is returned as a single query.
+    Only meant for "decompose" output; other classes may contain "2025. " and the like.
+    """
+    parts = _NUMBERED_ITEM_RE.split(optimized_query.strip())
+    sub_queries = [part.strip().rstrip(".").strip() for part in parts]
+    sub_queries = [q for q in sub_queries if q]
+    if len(sub_queries) <= 1:
+        return [optimized_query.strip()] if optimized_query.strip() else []
+    return sub_queries[:max_sub_queries]
+
+
+async def query_optimizer(user_query: str, mode: Optional[str] = None) -> list[str]:
     """
     Optimizes a user-provided query by classifying its type and transforming it accordingly.
     Args:
         user_query (str): The input query string from the user.
+        mode (str, optional): "two_step" or "one_shot" (see QUERY_OPTIMIZER_MODES).
+                              Defaults to QUERY_OPTIMIZER_MODE.
     Returns:
-        str: The optimized version of the input query.
+        list[str]: The queries to search: the optimized query, or the sub-queries
+                   of a decomposed query. [user_query] if nothing changed.
     Raises:
+        ValueError: If `mode` is not a supported optimizer mode.
         Exception: Propagates any exceptions raised during query classification or transformation.
     Notes:
         - The function uses `query_classifier` to determine the query type.
         - Supported query types are "rewrite", "expand", and "decompose". If the type is not recognized, "rewrite" is used by default.
         - The actual transformation is performed asynchronously by `query_transformer` using a prompt specific to the query type.
+        - Only "decompose" output is split into sub-queries (parse_sub_queries); a rewrite
+          such as "HDFC Bank, July 2025. Helios PMS" stays one query.
+        - In "one_shot" mode both steps are done by `query_classify_and_transform` in a single LLM round trip.
+        - Results are cached in `optimized_query_cache`, so repeated questions skip the LLM entirely.
+        - Each LLM call is bounded by QUERY_OPTIMIZER_TIMEOUT; on timeout the classifier falls back to "rewrite"
+          and the transformer returns the original query.
     """
     optimized_query: str = ""
+    mode = mode or QUERY_OPTIMIZER_MODE
+    if mode not in QUERY_OPTIMIZER_MODES:
+        raise ValueError(f"Unknown query optimizer mode '{mode}'. Expected one of {QUERY_OPTIMIZER_MODES}.")
 
-    query_class = await query_classifier(user_query)
-    dbg.info(f"Query transformer class ............... {query_class}")
+    cached_queries = await optimized_query_cache.get(user_query, namespace=mode)
+    if cached_queries is not None:
+        dbg.info("Optimized query cache hit ............... %s", cached_queries)
+        return cached_queries
 
-    if query_class not in ["rewrite", "expand", "decompose"]:
-        dbg.warning(f"Unknown query class '{query_class}', defaulting to 'rewrite'")
-        query_class = "rewrite"
+    if mode == "one_shot":
+        query_class, optimized_query = await query_classify_and_transform(user_query)
+        dbg.info("Query transformer class ............... %s", query_class)
+    else:
+        query_class = await query_classifier(user_query)
+        dbg.info("Query transformer class ............... %s", query_class)
+
+        if query_class not in ["rewrite", "expand", "decompose"]:
+            dbg.warning("Unknown query class '%s', defaulting to 'rewrite'", query_class)
+            query_class = "rewrite"
+
+        optimized_query = await query_transformer(user_query, QUERY_TRANS_PROMPT[query_class])
+    dbg.info("Optimizing user query ................ %s", user_query)
+    dbg.info("Optimized query ............... %s", optimized_query)
+
+    if query_class == "decompose":
+        search_queries = parse_sub_queries(optimized_query)
+    else:
+        search_queries = [optimized_query.strip()] if optimized_query.strip() else []
+    if not search_queries:
+        search_queries = [user_query]
+
+    # An unchanged query means the LLM timed out or had nothing to add; don't pin that in the cache
+    if search_queries != [user_query]:
+        await optimized_query_cache.set(user_query, search_queries, namespace=mode)
 
-    optimized_query = await query_transformer(user_query, QUERY_TRANS_PROMPT[query_class])
-    dbg.info(f"Optimizing user query ................ {user_query}")
-    dbg.info(f"Optimized query ............... {optimized_query}")
- 
-    return optimized_query
+    return search_queries
 
 
 ########### For Manual input testing ###########
@@ -100,19 +258,19 @@ async def main ():
             dbg.info("Exiting manual input loop.")
             break
 
-        dbg.info(f"Received user input: {user_query}")
+        dbg.info("Received user input: %s", user_query)
         query_class = await query_classifier(user_query)
         print(f"Classification: {query_class}")
-        dbg.info(f"Classification: {query_class}")
+        dbg.info("Classification: %s", query_class)
         if query_class not in ["rewrite", "expand", "decompose"]:
-            dbg.warning(f"Unknown classification '{query_class}', defaulting to 'rewrite'")
+            dbg.warning("Unknown classification '%s', defaulting to 'rewrite'", query_class)
             query_class = "rewrite"
         else:
             dbg.info("Classification recognized.")
             print("Unknown classification. No transformation applied.")
         
         optimized_query = await query_transformer(user_query, QUERY_TRANS_PROMPT[query_class])
-        dbg.info(f"Optimized query: {optimized_query}")
+        dbg.info("Optimized query: %s", optimized_query)
         print(f"Optimized Query: {optimized_query}")
         
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import re
+from collections import Counter
+from typing import Optional
+
+from data_process.entity_vocabulary import EntityVocabulary, get_entity_vocabulary
+from debug.logger_config import dbg
+
+# Deterministic fast path in front of the LLM query classifier.
+# Handles the obvious cases (keyword-style lookups, clearly multi-intent questions,
+# long single-intent chatter) and returns None when unsure, so the caller can
+# fall back to the LLM.
+
+CONJUNCTIONS = {"and", "or", "also", "plus", "versus", "vs", "between", "either", "both"}
+COMPARISON_WORDS = {"compare", "comparison", "versus", "vs", "between"}
+FILLER_WORDS = {
+    "i", "me", "my", "you", "please", "can", "could", "would", "want", "wanted", "tell",
+    "know", "like", "just", "curious", "trying", "figure", "interested", "particularly",
+    "especially", "looking", "wondering", "help", "maybe", "might", "some", "kind",
+}
+QUESTION_WORDS = {"what", "which", "who", "how", "when", "where", "why"}
+
+# A keyword-style query has at most this many words
+KEYWORD_QUERY_MAX_WORDS = 8
+# A conversational single-intent query has at least this many words
+VERBOSE_QUERY_MIN_WORDS = 15
+# A multi-intent query has at least this many words
+DECOMPOSE_MIN_WORDS = 12
+
+_WORD_RE = re.compile(r"\w+")
+
+rule_classifier_counters: Counter = Counter()
+
+
+def classify_query_by_rules(user_query: str, vocab: Optional[EntityVocabulary] = None) -> Optional[str]:
+    """
+    Classifies a query as 'rewrite', 'expand' or 'decompose' without an LLM call.
+
+    Args:
+        user_query (str): Raw user query.
+        vocab (EntityVocabulary, optional): Entity vocabulary; defaults to the one saved at ingestion.
+
+    Returns:
+        Optional[str]: The query class, or None if the rules are not confident and
+                       the LLM classifier should decide.
+    """
+    vocab = vocab if vocab is not None else get_entity_vocabulary()
+    words = [w.lower() for w in _WORD_RE.findall(user_query)]
+    if not words:
+        rule_classifier_counters["llm_fallback"] += 1
+        return None
+
+    conjunctions = sum(1 for w in words if w in CONJUNCTIONS) + user_query.count(",")
+    fillers = sum(1 for w in words if w in FILLER_WORDS)
+    is_question = user_query.strip().endswith("?") or words[0] in QUESTION_WORDS
+    entities = vocab.match(user_query)
+    specific_entities = {field: values for field, values in entities.items() if field != "industry_sector"}
+    entity_hits = sum(len(values) for values in entities.values())
+
+    query_class = None
+    if (len(words) >= DECOMPOSE_MIN_WORDS and conjunctions >= 2) \
+            or (COMPARISON_WORDS.intersection(words) and entity_hits >= 2):
+        query_class = "decompose"
+    elif len(words) <= KEYWORD_QUERY_MAX_WORDS and fillers == 0 and not is_question and conjunctions <= 1:
+        if specific_entities:
+            # Already a keyword lookup for a known company / PMS / month
+            query_class = "rewrite"
+        elif len(vocab) and (not entity_hits or set(entities) == {"industry_sector"}):
+            # Short and broad (only a sector, or nothing we know): enrich it. Without a
+            # vocabulary (nothing ingested yet) every query looks like that; let the LLM decide
+            query_class = "expand"
+    elif len(words) >= VERBOSE_QUERY_MIN_WORDS and conjunctions == 0 and fillers >= 2:
+        query_class = "rewrite"
+
+    if query_class is None:
+        rule_classifier_counters["llm_fallback"] += 1
+        return None
+
+    rule_classifier_counters[f"rule_{query_class}"] += 1
+    dbg.debug("Rule classifier: '%s' -> %s (entities: %s)", user_query, query_class, entities)
+    return query_class
+
+
+def rule_classifier_stats() -> dict:
+    """
+    Returns the rule classifier counters and the share of queries it resolved without the LLM.
+    """
+    stats = dict(rule_classifier_counters)
+    rule_hits = sum(count for key, count in stats.items() if key.startswith("rule_"))
+    total = rule_hits + stats.get("llm_fallback", 0)
+    stats["rule_hits"] = rule_hits
+    stats["total"] = total
+    stats["hit_rate"] = round(rule_hits / total, 4) if total else 0.0
+    return stats
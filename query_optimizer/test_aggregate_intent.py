@@ -0,0 +1,33 @@
+import pytest
+
+from query_optimizer.aggregate_intent import asks_for_rows, detect_aggregate_intent
+
+# Keyword routing of numeric questions to Weaviate's aggregate API.
+# p3 -m pytest query_optimizer/test_aggregate_intent.py
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is the total market value of companies in the IT industry?", "sum:market_value_lacs_inr:None:5:0"),
+    ("Top 3 sectors by AUM percentage for Helios PMS", "top:asset_under_managment_percentage:industry_sector:3:0"),
+    ("How many companies does Helios PMS hold?", "count:market_value_lacs_inr:company_or_stock_name:5:0"),
+    # A share quantity, not a count of company rows
+    ("How many shares of HDFC Bank does Helios PMS hold in July?", "sum:quantity_of_shares:None:5:0"),
+    ("Number of shares held per PMS", "sum:quantity_of_shares:portfolio_management_services_name:5:0"),
+])
+def test_detect_aggregate_intent(query, expected):
+    intent = detect_aggregate_intent(query)
+    assert intent is not None and intent.key() == expected
+
+
+@pytest.mark.parametrize("query", [
+    "List all companies in the automobile sector.",
+    # A count without a countable noun is left to retrieval
+    "How many times did Helios PMS buy HDFC Bank?",
+])
+def test_regular_questions_are_not_aggregates(query):
+    assert detect_aggregate_intent(query) is None
+
+
+def test_asks_for_rows():
+    assert asks_for_rows("Find all companies in banking owned by Helios PMS and their total market value")
+    assert not asks_for_rows("How many shares of HDFC Bank does Helios PMS hold in July?")
@@ -5,45 +5,174 @@ from langchain_ollama import ChatOllama
 
 import weaviate_database.db_collection as ds
 import query_optimizer.query_transformer as qo
-from prompts.chat_prompt import FINANCE_EXPERT_SYSTEM_PROMPTS
+from query_optimizer.filter_extractor import extract_query_filters
+from query_optimizer.aggregate_intent import asks_for_rows, detect_aggregate_intent
+from rag.context_builder import build_context
+from rag.reranker import get_reranker, rerank_hits
+from config.settings import SearchProfile, get_settings
+from prompts.chat_prompt import FINANCE_EXPERT_SYSTEM_PROMPTS, AGGREGATE_CONTEXT_INSTRUCTION, AGGREGATE_WITH_ROWS_INSTRUCTION
 from debug.logger_config import dbg
-from typing import AsyncGenerator
+from debug.metrics import observe_generation, observe_retrieved, observe_stage, stage_span
+from admission.controller import stage_slot
+from typing import AsyncGenerator, Callable, Optional
+import asyncio
+import heapq
+import time
 from langchain_core.messages import SystemMessage, HumanMessage
 
 
 chat_response_llm = ChatOllama(
     model="llama3.2:latest",
     # model = "deepseek-r1:1.5b",
-    base_url="http://localhost:11434",
+    base_url=qo.OLLAMA_BASE_URL,
     temperature=0.4,
     reasoning=False
     )
 
-async def app_stocks_info(user_query: str) -> AsyncGenerator[str, None]:
+def score_margin(hits: list[dict]) -> float:
+    """
+    How clearly the best hit stands out: the gap to the runner-up as a share of
+    the best score (1.0 for a single hit, 0.0 for none or a tie). Unlike the
+    fused score of the best hit, which relative_score fusion normalizes to about
+    1 for any query, this stays low when a vague query matches many rows alike.
+    """
+    scores = heapq.nlargest(2, (hit["score"] or 0.0 for hit in hits))
+    if not scores or scores[0] <= 0:
+        return 0.0
+    runner_up = scores[1] if len(scores) > 1 else 0.0
+    return (scores[0] - runner_up) / scores[0]
+
+
+async def speculative_retrieve(user_query: str, optimizer_mode: Optional[str], entity_filters: dict,
+                               profile: SearchProfile, limit: Optional[int] = None,
+                               end_stage: Optional[Callable[[str], None]] = None) -> list[dict]:
+    """
+    Retrieves hits for a user query, searching the raw query concurrently with
+    the LLM query rewrite instead of after it.
+
+    - Raw-query results with a clear best hit (score_margin of at least
+      profile.speculative_min_margin) are used right away and the rewrite is cancelled.
+    - Otherwise the rewrite gets up to profile.speculative_wait_ms more; if it is
+      slower (or returns the query unchanged) the raw results are used.
+    - A rewrite in time is searched too and its hits are merged with the raw
+      hits by reciprocal-rank fusion.
+    If the raw search finds nothing, the rewrite is awaited without the extra limit.
+    """
+    end_stage = end_stage or (lambda name: None)
+    optimize_task = asyncio.create_task(qo.query_optimizer(user_query, mode=optimizer_mode))
+    try:
+        raw_hits = await ds.get_hits_for_queries([user_query], entity_filters=entity_filters, limit=limit, profile=profile)
+        end_stage("speculative_retrieve")
+        margin = score_margin(raw_hits)
+        if raw_hits and margin >= profile.speculative_min_margin:
+            dbg.info("Speculative search: raw query results used (score margin %.2f)", margin)
+            return raw_hits
+        timeout = profile.speculative_wait_ms / 1000 if raw_hits else None
+        try:
+            sub_queries = await asyncio.wait_for(asyncio.shield(optimize_task), timeout=timeout)
+        except asyncio.TimeoutError:
+            dbg.info("Speculative search: rewrite slower than %d ms, raw query results used", profile.speculative_wait_ms)
+            return raw_hits
+        end_stage("optimize")
+        if not sub_queries or sub_queries == [user_query]:
+            return raw_hits
+        optimized_hits = await ds.get_hits_for_queries(sub_queries, entity_filters=entity_filters, limit=limit, profile=profile)
+        end_stage("retrieve")
+        if not raw_hits:
+            return optimized_hits
+        dbg.info("Speculative search: raw and rewritten query results merged")
+        return ds.reciprocal_rank_fusion([optimized_hits, raw_hits])
+    finally:
+        # A rewrite that is no longer needed would only compete with the answer LLM
+        if not optimize_task.done():
+            optimize_task.cancel()
+
+
+async def app_stocks_info(user_query: str, optimizer_mode: Optional[str] = None,
+                          search_profile: Optional[str] = None) -> AsyncGenerator[str, None]:
     """
     Asynchronously streams an AI-generated response to a user query 
     using a Retrieval-Augmented Generation (RAG) workflow.
 
     Args:
         user_query (str): The user's input question or message.
+        optimizer_mode (str, optional): Query optimizer mode, "two_step" or "one_shot".
+            Defaults to the optimizer's configured mode.
+        search_profile (str, optional): Named retrieval profile (see config.settings),
+            e.g. "fast" or "recall". Defaults to the configured default profile.
 
     Yields:
         str: Incremental chunks of the generated response text.
 
     Workflow:
+        0. Numeric questions (totals, averages, counts, top-k) are answered from a
+           server-side aggregation table instead, skipping steps 1-2. Questions that
+           also ask for the rows ("find all ... and their total value") get both, the
+           table after the retrieved rows. An aggregate matching nothing is ignored.
         1. Optimizes the user's query for better retrieval relevance.
-        2. Fetches related context from the vector database.
+        2. Fetches related context from the vector database (sub-queries of a
+           decomposed query are searched concurrently and fused), filtered on the
+           companies, sectors, PMS and months named in the raw query. The rows
+           are optionally reranked (wider retrieval, top-k kept), de-duplicated and
+           packed into compact tables within a token budget.
+           With a speculative profile, the raw query is searched while step 1 runs
+           (see speculative_retrieve).
         3. Streams an LLM-generated answer using the retrieved context.
     """
     system_message = SystemMessage(content=FINANCE_EXPERT_SYSTEM_PROMPTS["V2"])
-
-    # 1. Optimize user query and fetch contextual information
-    optimized_query = await qo.query_optimizer(user_query)
-    context = await ds.get_context_from_vector_db(optimized_query)
+    profile = get_settings().search_profile(search_profile)
+
+    stage_ms: dict[str, float] = {}
+    request_start = stage_start = time.perf_counter()
+
+    def end_stage(name: str) -> None:
+        nonlocal stage_start
+        now = time.perf_counter()
+        stage_ms[name] = round((now - stage_start) * 1000, 1)
+        observe_stage(name, now - stage_start)
+        stage_start = now
+
+    # Spans of the retrieval stages nest under this one; the streamed answer is measured separately
+    with stage_span("prepare_context", profile=profile.name):
+        # Entities are taken from the raw query; the rewrite may paraphrase or drop them
+        entity_filters = extract_query_filters(user_query)
+
+        # 0. Aggregate questions: let Weaviate compute the numbers
+        aggregate_intent = detect_aggregate_intent(user_query)
+        aggregate_context = await ds.get_aggregate_context(aggregate_intent, entity_filters) if aggregate_intent else []
+        instruction = AGGREGATE_CONTEXT_INSTRUCTION if aggregate_context else ""
+        if aggregate_intent:
+            end_stage("aggregate")
+        context = []
+
+        # 1. Optimize user query and fetch contextual information; mixed questions
+        #    ("find all banks held by Helios and their total value") need the rows too
+        if not aggregate_context or asks_for_rows(user_query):
+            reranker = get_reranker(profile.reranker)
+            # With a reranker, retrieve a wider fixed candidate set and let it pick the rows
+            limit = profile.rerank_candidates if reranker else None
+            if profile.speculative:
+                hits = await speculative_retrieve(user_query, optimizer_mode, entity_filters, profile, limit, end_stage)
+            else:
+                # Decomposed queries come back as several sub-queries; each is searched concurrently
+                sub_queries = await qo.query_optimizer(user_query, mode=optimizer_mode)
+                end_stage("optimize")
+                hits = await ds.get_hits_for_queries(sub_queries, entity_filters=entity_filters, limit=limit, profile=profile)
+                end_stage("retrieve")
+            if reranker:
+                hits = await rerank_hits(user_query, hits, top_k=profile.rerank_top_k, reranker=reranker)
+                end_stage("rerank")
+            context, context_stats = build_context(hits, token_budget=profile.context_token_budget)
+            observe_retrieved("context", context_stats["rows_used"])
+            end_stage("context")
+            if aggregate_context:
+                instruction = AGGREGATE_WITH_ROWS_INSTRUCTION
+        context += aggregate_context
+        dbg.info("Stage latency (ms) [profile=%s]: %s", profile.name, stage_ms)
 
     # 2. Prepare human message with retrieved context
     human_message = HumanMessage(
-        content="\n".join(context) + f"\n\nUser's Query: {user_query}\nAnswer:"
+        content="\n".join(context) + f"\n{instruction}\nUser's Query: {user_query}\nAnswer:"
     )
 
     CHUNK_SIZE = 128
@@ -66,12 +195,32 @@ async def app_stocks_info(user_query: str) -> AsyncGenerator[str, None]:
     # if buffer:
     #     yield buffer
 
-    async for chunk in chat_response_llm.astream([system_message, human_message]):
-        content = getattr(chunk, "content", None)
-        if not isinstance(content, str) or not content:
-            continue
-
-        yield content
+    first_token_at = None
+    streamed_chunks = output_tokens = 0
+    # The answer LLM holds an "llm" stage slot for the whole stream
+    async with stage_slot("llm"):
+        async for chunk in chat_response_llm.astream([system_message, human_message]):
+            # Ollama reports the generated token count on the last chunk
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                output_tokens = usage.get("output_tokens", output_tokens)
+            content = getattr(chunk, "content", None)
+            if not isinstance(content, str) or not content:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                end_stage("first_token")
+            streamed_chunks += 1
+
+            yield content
+
+    end_stage("generate")
+    # Streamed chunks are roughly one token each when the count is not reported
+    output_tokens = output_tokens or streamed_chunks
+    time_to_first_token = first_token_at - request_start if first_token_at is not None else None
+    observe_generation(time_to_first_token, output_tokens, stage_ms["generate"] / 1000)
+    dbg.info("Answer streamed: ttft %.2f s, %d tokens, generation %s ms",
+             time_to_first_token or 0, output_tokens, stage_ms["generate"])
 
 
 ############# Test code for chat_with_user ############# 
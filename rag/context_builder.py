@@ -0,0 +1,129 @@
+import math
+import os
+from typing import Optional
+
+from debug.logger_config import dbg
+
+# Assembles the LLM context from retrieved hits under a token budget.
+# Rows are taken best-score first, near-identical rows are dropped, and the
+# kept rows are rendered as compact per-company (or per-PMS) tables instead of
+# one combined_text sentence per row.
+
+# Approximate prompt tokens the context may use (llama3.2 prefill time grows with it)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+# Rough characters per token for English text and numbers with the llama tokenizer
+CHARS_PER_TOKEN = 4
+# Numbers are rounded to this many decimals when comparing rows for near-duplicates
+DEDUP_DECIMALS = 2
+
+GROUP_FIELDS = ["company_or_stock_name", "portfolio_management_services_name"]
+ROW_FIELDS = [
+    "company_or_stock_name",
+    "portfolio_management_services_name",
+    "industry_sector",
+    "data_month",
+    "quantity_of_shares",
+    "market_value_lacs_inr",
+    "asset_under_managment_percentage",
+]
+COLUMN_LABELS = {
+    "company_or_stock_name": "company",
+    "portfolio_management_services_name": "pms",
+    "industry_sector": "sector",
+    "data_month": "month",
+    "quantity_of_shares": "shares",
+    "market_value_lacs_inr": "market value (lakh INR)",
+    "asset_under_managment_percentage": "AUM %",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, close enough for budgeting without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return "" if value is None else str(value)
+
+
+def _dedup_key(properties: dict) -> tuple:
+    if not properties.get("company_or_stock_name"):
+        return ("text", " ".join(str(properties.get("combined_text", "")).lower().split()))
+    return tuple(
+        round(value, DEDUP_DECIMALS) if isinstance(value, float) else value
+        for value in (properties.get(field) for field in ROW_FIELDS)
+    )
+
+
+def _pick_group_field(rows: list[dict]) -> str:
+    # Grouping on the field with fewer distinct values gives fewer, longer tables
+    return min(GROUP_FIELDS, key=lambda field: len({row.get(field) for row in rows}))
+
+
+def build_context(hits: list[dict], token_budget: Optional[int] = None) -> tuple[list[str], dict]:
+    """
+    Builds context lines from retrieved hits within a token budget.
+    Args:
+        hits (list[dict]): Hits with "score" and "properties", as returned by get_hits_for_queries.
+        token_budget (int, optional): Approximate token limit; defaults to CONTEXT_TOKEN_BUDGET.
+    Returns:
+        tuple[list[str], dict]: Context lines, and counts of rows and (estimated) tokens
+            compared to joining every combined_text.
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    ordered = sorted(hits, key=lambda hit: hit.get("score") or 0.0, reverse=True)
+
+    unique, seen = [], set()
+    for hit in ordered:
+        key = _dedup_key(hit["properties"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(hit["properties"])
+
+    structured = [row for row in unique if row.get("company_or_stock_name")]
+    group_field = _pick_group_field(structured) if structured else GROUP_FIELDS[0]
+    columns = [field for field in ROW_FIELDS if field != group_field]
+    legend = f"Holdings grouped by {COLUMN_LABELS[group_field]}; columns: " + " | ".join(COLUMN_LABELS[c] for c in columns)
+
+    # Select rows best-first until the budget is used; group headers cost tokens too
+    used = estimate_tokens(legend) if structured else 0
+    groups: dict[str, list[str]] = {}
+    free_text: list[str] = []
+    kept = 0
+    for row in unique:
+        if row.get("company_or_stock_name"):
+            line = " | ".join(_format_value(row.get(column)) for column in columns)
+            group = str(row.get(group_field, ""))
+            cost = estimate_tokens(line) + (0 if group in groups else estimate_tokens(f"## {group}"))
+        else:
+            line = str(row.get("combined_text", ""))
+            group, cost = None, estimate_tokens(line)
+        if used + cost > token_budget:
+            continue
+        used += cost
+        kept += 1
+        if group is None:
+            free_text.append(line)
+        else:
+            groups.setdefault(group, []).append(line)
+
+    lines = [legend] if groups else []
+    for group, rows in groups.items():
+        lines.append(f"## {group}")
+        lines.extend(rows)
+    lines.extend(free_text)
+
+    naive_tokens = estimate_tokens("\n".join(str(hit["properties"].get("combined_text", "")) for hit in hits))
+    context_tokens = estimate_tokens("\n".join(lines))
+    stats = {
+        "rows_retrieved": len(hits),
+        "rows_unique": len(unique),
+        "rows_used": kept,
+        "naive_tokens": naive_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": naive_tokens - context_tokens,
+    }
+    dbg.info("Context built: %s", stats)
+    return lines, stats
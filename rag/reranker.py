@@ -0,0 +1,139 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+from data_process.data_preprocessing import data_normalize_text
+from debug.logger_config import dbg
+from config.settings import get_settings
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # optional dependency, only needed for RERANKER=cross_encoder
+    CrossEncoder = None
+
+# Optional reranking stage between the hybrid search and the context builder.
+# With a reranker in the search profile (see config.settings; RERANKER,
+# RERANK_CANDIDATES and RERANK_TOP_K set the default profile), retrieval asks
+# Weaviate for rerank_candidates hits per query (instead of auto_limit + score
+# cutoff) and only the rerank_top_k best rows according to the reranker go to the LLM.
+
+RERANKERS = ("none", "lexical", "cross_encoder")
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Identifying fields; a query naming a row's company or PMS is a strong relevance signal
+ENTITY_FIELDS = ["company_or_stock_name", "portfolio_management_services_name", "industry_sector", "data_month"]
+STOP_WORDS = {
+    "the", "a", "an", "of", "in", "for", "to", "by", "and", "or", "is", "are", "was", "what", "which",
+    "show", "me", "list", "all", "with", "on", "at", "its", "their", "how", "much", "many", "does", "do",
+}
+# Weights of the lexical features: text overlap, entity match, original hybrid score
+LEXICAL_WEIGHTS = (0.45, 0.35, 0.20)
+
+
+def _terms(text: str) -> list[str]:
+    return [term for term in data_normalize_text(text).split() if term not in STOP_WORDS]
+
+
+class LexicalReranker:
+    """
+    Fast CPU reranker scoring hits with lexical features: idf-weighted overlap
+    of query terms with combined_text, how many identifying fields (company,
+    PMS, sector, month) are named in the query, and the original hybrid score.
+    """
+    name = "lexical"
+
+    def score(self, query: str, hits: list[dict]) -> list[float]:
+        query_terms = set(_terms(query))
+        if not query_terms or not hits:
+            return [hit.get("score") or 0.0 for hit in hits]
+        documents = [set(_terms(str(hit["properties"].get("combined_text", "")))) for hit in hits]
+        document_frequency = Counter(term for document in documents for term in document & query_terms)
+        idf = {term: math.log(1 + len(hits) / (1 + document_frequency[term])) for term in query_terms}
+        total_idf = sum(idf.values())
+        hybrid_scores = [hit.get("score") or 0.0 for hit in hits]
+        low, high = min(hybrid_scores), max(hybrid_scores)
+
+        scores = []
+        for hit, document, hybrid_score in zip(hits, documents, hybrid_scores):
+            overlap = sum(idf[term] for term in query_terms & document) / total_idf
+            fields = [hit["properties"].get(field) for field in ENTITY_FIELDS]
+            fields = [set(_terms(str(value))) for value in fields if value]
+            entity = sum(1 for terms in fields if terms and terms <= query_terms) / len(ENTITY_FIELDS)
+            prior = (hybrid_score - low) / (high - low) if high > low else 1.0
+            w_overlap, w_entity, w_prior = LEXICAL_WEIGHTS
+            scores.append(w_overlap * overlap + w_entity * entity + w_prior * prior)
+        return scores
+
+
+class CrossEncoderReranker:
+    """
+    Reranks with a local sentence-transformers cross-encoder (a small MiniLM
+    runs on CPU). Requires the optional sentence_transformers package.
+    """
+    name = "cross_encoder"
+
+    def __init__(self, model: str = RERANK_MODEL):
+        if CrossEncoder is None:
+            raise ImportError("RERANKER=cross_encoder needs the sentence_transformers package")
+        self.model = CrossEncoder(model)
+
+    def score(self, query: str, hits: list[dict]) -> list[float]:
+        pairs = [(query, str(hit["properties"].get("combined_text", ""))) for hit in hits]
+        return [float(score) for score in self.model.predict(pairs)] if pairs else []
+
+
+# Rerankers by requested name, created once (a fallback is cached under the requested name)
+_rerankers: dict[str, LexicalReranker | CrossEncoderReranker] = {}
+
+def get_reranker(name: Optional[str] = None) -> Optional[LexicalReranker | CrossEncoderReranker]:
+    """
+    Returns the named reranker (created once), or None when reranking is off.
+    `name` defaults to the reranker of the default search profile.
+    Falls back to the lexical reranker if the cross-encoder cannot be loaded.
+    """
+    name = get_settings().search_profile().reranker if name is None else name
+    if name not in RERANKERS:
+        raise ValueError(f"Unknown reranker '{name}', expected one of {RERANKERS}")
+    if name == "none":
+        return None
+    if name not in _rerankers:
+        if name == "cross_encoder":
+            try:
+                _rerankers[name] = CrossEncoderReranker()
+            except Exception as e:
+                dbg.warning("Cross-encoder reranker unavailable (%s), using the lexical reranker", e)
+                _rerankers[name] = LexicalReranker()
+        else:
+            _rerankers[name] = LexicalReranker()
+    return _rerankers[name]
+
+
+def apply_reranker(reranker: LexicalReranker | CrossEncoderReranker, query: str, hits: list[dict], top_k: int) -> list[dict]:
+    """Scores hits with the reranker and returns the top_k, best first (blocking; see rerank_hits)."""
+    scores = reranker.score(query, hits)
+    return sorted(
+        ({**hit, "score": score, "hybrid_score": hit.get("score")} for hit, score in zip(hits, scores)),
+        key=lambda hit: hit["score"], reverse=True,
+    )[:top_k]
+
+
+async def rerank_hits(query: str, hits: list[dict], top_k: Optional[int] = None,
+                      reranker: Optional[LexicalReranker | CrossEncoderReranker] = None) -> list[dict]:
+    """
+    Reorders hits by reranker score and keeps the top_k. The reranker score
+    replaces "score"; the hybrid score is kept as "hybrid_score".
+    `top_k` defaults to rerank_top_k of the default search profile.
+    Scoring runs in a worker thread so a cross-encoder does not block the event loop.
+    """
+    reranker = reranker or get_reranker()
+    if reranker is None or not hits:
+        return hits
+    top_k = get_settings().search_profile().rerank_top_k if top_k is None else top_k
+    start = time.perf_counter()
+    reranked = await asyncio.to_thread(apply_reranker, reranker, query, hits, top_k)
+    dbg.info("Reranked %d hits to %d with %s in %.1f ms",
+             len(hits), len(reranked), reranker.name, (time.perf_counter() - start) * 1000)
+    return reranked
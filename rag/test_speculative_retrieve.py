@@ -0,0 +1,51 @@
+import asyncio
+
+import query_optimizer.query_transformer as qo
+import weaviate_database.db_collection as ds
+from config.settings import SearchProfile
+from rag.chat_functions import score_margin, speculative_retrieve
+
+# Speculative search decisions with the rewrite and the hybrid search replaced by fakes.
+# p3 -m pytest rag/test_speculative_retrieve.py
+
+PROFILE = SearchProfile("test", speculative=True, speculative_wait_ms=2000)
+
+
+def hits(prefix: str, scores: list[float]) -> list[dict]:
+    return [{"uuid": f"{prefix}{i}", "score": score, "properties": {}} for i, score in enumerate(scores)]
+
+
+def run(monkeypatch, raw_scores: list[float]) -> tuple[list[dict], list[str]]:
+    searched = []
+
+    async def fake_optimizer(user_query, mode=None):
+        await asyncio.sleep(0.05)
+        return ["rewritten query"]
+
+    async def fake_hits(queries, entity_filters=None, limit=None, profile=None):
+        searched.extend(queries)
+        return hits("raw", raw_scores) if queries == ["vague query"] else hits("rewritten", [1.0, 0.6])
+
+    monkeypatch.setattr(qo, "query_optimizer", fake_optimizer)
+    monkeypatch.setattr(ds, "get_hits_for_queries", fake_hits)
+    return asyncio.run(speculative_retrieve("vague query", None, {}, PROFILE)), searched
+
+
+def test_score_margin():
+    assert score_margin([]) == 0.0
+    assert score_margin(hits("h", [0.7])) == 1.0
+    assert score_margin(hits("h", [1.0, 0.5, 0.4])) == 0.5
+    assert score_margin(hits("h", [1.0, 1.0])) == 0.0
+
+
+def test_weak_raw_query_waits_for_the_rewrite(monkeypatch):
+    # relative_score fusion puts the top hit at 1.0 even when many rows match about equally
+    result, searched = run(monkeypatch, [1.0, 0.98, 0.97, 0.95])
+    assert searched == ["vague query", "rewritten query"]
+    assert {hit["uuid"] for hit in result} >= {"rewritten0", "raw0"}
+
+
+def test_clear_best_hit_skips_the_rewrite(monkeypatch):
+    result, searched = run(monkeypatch, [1.0, 0.4, 0.35])
+    assert searched == ["vague query"]
+    assert [hit["uuid"] for hit in result] == ["raw0", "raw1", "raw2"]
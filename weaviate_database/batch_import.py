@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from contextlib import AbstractContextManager
+from typing import Iterable, Optional
+
+from weaviate.collections import Collection
+
+from debug.logger_config import dbg
+
+IMPORT_BATCH_MODES = ("fixed", "dynamic", "rate_limit")
+# fixed: batch_size objects per request, concurrent_requests requests in flight
+# dynamic: the client sizes batches from the server's queue length
+# rate_limit: caps vectorizer requests per minute (protects the Ollama server)
+IMPORT_BATCH_MODE = os.environ.get("WEAVIATE_IMPORT_MODE", "fixed")
+IMPORT_BATCH_SIZE = int(os.environ.get("WEAVIATE_IMPORT_BATCH_SIZE", "200"))
+IMPORT_CONCURRENT_REQUESTS = int(os.environ.get("WEAVIATE_IMPORT_CONCURRENT_REQUESTS", "2"))
+IMPORT_REQUESTS_PER_MINUTE = int(os.environ.get("WEAVIATE_IMPORT_REQUESTS_PER_MINUTE", "600"))
+# Rounds of re-sending failed_objects, waiting retry_backoff * 2**round seconds before each
+IMPORT_MAX_RETRIES = int(os.environ.get("WEAVIATE_IMPORT_MAX_RETRIES", "3"))
+IMPORT_RETRY_BACKOFF = float(os.environ.get("WEAVIATE_IMPORT_RETRY_BACKOFF", "2"))
+# Stop sending new objects once a pass has more errors than this; 0 never stops
+IMPORT_MAX_ERRORS = int(os.environ.get("WEAVIATE_IMPORT_MAX_ERRORS", "10"))
+IMPORT_PROGRESS_EVERY = int(os.environ.get("WEAVIATE_IMPORT_PROGRESS_EVERY", "5000"))
+IMPORT_DEAD_LETTER_PATH = os.environ.get(
+    "WEAVIATE_IMPORT_DEAD_LETTER_PATH",
+    os.path.join(os.path.expanduser("~"), "var_cache", "weaviate_import_dead_letter.jsonl"),
+)
+
+
+class BatchImporter:
+    """
+    Configurable batch import into a Weaviate collection.
+
+    Objects are streamed through a fixed-size, dynamic or rate-limited batch.
+    Objects reported in `collection.batch.failed_objects` are re-sent with
+    exponential backoff, and the ones still failing after `max_retries` rounds
+    are appended to a JSONL dead-letter file. Throughput (objects/sec) is
+    logged while importing and returned with the final counts.
+    """
+    def __init__(
+        self,
+        mode: str = IMPORT_BATCH_MODE,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        concurrent_requests: int = IMPORT_CONCURRENT_REQUESTS,
+        requests_per_minute: int = IMPORT_REQUESTS_PER_MINUTE,
+        max_retries: int = IMPORT_MAX_RETRIES,
+        retry_backoff: float = IMPORT_RETRY_BACKOFF,
+        max_errors: int = IMPORT_MAX_ERRORS,
+        dead_letter_path: Optional[str] = IMPORT_DEAD_LETTER_PATH,
+    ):
+        if mode not in IMPORT_BATCH_MODES:
+            raise ValueError(f"Unknown import mode '{mode}', expected one of {IMPORT_BATCH_MODES}")
+        if batch_size <= 0 or concurrent_requests <= 0 or requests_per_minute <= 0:
+            raise ValueError("Batch size, concurrent requests and requests per minute must be positive integers")
+        if max_retries < 0:
+            raise ValueError("Max retries cannot be negative")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.concurrent_requests = concurrent_requests
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_errors = max_errors
+        self.dead_letter_path = dead_letter_path
+
+    def _batch(self, collection: Collection) -> AbstractContextManager:
+        if self.mode == "dynamic":
+            return collection.batch.dynamic()
+        if self.mode == "rate_limit":
+            return collection.batch.rate_limit(requests_per_minute=self.requests_per_minute)
+        return collection.batch.fixed_size(batch_size=self.batch_size, concurrent_requests=self.concurrent_requests)
+
+    def run(self, collection: Collection, objects: Iterable[tuple[dict, str, Optional[dict]]]) -> dict:
+        """
+        Imports (properties, uuid, vector) tuples into `collection`.
+        Returns:
+            dict: Counts of sent, retried, imported, failed (still failing after
+                the retries) and dead-lettered objects, whether the import was
+                aborted, elapsed seconds and objects per second.
+        """
+        stats = {"sent": 0, "retried": 0, "imported": 0, "failed": 0, "dead_lettered": 0, "aborted": False}
+        started = time.perf_counter()
+        with self._batch(collection) as batch:
+            for properties, obj_id, vector in objects:
+                batch.add_object(properties=properties, uuid=obj_id, vector=vector)
+                stats["sent"] += 1
+                if stats["sent"] % IMPORT_PROGRESS_EVERY == 0:
+                    self._report(collection.name, stats["sent"], started)
+                if self.max_errors and batch.number_errors > self.max_errors:
+                    dbg.error("Batch import into '%s' stopped after %d errors", collection.name, batch.number_errors)
+                    stats["aborted"] = True
+                    break
+        failed = list(collection.batch.failed_objects)
+
+        for attempt in range(self.max_retries):
+            if not failed:
+                break
+            delay = self.retry_backoff * 2 ** attempt
+            dbg.warning("Retrying %d failed objects in %.1fs (attempt %d/%d); first error: %s",
+                        len(failed), delay, attempt + 1, self.max_retries, failed[0].message)
+            time.sleep(delay)
+            stats["retried"] += len(failed)
+            with self._batch(collection) as batch:
+                for error in failed:
+                    obj = error.object_
+                    batch.add_object(properties=obj.properties, uuid=obj.uuid, vector=obj.vector)
+            failed = list(collection.batch.failed_objects)
+
+        stats["failed"] = len(failed)
+        stats["imported"] = stats["sent"] - stats["failed"]
+        if failed:
+            stats["dead_lettered"] = self._dead_letter(collection.name, failed)
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["objects_per_second"] = round(stats["sent"] / elapsed, 1) if elapsed > 0 else 0.0
+        dbg.info("Imported into '%s' (%s): %s", collection.name, self.mode, stats)
+        return stats
+
+    def _report(self, collection_name: str, sent: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        dbg.info("Import into '%s': %d objects sent, %.0f objects/sec", collection_name, sent, sent / elapsed)
+
+    def _dead_letter(self, collection_name: str, failed: list) -> int:
+        """
+        Appends permanently failed objects to the dead-letter file, one JSON line each.
+        """
+        if not self.dead_letter_path:
+            dbg.error("%d objects failed permanently and no dead-letter file is configured", len(failed))
+            return 0
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        failed_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for error in failed:
+                record = {
+                    "collection": collection_name,
+                    "failed_at": failed_at,
+                    "uuid": error.object_.uuid,
+                    "error": error.message,
+                    "properties": error.object_.properties,
+                }
+                f.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        dbg.error("%d objects failed permanently, written to %s", len(failed), self.dead_letter_path)
+        return len(failed)
@@ -0,0 +1,90 @@
+import statistics
+import sys
+import time
+
+from weaviate.classes.query import MetadataQuery
+
+from query_optimizer.filter_extractor import extract_range_filters
+from weaviate_database.db_collection import (
+    AppWeaviateClient, DB_CONFIG, COLLECTION_NAME, properties_list, build_entity_filter, hybrid_query_args,
+)
+
+# Compares numeric range questions answered today (hybrid full-text search, the
+# LLM has to pick the matching rows) with the range filter pushed down to
+# Weaviate (hybrid + filter, and a filter-only fetch).
+# Needs a running Weaviate with a schema version 2 collection (see migrate_collection).
+# p3 -m weaviate_database.bench_range_filters [collection] [repeats]
+
+bench_queries = [
+    "holdings above 5% AUM",
+    "stocks with market value over 1000 lakhs",
+    "holdings worth more than 2 crore",
+    "positions with more than 100000 shares",
+    "AUM between 2 and 4%",
+]
+
+FETCH_LIMIT = 1000
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def matches_ranges(properties: dict, ranges: dict[str, dict[str, float]]) -> bool:
+    checks = {"gt": lambda a, b: a > b, "gte": lambda a, b: a >= b, "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b}
+    for field, bounds in ranges.items():
+        value = properties.get(field)
+        if value is None or not all(checks[op](value, bound) for op, bound in bounds.items()):
+            return False
+    return True
+
+
+def run_variant(collection, variant: str, query: str, ranges: dict) -> tuple[float, list[dict]]:
+    start = time.perf_counter()
+    if variant == "fetch_filter":
+        response = collection.query.fetch_objects(
+            filters=build_entity_filter(ranges), limit=FETCH_LIMIT, return_properties=properties_list,
+        )
+    else:
+        args = hybrid_query_args(query.lower(), filters=build_entity_filter(ranges) if variant == "hybrid_filter" else None)
+        args.update(return_properties=properties_list, return_metadata=MetadataQuery(score=True))
+        response = collection.query.hybrid(**args)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms, [obj.properties for obj in response.objects]
+
+
+def run_benchmark(collection_name: str = COLLECTION_NAME, repeats: int = 10):
+    variants = ["hybrid_text", "hybrid_filter", "fetch_filter"]
+    with AppWeaviateClient(**DB_CONFIG) as cl:
+        collection = cl.collections.get(collection_name)
+        print(f"\n========== Range filter benchmark on '{collection_name}' ({repeats} runs) ==========\n")
+        print(f"{'query':40} {'variant':14} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6} {'precision':>9}")
+        summary = {variant: [] for variant in variants}
+        for query in bench_queries:
+            ranges = extract_range_filters(query)
+            if not ranges:
+                print(f"{query:40} no range predicate extracted, skipped")
+                continue
+            for variant in variants:
+                latencies, rows = [], []
+                for _ in range(repeats):
+                    elapsed_ms, rows = run_variant(collection, variant, query, ranges)
+                    latencies.append(elapsed_ms)
+                # Fraction of returned rows that actually satisfy the predicate
+                precision = sum(matches_ranges(row, ranges) for row in rows) / len(rows) if rows else 1.0
+                summary[variant].extend(latencies)
+                print(f"{query[:40]:40} {variant:14} {percentile(latencies, 50):8.1f} {percentile(latencies, 95):8.1f} "
+                      f"{len(rows):6d} {precision:9.2f}")
+        print("\nOverall:")
+        for variant, latencies in summary.items():
+            if latencies:
+                print(f"  {variant:14} mean {statistics.mean(latencies):7.1f} ms   p95 {percentile(latencies, 95):7.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        sys.argv[1] if len(sys.argv) > 1 else COLLECTION_NAME,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
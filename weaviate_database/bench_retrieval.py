@@ -0,0 +1,165 @@
+import argparse
+import json
+import statistics
+import time
+from typing import Optional
+
+from config.settings import SearchProfile, get_settings
+from data_process.entity_vocabulary import EntityVocabulary
+from data_process.synthetic_corpus import generate_corpus, generate_queries
+from query_optimizer.filter_extractor import extract_query_filters
+from rag.reranker import apply_reranker, get_reranker
+from weaviate_database.db_collection import (
+    AppWeaviateClient, DB_CONFIG, WeaviateCollection, build_entity_filter, hybrid_query_args, iter_object_ids,
+    properties_list, select_hits,
+)
+from weaviate_database.local_hybrid_store import LocalHybridCollection
+
+# Offline retrieval benchmark: recall@k, MRR and latency per search profile.
+# A synthetic holdings corpus (data_process.synthetic_corpus) is loaded into the
+# in-process stand-in (default, no network needed) or a local Weaviate, and a
+# labeled query set is run through the retrieval steps of app_stocks_info:
+# entity/range filters, hybrid search with the profile's parameters, score
+# cutoff and the optional reranker. The query rewrite LLM and caches are not
+# part of the measurement.
+# p3 -m weaviate_database.bench_retrieval --rows 100000 --profiles default,fast,recall
+# p3 -m weaviate_database.bench_retrieval --backend weaviate   (needs Weaviate + Ollama; writes BenchStocksInfo)
+
+BENCH_COLLECTION_NAME = "BenchStocksInfo"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def retrieve(collection, query: str, profile: SearchProfile, vocab: Optional[EntityVocabulary] = None) -> list[dict]:
+    """
+    Runs the retrieval steps of app_stocks_info for one query, synchronously.
+    `vocab` enables entity filters as in production; None searches unfiltered.
+    """
+    entity_filters = extract_query_filters(query, vocab) if vocab is not None else {}
+    filters = build_entity_filter(entity_filters)
+    reranker = get_reranker(profile.reranker)
+    limit = profile.rerank_candidates if reranker else None
+
+    def search(filters):
+        response = collection.query.hybrid(**hybrid_query_args(query.lower(), filters=filters, limit=limit, profile=profile))
+        return select_hits(response, profile, limit)
+
+    hits = search(filters)
+    if filters is not None and not hits:
+        hits = search(None)
+    if reranker:
+        hits = apply_reranker(reranker, query, hits, profile.rerank_top_k)
+    return hits
+
+
+def score_ranking(ranked_ids: list[str], relevant_ids: set[str], k: int) -> tuple[float, float]:
+    """Returns (recall@k, reciprocal rank of the first relevant hit within k)."""
+    top = ranked_ids[:k]
+    recall = len(relevant_ids.intersection(top)) / min(len(relevant_ids), k)
+    reciprocal_rank = next((1 / rank for rank, uid in enumerate(top, start=1) if uid in relevant_ids), 0.0)
+    return recall, reciprocal_rank
+
+
+def run_profile(collection, queries: list[dict], profile: SearchProfile, k: int,
+                vocab: Optional[EntityVocabulary]) -> dict:
+    latencies, recalls, reciprocal_ranks, returned = [], [], [], []
+    by_kind: dict[str, list[float]] = {}
+    started = time.perf_counter()
+    for labeled in queries:
+        start = time.perf_counter()
+        hits = retrieve(collection, labeled["query"], profile, vocab)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recall, reciprocal_rank = score_ranking([hit["uuid"] for hit in hits], labeled["relevant_ids"], k)
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+        returned.append(len(hits))
+        by_kind.setdefault(labeled["kind"], []).append(recall)
+    elapsed = time.perf_counter() - started
+    return {
+        "profile": profile.name,
+        f"recall@{k}": round(statistics.mean(recalls), 4),
+        f"mrr@{k}": round(statistics.mean(reciprocal_ranks), 4),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "qps": round(len(queries) / elapsed, 1),
+        "mean_hits": round(statistics.mean(returned), 1),
+        f"recall@{k}_by_kind": {kind: round(statistics.mean(values), 4) for kind, values in sorted(by_kind.items())},
+    }
+
+
+def load_weaviate_collection(client, corpus: list[dict]):
+    collections = WeaviateCollection(client)
+    if client.collections.exists(BENCH_COLLECTION_NAME):
+        collections.delete_collection(BENCH_COLLECTION_NAME)
+    collections.create_collection(BENCH_COLLECTION_NAME)
+    collections.insert_objects_into_collection(BENCH_COLLECTION_NAME, corpus)
+    return client.collections.get(BENCH_COLLECTION_NAME)
+
+
+def run_benchmark(rows: int = 10_000, query_count: int = 200, k: int = 10, profiles: Optional[list[str]] = None,
+                  backend: str = "local", use_filters: bool = True, seed: int = 7) -> list[dict]:
+    settings = get_settings()
+    profiles = profiles or list(settings.search_profiles)
+    start = time.perf_counter()
+    corpus = generate_corpus(rows, seed=seed)
+    queries = generate_queries(corpus, query_count, seed=seed + 1)
+    uuids = [obj_id for _, obj_id in iter_object_ids(corpus)]
+    for labeled in queries:
+        labeled["relevant_ids"] = {uuids[i] for i in labeled["relevant"]}
+    vocab = EntityVocabulary.from_rows(corpus) if use_filters else None
+    print(f"\n========== Retrieval benchmark: {len(corpus)} rows, {len(queries)} queries, backend={backend}, "
+          f"filters={'on' if use_filters else 'off'} ==========")
+    print(f"Corpus generated in {time.perf_counter() - start:.1f} s")
+
+    def run_all(collection) -> list[dict]:
+        results = []
+        print(f"\n{'profile':10} {f'recall@{k}':>10} {f'mrr@{k}':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'qps':>8} {'hits':>6}")
+        for name in profiles:
+            result = run_profile(collection, queries, settings.search_profile(name), k, vocab)
+            results.append(result)
+            print(f"{name:10} {result[f'recall@{k}']:10.3f} {result[f'mrr@{k}']:8.3f} {result['p50_ms']:8.2f} "
+                  f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f} {result['qps']:8.1f} {result['mean_hits']:6.1f}")
+        print("\nRecall by query kind:")
+        for result in results:
+            kinds = "  ".join(f"{kind} {value:.3f}" for kind, value in result[f"recall@{k}_by_kind"].items())
+            print(f"  {result['profile']:10} {kinds}")
+        return results
+
+    if backend == "weaviate":
+        with AppWeaviateClient(**DB_CONFIG) as client:
+            start = time.perf_counter()
+            collection = load_weaviate_collection(client, corpus)
+            print(f"Loaded into Weaviate collection '{BENCH_COLLECTION_NAME}' in {time.perf_counter() - start:.1f} s")
+            return run_all(collection)
+    start = time.perf_counter()
+    collection = LocalHybridCollection(corpus, name=BENCH_COLLECTION_NAME)
+    print(f"Indexed in the local stand-in in {time.perf_counter() - start:.1f} s")
+    return run_all(collection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark per search profile")
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic corpus size (10k-1M)")
+    parser.add_argument("--queries", type=int, default=200, help="number of labeled queries")
+    parser.add_argument("--k", type=int, default=10, help="cut-off for recall@k and MRR")
+    parser.add_argument("--profiles", default="", help="comma-separated search profiles (default: all)")
+    parser.add_argument("--backend", choices=["local", "weaviate"], default="local")
+    parser.add_argument("--no-filters", action="store_true", help="search without entity/range filters")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        rows=args.rows, query_count=args.queries, k=args.k,
+        profiles=[name for name in args.profiles.split(",") if name] or None,
+        backend=args.backend, use_filters=not args.no_filters, seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
@@ -1,21 +1,48 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
 import weaviate
 from weaviate.classes.config import Configure
-from weaviate.client import WeaviateClient
+from weaviate.classes.data import DataObject
+from weaviate.client import WeaviateClient, WeaviateAsyncClient
 from weaviate.outputs.query import QueryReturn
 import weaviate.classes.query as wq
-from weaviate.classes.query import HybridFusion
+from weaviate.classes.query import HybridFusion, Filter
+from weaviate.collections.classes.filters import _Filters
+from weaviate.classes.aggregate import GroupByAggregate, Metrics
+from weaviate.collections.classes.aggregate import AggregateGroupByReturn, AggregateReturn
+from weaviate.util import generate_uuid5
 
-from typing import Optional
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, Optional
 from data_process.parse_xlsx_sheet import get_stock_info_from_xlsx
 import data_process.parse_xlsx_sheet as pe
 import data_process.data_preprocessing as data
+from debug.logger_config import dbg
+from debug.metrics import observe_retrieved, stage_span
+from admission.controller import stage_slot
+from config.settings import SearchProfile, get_settings
+from cache.semantic_cache import SemanticCache, bump_collection_version
+from weaviate_database.embedding_cache import EMBEDDING_MODE, OllamaBatchEmbedder
+from weaviate_database.batch_import import BatchImporter
 
 import weaviate.classes.config as wc
 from weaviate.classes.config import Configure, VectorDistances
 
+if TYPE_CHECKING:
+    # query_optimizer imports this module; the intent is only needed for annotations
+    from query_optimizer.aggregate_intent import AggregateIntent
+
 EMBEDDING_MODEL = "nomic-embed-text:latest"
 OLLAMA_API_URL = "http://host.docker.internal:11434" # ollama server url if calling from docker, example, calling from weaviate container
 COLLECTION_NAME = "StocksInfo"
+# Version of the collection schema created by create_collection, recorded in the collection description.
+# 1: numeric properties not filterable. 2: numeric properties filterable with range indexes.
+SCHEMA_VERSION = 2
+SCHEMA_VERSION_PREFIX = "schema_version="
 VECTOR_NAMES = [
     "company_or_stock_name",
     "industry_sector",
@@ -24,6 +51,23 @@ VECTOR_NAMES = [
     "combined_text"
 ]
 
+# Connection settings come from config.settings (defaults, settings file, WEAVIATE_* env vars)
+DB_CONFIG = get_settings().db_config
+DB_POOL_SIZE = get_settings().values["weaviate"]["pool_size"]
+DB_POOL_HEALTH_CHECK_INTERVAL = get_settings().values["weaviate"]["pool_health_check_interval"]
+
+# Fields that identify one holding row; the object UUID is derived from them
+OBJECT_ID_FIELDS = ["company_or_stock_name", "portfolio_management_services_name", "data_month"]
+# Property holding the content hash used by incremental sync
+ROW_HASH_PROPERTY = "row_hash"
+SYNC_DELETE_CHUNK_SIZE = 1000
+# Largest share of a collection an incremental sync may delete; more is taken as a broken source
+SYNC_MAX_DELETE_FRACTION = float(os.environ.get("SYNC_MAX_DELETE_FRACTION", "0.2"))
+# Most groups listed in an aggregate result table handed to the LLM
+AGGREGATE_MAX_ROWS = int(os.environ.get("AGGREGATE_MAX_ROWS", "50"))
+# Objects embedded per client-side embedding round when inserting with precomputed vectors
+EMBEDDING_CHUNK_SIZE = int(os.environ.get("EMBEDDING_CHUNK_SIZE", "512"))
+
 properties_list  = [
     "company_or_stock_name",
     "industry_sector",
@@ -42,6 +86,7 @@ class AppWeaviateClient:
         self.port = port
         self.grpc_port = grpc_port
         self.client: Optional[WeaviateClient] = None
+        self.async_client: Optional[WeaviateAsyncClient] = None
 
     def connect(self) -> WeaviateClient:
         """
@@ -69,7 +114,309 @@ class AppWeaviateClient:
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
-        
+
+    async def connect_async(self) -> WeaviateAsyncClient:
+        """
+        Connects an async client to the Weaviate instance using the provided host, port, and grpc_port.
+        Returns:
+            WeaviateAsyncClient: The connected async client instance.
+        """
+        self.async_client = weaviate.use_async_with_local(
+            host=self.host,
+            port=self.port,
+            grpc_port=self.grpc_port,
+        )
+        await self.async_client.connect()
+        return self.async_client
+
+    async def close_async(self):
+        """
+        Closes the async connection to the Weaviate instance.
+        """
+        if self.async_client:
+            await self.async_client.close()
+            self.async_client = None
+
+    async def __aenter__(self) -> WeaviateAsyncClient:
+        return await self.connect_async()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close_async()
+
+
+class WeaviateClientPool:
+    """
+    Process-wide pool of long-lived async Weaviate connections.
+
+    Each pooled connection is an AppWeaviateClient whose async client is
+    connected once at startup and handed out to requests, instead of paying
+    the HTTP + gRPC handshake on every call. Connections are health-checked with is_ready()
+    when handed out (at most once per health_check_interval seconds) and
+    reconnected if the check fails.
+    """
+    def __init__(self, size: int = DB_POOL_SIZE, health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL, **db_config):
+        if size <= 0:
+            raise ValueError("Pool size must be a positive integer")
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.db_config = db_config or DB_CONFIG
+        self._clients: list[AppWeaviateClient] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._last_checked: dict[int, float] = {}
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def start(self) -> None:
+        """
+        Opens all pooled connections. Called once at application startup.
+        """
+        if self.started:
+            return
+        self._idle = asyncio.Queue(maxsize=self.size)
+        try:
+            for _ in range(self.size):
+                app_client = AppWeaviateClient(**self.db_config)
+                self._clients.append(app_client)
+                await app_client.connect_async()
+                self._last_checked[id(app_client)] = time.monotonic()
+                self._idle.put_nowait(app_client)
+        except Exception:
+            await self.close()
+            raise
+        dbg.info("Weaviate client pool started with %d connections to %s", self.size, self.db_config)
+
+    async def close(self) -> None:
+        """
+        Closes all pooled connections. Called once at application shutdown.
+        """
+        for app_client in self._clients:
+            try:
+                await app_client.close_async()
+            except Exception as e:
+                dbg.warning("Error closing pooled Weaviate client: %s", e)
+        self._clients.clear()
+        self._last_checked.clear()
+        self._idle = None
+        dbg.info("Weaviate client pool closed")
+
+    async def _is_healthy(self, app_client: AppWeaviateClient) -> bool:
+        try:
+            return app_client.async_client is not None and await app_client.async_client.is_ready()
+        except Exception as e:
+            dbg.warning("Weaviate health check failed: %s", e)
+            return False
+
+    async def _ensure_healthy(self, app_client: AppWeaviateClient) -> None:
+        now = time.monotonic()
+        if now - self._last_checked.get(id(app_client), 0.0) < self.health_check_interval:
+            return
+        if not await self._is_healthy(app_client):
+            dbg.warning("Pooled Weaviate client is unhealthy, reconnecting")
+            await app_client.close_async()
+            await app_client.connect_async()
+        self._last_checked[id(app_client)] = time.monotonic()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[WeaviateAsyncClient]:
+        """
+        Borrows a connected client from the pool, waiting if all are in use.
+        The client is returned to the pool when the context exits.
+        """
+        if not self.started:
+            raise RuntimeError("Weaviate client pool is not started. Call start() first.")
+        app_client = await self._idle.get()
+        try:
+            await self._ensure_healthy(app_client)
+            yield app_client.async_client
+        finally:
+            if self._idle is not None:
+                self._idle.put_nowait(app_client)
+
+
+db_pool: Optional[WeaviateClientPool] = None
+
+# Context lines per normalized search query, invalidated when the collection is re-ingested
+context_cache = SemanticCache("vector_db_context", collection_name=COLLECTION_NAME)
+
+# Client-side query embedder, created on first use when EMBEDDING_MODE is "client"
+_query_embedder: Optional[OllamaBatchEmbedder] = None
+
+def get_query_embedder() -> Optional[OllamaBatchEmbedder]:
+    """
+    Returns the shared client-side embedder used for query vectors, or None when
+    Weaviate vectorizes queries itself (EMBEDDING_MODE "server").
+    """
+    global _query_embedder
+    if EMBEDDING_MODE != "client":
+        return None
+    if _query_embedder is None:
+        _query_embedder = OllamaBatchEmbedder(model=EMBEDDING_MODEL)
+    return _query_embedder
+
+async def init_db_pool(size: int = DB_POOL_SIZE) -> WeaviateClientPool:
+    """
+    Creates and starts the process-wide Weaviate client pool.
+    """
+    global db_pool
+    if db_pool is None:
+        pool = WeaviateClientPool(size=size, **DB_CONFIG)
+        await pool.start()
+        db_pool = pool
+    return db_pool
+
+async def close_db_pool() -> None:
+    """
+    Closes the process-wide Weaviate client pool, if it was started.
+    """
+    global db_pool
+    if db_pool is not None:
+        await db_pool.close()
+        db_pool = None
+
+
+def _object_key(stock_obj: dict) -> str:
+    return "|".join(str(stock_obj.get(field, "")) for field in OBJECT_ID_FIELDS)
+
+def object_uuid(stock_obj: dict, occurrence: int = 0) -> str:
+    """
+    Deterministic object UUID derived from the (company, PMS, month) of a preprocessed row.
+    Rows repeating an earlier row's (company, PMS, month) are told apart by
+    `occurrence`, their position among those rows (0 for the first).
+    """
+    key = _object_key(stock_obj)
+    return generate_uuid5(f"{key}|#{occurrence}" if occurrence else key)
+
+def iter_object_ids(stocks_objects: Iterable[dict], stats: Optional[dict[str, int]] = None) -> Iterator[tuple[dict, str]]:
+    """
+    Yields (object, uuid) pairs for source objects. Repeated (company, PMS,
+    month) rows keep separate objects, numbered in source order, so their IDs
+    stay the same from one ingest to the next; repeats are counted in stats["duplicates"].
+    """
+    occurrences: Counter[str] = Counter()
+    for src_obj in stocks_objects:
+        key = _object_key(src_obj)
+        occurrence = occurrences[key]
+        occurrences[key] += 1
+        if occurrence and stats is not None:
+            stats["duplicates"] = stats.get("duplicates", 0) + 1
+        yield src_obj, object_uuid(src_obj, occurrence)
+
+def object_properties_with_hash(stock_obj: dict) -> dict:
+    """
+    Returns the object properties plus a content hash used to detect changed rows.
+    """
+    properties = {key: value for key, value in stock_obj.items() if key != ROW_HASH_PROPERTY}
+    payload = json.dumps(properties, sort_keys=True, default=str, ensure_ascii=False)
+    properties[ROW_HASH_PROPERTY] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return properties
+
+def iter_objects_with_vectors(
+    objects: Iterable[tuple[dict, str]],
+    embedder: Optional[OllamaBatchEmbedder],
+    chunk_size: int = EMBEDDING_CHUNK_SIZE,
+) -> Iterator[tuple[dict, str, Optional[dict]]]:
+    """
+    Yields (properties, uuid, vector) for (properties, uuid) pairs.
+
+    With an embedder, the combined_text of `chunk_size` objects at a time is
+    embedded client-side in one batched round and the vector is returned as
+    {"company_info": [...]}. Without one the vector is None and Weaviate embeds the object.
+    """
+    if embedder is None:
+        for properties, obj_id in objects:
+            yield properties, obj_id, None
+        return
+    chunk: list[tuple[dict, str]] = []
+    for item in objects:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _embed_chunk(chunk, embedder)
+            chunk = []
+    if chunk:
+        yield from _embed_chunk(chunk, embedder)
+
+def _embed_chunk(chunk: list[tuple[dict, str]], embedder: OllamaBatchEmbedder) -> Iterator[tuple[dict, str, dict]]:
+    vectors = embedder.embed([properties.get("combined_text", "") for properties, _ in chunk])
+    for (properties, obj_id), vector in zip(chunk, vectors):
+        yield properties, obj_id, {"company_info": vector}
+
+
+RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+def _range_filter(field: str, op: str, value: float) -> _Filters:
+    prop = Filter.by_property(field)
+    if op == "gt":
+        return prop.greater_than(value)
+    if op == "gte":
+        return prop.greater_or_equal(value)
+    if op == "lt":
+        return prop.less_than(value)
+    if op == "lte":
+        return prop.less_or_equal(value)
+    raise ValueError(f"Unknown range operator '{op}', expected one of {list(RANGE_OPERATORS)}")
+
+def build_entity_filter(entity_filters: Optional[dict[str, list[str] | dict[str, float]]]) -> Optional[_Filters]:
+    """
+    Turns query filters into a Weaviate filter. A list of values for a field
+    is OR-ed; a dict of bounds ({"gt": 5.0}) is a range on a numeric field
+    (needs the range-indexed schema, SCHEMA_VERSION 2). Fields are AND-ed.
+    Returns None when there is nothing to filter on.
+    """
+    field_filters = []
+    for field, values in sorted((entity_filters or {}).items()):
+        if isinstance(values, dict):
+            field_filters.extend(_range_filter(field, op, value) for op, value in sorted(values.items()))
+            continue
+        value_filters = [Filter.by_property(field).equal(value) for value in values]
+        if value_filters:
+            field_filters.append(value_filters[0] if len(value_filters) == 1 else Filter.any_of(value_filters))
+    if not field_filters:
+        return None
+    return field_filters[0] if len(field_filters) == 1 else Filter.all_of(field_filters)
+
+def describe_filters(entity_filters: Optional[dict[str, list[str] | dict[str, float]]]) -> str:
+    """Human-readable form of query filters, e.g. "industry_sector is it and market_value_lacs_inr > 500"."""
+    conditions = []
+    for field, values in sorted((entity_filters or {}).items()):
+        if isinstance(values, dict):
+            conditions.extend(f"{field} {RANGE_OPERATORS[op]} {value:g}" for op, value in sorted(values.items()))
+        else:
+            conditions.append(f"{field} is {' or '.join(values)}")
+    return " and ".join(conditions)
+
+
+def hybrid_query_args(user_query: str, target_vector: str = "company_info", vector: Optional[list[float]] = None,
+                      filters: Optional[_Filters] = None, limit: Optional[int] = None,
+                      profile: Optional[SearchProfile] = None) -> dict:
+    """
+    Builds the hybrid search arguments shared by the sync and async collections.
+    `vector` is a precomputed query vector; when None Weaviate vectorizes the query.
+    `filters` restricts both the keyword and the vector search to matching objects.
+    `limit` returns a fixed number of candidates instead of the profile's limit
+    (None cuts at the first score jump, auto_limit).
+    `profile` supplies alpha, vector distance, fusion and limit; defaults to the configured default profile.
+    """
+    profile = profile or get_settings().search_profile()
+    limit = limit if limit is not None else profile.limit
+    return dict(
+        query=user_query,
+        vector=vector,
+        query_properties=VECTOR_NAMES,
+        max_vector_distance=profile.max_vector_distance,
+        alpha=profile.alpha,
+        limit=limit,
+        fusion_type=HybridFusion.RANKED if profile.fusion == "ranked" else HybridFusion.RELATIVE_SCORE,
+        auto_limit=limit is None,
+        target_vector=target_vector,
+        filters=filters,
+        return_metadata=wq.MetadataQuery(score=True, explain_score=True, certainty=True),
+        # Structured fields let the context builder de-duplicate and tabulate rows
+        return_properties=properties_list + ["combined_text"],
+    )
+
+
 class WeaviateCollection:
     def __init__(self, client: WeaviateClient):
         self.client = client
@@ -122,6 +469,7 @@ class WeaviateCollection:
         ]
         self.client.collections.create(
             name=collection_name,
+            description=f"{SCHEMA_VERSION_PREFIX}{SCHEMA_VERSION}",
             properties=[
                 # Enable keyword indexing (inverted index) on relevant text properties
                 wc.Property(name="company_or_stock_name", data_type=wc.DataType.TEXT, index_filterable=True),
@@ -130,15 +478,82 @@ class WeaviateCollection:
                 wc.Property(name="data_month", data_type=wc.DataType.TEXT, index_filterable=True),
 
                 wc.Property(name="combined_text", data_type=wc.DataType.TEXT, index_searchable=True),
-                
-                wc.Property(name="quantity_of_shares", data_type=wc.DataType.NUMBER, index_filterable=False, index_searchable=False, vectorize_property_name=False),
-                wc.Property(name="market_value_lacs_inr", data_type=wc.DataType.NUMBER, index_filterable=False, index_searchable=False, vectorize_property_name=False),
-                wc.Property(name="asset_under_managment_percentage", data_type=wc.DataType.NUMBER, index_filterable=False, index_searchable=False, vectorize_property_name=False),
+
+                # Filterable so aggregations (sum/mean/top-k) can be computed from the inverted index,
+                # range-indexed so "above 5% AUM" style predicates are pushed down to the database
+                wc.Property(name="quantity_of_shares", data_type=wc.DataType.NUMBER, index_filterable=True, index_range_filters=True, index_searchable=False, vectorize_property_name=False),
+                wc.Property(name="market_value_lacs_inr", data_type=wc.DataType.NUMBER, index_filterable=True, index_range_filters=True, index_searchable=False, vectorize_property_name=False),
+                wc.Property(name="asset_under_managment_percentage", data_type=wc.DataType.NUMBER, index_filterable=True, index_range_filters=True, index_searchable=False, vectorize_property_name=False),
+
+                wc.Property(name=ROW_HASH_PROPERTY, data_type=wc.DataType.TEXT, index_filterable=False, index_searchable=False, skip_vectorization=True),
             ],
             vector_config=vector_config,
         )
+        bump_collection_version(collection_name)
 
 
+    def collection_schema_version(self, collection_name: str) -> int:
+        """
+        Returns the schema version recorded in a collection's description (1 for collections created before versioning).
+        """
+        description = self.client.collections.get(collection_name).config.get().description or ""
+        if description.startswith(SCHEMA_VERSION_PREFIX):
+            return int(description[len(SCHEMA_VERSION_PREFIX):])
+        return 1
+
+    def migrate_collection(self, source_name: str = COLLECTION_NAME, target_name: Optional[str] = None,
+                           swap_alias: bool = False, importer: Optional[BatchImporter] = None) -> dict:
+        """
+        Copies a collection into a new collection with the current schema version.
+
+        Index settings of existing properties cannot be changed in place, so the
+        objects are copied together with their vectors (nothing is re-embedded)
+        into `target_name`. With `swap_alias` the source collection is deleted
+        after the object counts match, and an alias with the source name is
+        pointed at the target, so queries for `source_name` keep working
+        (aliases need Weaviate 1.32+).
+        Args:
+            source_name (str): Existing collection.
+            target_name (str, optional): New collection; defaults to "<source>_v<SCHEMA_VERSION>".
+            swap_alias (bool): Replace the source collection by an alias to the target.
+            importer (BatchImporter, optional): Batch import settings for the copy.
+        Returns:
+            dict: Source and target object counts plus the importer's counts.
+        """
+        if not self.client:
+            raise ValueError("Weaviate client is not connected. Call connect() first.")
+        target_name = target_name or f"{source_name}_v{SCHEMA_VERSION}"
+        if source_name not in self.list_collection:
+            raise ValueError(f"Collection '{source_name}' does not exist.")
+        if target_name in self.list_collection:
+            raise ValueError(f"Collection '{target_name}' already exists. Delete it first to re-run the migration.")
+        version = self.collection_schema_version(source_name)
+        if version >= SCHEMA_VERSION:
+            print(f"Collection '{source_name}' already has schema version {version}, nothing to migrate")
+            return {"source": 0, "target": 0}
+
+        self.create_collection(target_name)
+        source = self.client.collections.get(source_name)
+        target = self.client.collections.get(target_name)
+        objects = (
+            (obj.properties, str(obj.uuid), obj.vector or None)
+            for obj in source.iterator(include_vector=True)
+        )
+        stats = (importer or BatchImporter()).run(target, objects)
+        stats["source"] = source.aggregate.over_all(total_count=True).total_count
+        stats["target"] = target.aggregate.over_all(total_count=True).total_count
+        print(f"Migrated '{source_name}' (v{version}) to '{target_name}' (v{SCHEMA_VERSION}): {stats}")
+
+        if swap_alias:
+            if stats["source"] != stats["target"]:
+                print(f"Object counts differ, keeping '{source_name}'; fix the failed objects and re-run")
+                return stats
+            self.client.collections.delete(source_name)
+            self.client.alias.create(alias_name=source_name, target_collection=target_name)
+            bump_collection_version(source_name)
+            print(f"Collection '{source_name}' replaced by an alias to '{target_name}'")
+        return stats
+
     def delete_collection(self, collection_name: str) -> None:
         """
         Deletes a Weaviate collection.
@@ -153,41 +568,134 @@ class WeaviateCollection:
             print(f"Collection '{collection_name}' does not exist.")
             return
         self.client.collections.delete(collection_name)
+        bump_collection_version(collection_name)
     
-    def insert_objects_into_collection(self, collection_name: str, stocks_objects: list[dict]) -> None:
+    def insert_objects_into_collection(self, collection_name: str, stocks_objects: Iterable[dict], embedder: Optional[OllamaBatchEmbedder] = None,
+                                       importer: Optional[BatchImporter] = None) -> dict:
         """
         Inserts objects into a specified collection in batches.
         Args:
             collection_name (str): Name of the collection.
-            stocks_objects (list[dict]): List of objects to insert.
+            stocks_objects (Iterable[dict]): Objects to insert. May be a lazy generator, in which
+                case objects are sent to Weaviate as they are produced.
+            embedder (OllamaBatchEmbedder, optional): Embeds objects client-side (batched and
+                cached on disk) and inserts them with precomputed vectors.
+            importer (BatchImporter, optional): Batching mode, concurrency, retry and dead-letter
+                settings; defaults to the WEAVIATE_IMPORT_* environment configuration.
+        Returns:
+            dict: Import counts and throughput reported by the importer.
         """
         if not self.client:
             raise ValueError("Weaviate client is not connected. Call connect() first.")
         if not collection_name:
             raise ValueError("Collection name cannot be empty.")
-        if not stocks_objects:
+        if not isinstance(stocks_objects, Iterator) and not stocks_objects:
             raise ValueError("Source objects cannot be empty.")
         collection = self.client.collections.get(collection_name)
-        with collection.batch.fixed_size(batch_size=200) as batch:
-            for src_obj in stocks_objects:
-                batch.add_object(
-                    properties={key: value for key, value in src_obj.items()}
-                )
-                if batch.number_errors > 10:
-                    print("Batch import stopped due to excessive errors.")
-                    break
-            
-        failed_objects = collection.batch.failed_objects
-        if failed_objects:
-            print(f"Number of failed imports: {len(failed_objects)}")
-            print(f"First failed object: {failed_objects[0]}")
+        importer = importer or BatchImporter()
+        id_stats = {"duplicates": 0}
+        objects = ((object_properties_with_hash(src_obj), obj_id) for src_obj, obj_id in iter_object_ids(stocks_objects, id_stats))
+        stats = importer.run(collection, iter_objects_with_vectors(objects, embedder))
+        stats["duplicates"] = id_stats["duplicates"]
 
-    def retrieve_objects_for_query(self, collection_name: str, user_query: str, target_vector: str = "company_info") -> QueryReturn:
+        bump_collection_version(collection_name)
+        print(f"Sent {stats['sent']} objects to collection '{collection_name}' ({stats['objects_per_second']} objects/sec)")
+        if stats["failed"]:
+            print(f"Number of failed imports: {stats['failed']}"
+                  + (f" (see {importer.dead_letter_path})" if stats["dead_lettered"] else ""))
+        if stats["duplicates"]:
+            dbg.warning("%d source rows repeat the (company, PMS, month) of an earlier row; kept as separate objects",
+                        stats["duplicates"])
+        return stats
+
+    def sync_objects_into_collection(self, collection_name: str, stocks_objects: Iterable[dict], delete_missing: bool = False,
+                                     embedder: Optional[OllamaBatchEmbedder] = None,
+                                     importer: Optional[BatchImporter] = None,
+                                     max_delete_fraction: float = SYNC_MAX_DELETE_FRACTION) -> dict[str, int]:
+        """
+        Incrementally syncs a collection with the given objects.
+
+        Every object gets a deterministic UUID from (company, PMS, month) (see
+        iter_object_ids for repeated rows) and a hash of its content. Only new or changed objects are upserted (and so
+        re-embedded by Ollama); unchanged ones are skipped, and objects that are
+        no longer present in the source are deleted when `delete_missing` is set.
+        Deletion is refused (and logged) when the source yielded no rows or when
+        more than `max_delete_fraction` of the collection would be deleted, since
+        an empty or misconfigured source folder looks the same as removed data.
+        Objects inserted before deterministic UUIDs existed are replaced on the first sync.
+        Args:
+            collection_name (str): Name of the collection.
+            stocks_objects (Iterable[dict]): Full set of source objects (may be a generator).
+            delete_missing (bool): Delete objects that are not in `stocks_objects` (opt-in).
+            embedder (OllamaBatchEmbedder, optional): Embeds upserted objects client-side.
+            importer (BatchImporter, optional): Batch import settings for the upserts.
+            max_delete_fraction (float): Largest share of the collection that may be deleted.
+        Returns:
+            dict[str, int]: Counts of unchanged, upserted, deleted and failed objects,
+                            and of missing objects kept because deletion was refused.
+        """
+        if not self.client:
+            raise ValueError("Weaviate client is not connected. Call connect() first.")
+        if not collection_name:
+            raise ValueError("Collection name cannot be empty.")
+        collection = self.client.collections.get(collection_name)
+
+        existing_hashes = {
+            str(obj.uuid): obj.properties.get(ROW_HASH_PROPERTY)
+            for obj in collection.iterator(return_properties=[ROW_HASH_PROPERTY])
+        }
+        stats = {"unchanged": 0, "upserted": 0, "deleted": 0, "failed": 0, "duplicates": 0, "delete_refused": 0}
+        seen: set[str] = set()
+
+        def changed_objects() -> Iterator[tuple[dict, str]]:
+            for src_obj, obj_id in iter_object_ids(stocks_objects, stats):
+                seen.add(obj_id)
+                properties = object_properties_with_hash(src_obj)
+                if existing_hashes.get(obj_id) == properties[ROW_HASH_PROPERTY]:
+                    stats["unchanged"] += 1
+                    continue
+                yield properties, obj_id
+
+        import_stats = (importer or BatchImporter()).run(collection, iter_objects_with_vectors(changed_objects(), embedder))
+        stats["upserted"] = import_stats["imported"]
+        stats["failed"] = import_stats["failed"]
+        if import_stats["aborted"]:
+            # Rows after the abort were never compared, so deleting "missing" objects would be wrong
+            print("Sync stopped due to excessive errors; skipping deletion of missing objects")
+            delete_missing = False
+
+        vanished = [obj_id for obj_id in existing_hashes if obj_id not in seen] if delete_missing else []
+        if vanished and not seen:
+            dbg.warning("Sync of '%s' saw no source rows; refusing to delete all %d objects (check the source folder)",
+                        collection_name, len(vanished))
+            stats["delete_refused"], vanished = len(vanished), []
+        elif vanished and len(vanished) > max_delete_fraction * len(existing_hashes):
+            dbg.warning("Sync of '%s' would delete %d of %d objects (more than %.0f%%); refusing, delete them "
+                        "explicitly or raise SYNC_MAX_DELETE_FRACTION if intended", collection_name, len(vanished),
+                        len(existing_hashes), max_delete_fraction * 100)
+            stats["delete_refused"], vanished = len(vanished), []
+        if vanished:
+            for start in range(0, len(vanished), SYNC_DELETE_CHUNK_SIZE):
+                chunk = vanished[start:start + SYNC_DELETE_CHUNK_SIZE]
+                result = collection.data.delete_many(where=Filter.by_id().contains_any(chunk))
+                stats["deleted"] += result.successful
+
+        if stats["upserted"] or stats["deleted"]:
+            bump_collection_version(collection_name)
+        if stats["duplicates"]:
+            dbg.warning("%d source rows repeat the (company, PMS, month) of an earlier row; kept as separate objects",
+                        stats["duplicates"])
+        print(f"Sync of '{collection_name}': {stats}")
+        return stats
+
+    def retrieve_objects_for_query(self, collection_name: str, user_query: str, target_vector: str = "company_info",
+                                   filters: Optional[_Filters] = None) -> QueryReturn:
         """
         Queries and prints objects from a collection using a near-text search.
         Args:
             collection_name (str): Name of the collection to query.
             user_query (str): The query string to search for.
+            filters (Filter, optional): Structured filter, e.g. from build_entity_filter.
         """
         try:
             if not self.client:
@@ -195,20 +703,7 @@ class WeaviateCollection:
             if not collection_name:
                 raise ValueError("Collection name cannot be empty.")
             collection = self.client.collections.get(collection_name)
-            response = collection.query.hybrid(
-                query=user_query,
-                # vector= vector of the query to be used for vector seracg
-                query_properties=VECTOR_NAMES,
-                max_vector_distance=0.4,
-                alpha=0.7,
-                # limit=5000,
-                fusion_type=HybridFusion.RELATIVE_SCORE,
-                auto_limit=True,
-                target_vector=target_vector,
-                filters=None,
-                return_metadata=wq.MetadataQuery(score=True, explain_score=True, certainty=True),
-                return_properties=["combined_text"],
-            )
+            response = collection.query.hybrid(**hybrid_query_args(user_query, target_vector, filters=filters))
         except Exception as e:
             print(f"Error retrieving objects for query: {e}")
             response = None
@@ -237,6 +732,129 @@ class WeaviateCollection:
             print(f"\n {obj.properties.get("company_or_stock_name")}")
         print(f"Total {len(response.objects)} objects retrieved from collection '{COLLECTION_NAME}'")
 
+class AsyncWeaviateCollection:
+    """
+    Async counterpart of WeaviateCollection built on WeaviateAsyncClient, so
+    queries and inserts await the network instead of blocking the event loop.
+    """
+    def __init__(self, client: WeaviateAsyncClient):
+        self.client = client
+
+    async def list_collection(self) -> list:
+        """Lists all collection names in the Weaviate instance."""
+        collections = await self.client.collections.list_all()
+        return list(collections)
+
+    async def insert_objects_into_collection(self, collection_name: str, stocks_objects: list[dict], batch_size: int = 200) -> None:
+        """
+        Inserts objects into a specified collection in batches of insert_many calls.
+        Objects get the same deterministic UUIDs and row hashes as the sync
+        path (see iter_object_ids), so a re-import overwrites them instead of
+        adding duplicates and a later sync_objects_into_collection sees them as unchanged.
+        Args:
+            collection_name (str): Name of the collection.
+            stocks_objects (list[dict]): List of objects to insert.
+            batch_size (int): Number of objects sent per request.
+        """
+        if not self.client:
+            raise ValueError("Weaviate client is not connected. Call connect_async() first.")
+        if not collection_name:
+            raise ValueError("Collection name cannot be empty.")
+        if not stocks_objects:
+            raise ValueError("Source objects cannot be empty.")
+        collection = self.client.collections.get(collection_name)
+        id_stats = {"duplicates": 0}
+        data_objects = [
+            DataObject(properties=object_properties_with_hash(src_obj), uuid=obj_id)
+            for src_obj, obj_id in iter_object_ids(stocks_objects, id_stats)
+        ]
+        if id_stats["duplicates"]:
+            dbg.warning("%d source rows repeat the (company, PMS, month) of an earlier row; kept as separate objects",
+                        id_stats["duplicates"])
+        failed_objects = []
+        for start in range(0, len(data_objects), batch_size):
+            response = await collection.data.insert_many(data_objects[start:start + batch_size])
+            failed_objects.extend(response.errors.values())
+            if len(failed_objects) > 10:
+                print("Batch import stopped due to excessive errors.")
+                break
+
+        bump_collection_version(collection_name)
+        if failed_objects:
+            print(f"Number of failed imports: {len(failed_objects)}")
+            print(f"First failed object: {failed_objects[0]}")
+
+    async def retrieve_objects_for_query(self, collection_name: str, user_query: str, target_vector: str = "company_info",
+                                         query_vector: Optional[list[float]] = None,
+                                         filters: Optional[_Filters] = None, limit: Optional[int] = None,
+                                         profile: Optional[SearchProfile] = None) -> Optional[QueryReturn]:
+        """
+        Queries objects from a collection using a hybrid search.
+        Args:
+            collection_name (str): Name of the collection to query.
+            user_query (str): The query string to search for.
+            query_vector (list[float], optional): Precomputed query vector (client-side embedding).
+            filters (Filter, optional): Structured filter, e.g. from build_entity_filter.
+            limit (int, optional): Fixed number of candidates (e.g. for reranking) instead of the profile's limit.
+            profile (SearchProfile, optional): Retrieval parameters; defaults to the configured default profile.
+        """
+        try:
+            if not self.client:
+                raise ValueError("Weaviate client is not connected. Call connect_async() first.")
+            if not collection_name:
+                raise ValueError("Collection name cannot be empty.")
+            collection = self.client.collections.get(collection_name)
+            with stage_span("weaviate_hybrid", collection=collection_name):
+                response = await collection.query.hybrid(**hybrid_query_args(user_query, target_vector, vector=query_vector, filters=filters,
+                                                                         limit=limit, profile=profile))
+        except Exception as e:
+            dbg.error("Error retrieving objects for query: %s", e)
+            response = None
+        return response
+
+    async def aggregate_numeric(self, collection_name: str, property_name: str, group_by: Optional[str] = None,
+                                filters: Optional[_Filters] = None) -> Optional[AggregateReturn | AggregateGroupByReturn]:
+        """
+        Computes count, sum, mean and maximum of a numeric property server-side.
+        Args:
+            collection_name (str): Name of the collection.
+            property_name (str): Numeric property to aggregate.
+            group_by (str, optional): Text property to group the rows by.
+            filters (Filter, optional): Restricts the aggregation to matching objects.
+        """
+        try:
+            if not self.client:
+                raise ValueError("Weaviate client is not connected. Call connect_async() first.")
+            collection = self.client.collections.get(collection_name)
+            with stage_span("weaviate_aggregate", collection=collection_name):
+                response = await collection.aggregate.over_all(
+                    filters=filters,
+                    group_by=GroupByAggregate(prop=group_by) if group_by else None,
+                    total_count=True,
+                    return_metrics=Metrics(property_name).number(count=True, sum_=True, mean=True, maximum=True),
+                )
+        except Exception as e:
+            dbg.error("Error aggregating objects: %s", e)
+            response = None
+        return response
+
+    async def fetch_objects(self, collection_name: str = COLLECTION_NAME, objects_num: int = 5) -> Optional[QueryReturn]:
+        """
+        Fetches a specified number of objects from the collection.
+        Args:
+            collection_name (str): Name of the collection.
+            objects_num (int): Number of objects to fetch.
+        """
+        if not self.client:
+            raise ValueError("Weaviate client is not connected. Call connect_async() first.")
+        if objects_num <= 0:
+            raise ValueError("Number of objects must be a positive integer.")
+        collection = self.client.collections.get(collection_name)
+        return await collection.query.fetch_objects(
+            limit=objects_num,
+            return_properties=properties_list,
+        )
+
 def format_investment_summary(data_dict: dict[str, str]) -> str:
     """
     Converts a dictionary containing financial data into a human-readable summary string.
@@ -274,29 +892,207 @@ def format_investment_summary(data_dict: dict[str, str]) -> str:
         return f"An unexpected error occurred: {e}"
 
     
+@asynccontextmanager
+async def vector_db_client() -> AsyncIterator[WeaviateAsyncClient]:
+    """
+    Yields a pooled async client when the process-wide pool is started (server),
+    otherwise a one-off connection (scripts and manual tests).
+    """
+    if db_pool is not None:
+        async with db_pool.acquire() as cl:
+            yield cl
+    else:
+        async with AppWeaviateClient(**DB_CONFIG) as cl:
+            yield cl
+
+
+def reciprocal_rank_fusion(hit_lists: list[list[dict]], k: int = 60) -> list[dict]:
+    """
+    Merges several ranked hit lists with reciprocal-rank fusion.
+
+    Each hit is a dict with "uuid", "score" and "properties". Hits sharing a
+    uuid are merged into one whose "score" is the fused score sum(1 / (k + rank)).
+    Returns the merged hits ordered by fused score.
+    """
+    fused: dict[str, dict] = {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["uuid"], {**hit, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)
+
+
+def _format_number(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:,.2f}".rstrip("0").rstrip(".")
+
+def format_aggregate_table(intent: "AggregateIntent", response: AggregateReturn | AggregateGroupByReturn,
+                           entity_filters: Optional[dict[str, list[str] | dict[str, float]]] = None) -> list[str]:
+    """
+    Renders an aggregate result as a few compact table lines for the LLM.
+    """
+    prop = intent.property_name
+    scope = "all holdings"
+    if entity_filters:
+        scope = "holdings where " + describe_filters(entity_filters)
+    if intent.group_by is None:
+        stats = response.properties.get(prop)
+        return [
+            f"Aggregate over {scope} ({response.total_count or 0} rows), computed by the database:",
+            f"{prop}: sum {_format_number(stats.sum_ if stats else None)} | mean {_format_number(stats.mean if stats else None)}"
+            f" | max {_format_number(stats.maximum if stats else None)}",
+        ]
+
+    rows = []
+    for group in response.groups:
+        stats = group.properties.get(prop)
+        rows.append((group.grouped_by.value, stats, group.total_count or 0))
+    if intent.metric == "count":
+        rows.sort(key=lambda row: row[2], reverse=True)
+    else:
+        rank_by = "mean" if intent.metric == "mean" else "sum_"
+        rows.sort(key=lambda row: getattr(row[1], rank_by, None) or 0.0, reverse=not intent.ascending)
+    limit = intent.top_k if intent.metric == "top" else AGGREGATE_MAX_ROWS
+    header = f"{len(rows)} distinct {intent.group_by} values" if intent.metric == "count" \
+        else f"{prop} grouped by {intent.group_by}"
+    ranked_by = {"count": "rows", "mean": "mean"}.get(intent.metric, "sum")
+    order = f"{'bottom' if intent.ascending else 'top'} {min(limit, len(rows))} by {ranked_by}"
+    lines = [
+        f"Aggregate over {scope}, computed by the database: {header} ({order}):",
+        f"{intent.group_by} | sum {prop} | mean | max | rows",
+    ]
+    for value, stats, count in rows[:limit]:
+        lines.append(f"{value} | {_format_number(stats.sum_ if stats else None)} | {_format_number(stats.mean if stats else None)}"
+                     f" | {_format_number(stats.maximum if stats else None)} | {count}")
+    return lines
+
+async def get_aggregate_context(intent: "AggregateIntent", entity_filters: Optional[dict[str, list[str] | dict[str, float]]] = None) -> list[str]:
+    """
+    Answers an aggregate question with Weaviate's aggregate API and returns the
+    result as compact table lines (instead of hundreds of retrieved rows).
+    Returns an empty list if the aggregation failed or matched no rows, so the
+    caller can fall back to retrieval.
+    """
+    cache_key = intent.key()
+    cache_namespace = "aggregate:" + (json.dumps(entity_filters, sort_keys=True) if entity_filters else "")
+    cached_context = await context_cache.get(cache_key, namespace=cache_namespace)
+    if cached_context is not None:
+        dbg.info("Aggregate cache hit for: %s", intent)
+        return cached_context
+
+    async with stage_slot("retrieval"), vector_db_client() as cl:
+        col = AsyncWeaviateCollection(client=cl)
+        response = await col.aggregate_numeric(COLLECTION_NAME, intent.property_name, intent.group_by,
+                                               build_entity_filter(entity_filters))
+    if response is None:
+        return []
+    # No matching rows: a table of zeros is no context, let retrieval answer
+    if not (response.groups if intent.group_by else response.total_count):
+        dbg.info("Aggregate %s matched no rows", intent)
+        return []
+    context_list = format_aggregate_table(intent, response, entity_filters)
+    dbg.info("Aggregate %s answered with %d context lines", intent, len(context_list))
+    await context_cache.set(cache_key, context_list, namespace=cache_namespace)
+    return context_list
+
+
 # async def get_context_from_vector_db(user_query_str: str) -> list[dict[str, str]]:
 async def get_context_from_vector_db(user_query_str: str) -> list[str]:
-    db_config  = {"host": "127.0.0.1", "port": 80, "grpc_port": 50051}
+    """
+    Retrieves context lines for a query from the vector database.
+    Results are cached in `context_cache` until they expire or the collection is re-ingested.
+    """
+    return await get_context_for_queries([user_query_str])
+
+async def get_context_for_queries(queries: list[str], entity_filters: Optional[dict[str, list[str] | dict[str, float]]] = None) -> list[str]:
+    """
+    Retrieves context lines (combined_text) for one or more (sub-)queries from
+    the vector database; see get_hits_for_queries.
+    """
+    hits = await get_hits_for_queries(queries, entity_filters)
+    return [format_investment_summary(hit["properties"]) for hit in hits]
+
+async def get_hits_for_queries(queries: list[str], entity_filters: Optional[dict[str, list[str] | dict[str, float]]] = None,
+                               limit: Optional[int] = None, profile: Optional[SearchProfile] = None) -> list[dict]:
+    """
+    Retrieves hits ({"uuid", "score", "properties"}, best first) for one or more
+    (sub-)queries from the vector database.
+
+    With several queries (e.g. decomposed sub-queries) the hybrid searches run
+    concurrently and their hits are merged with reciprocal-rank fusion and
+    de-duplicated by object UUID.
+    `entity_filters` (allowed values per field, see extract_query_filters) restrict
+    every search to matching objects; if the filtered searches find nothing,
+    they are retried without filters.
+    `limit` fetches a fixed number of candidates per query, without the score
+    cutoff, for a reranking stage to choose from.
+    `profile` selects the retrieval parameters (see config.settings); defaults to the configured default profile.
+    Results are cached in `context_cache` until they expire or the collection is re-ingested.
+    """
+    queries = [q for q in queries if q and q.strip()]
+    if not queries:
+        return []
+    profile = profile or get_settings().search_profile()
+    cache_key = "\n".join(queries)
+    cache_namespace = json.dumps(entity_filters, sort_keys=True) if entity_filters else ""
+    if limit is not None:
+        cache_namespace += f"|limit={limit}"
+    # Profiles can be edited while running; key on their parameters, not only the name
+    cache_namespace += "|profile=" + json.dumps(profile.as_dict(), sort_keys=True)
+    cached_hits = await context_cache.get(cache_key, namespace=cache_namespace)
+    if cached_hits is not None:
+        dbg.info("Vector DB context cache hit for: %s", queries)
+        return cached_hits
+
+    filters = build_entity_filter(entity_filters)
+    async with stage_slot("retrieval"), vector_db_client() as cl:
+        hit_lists = await asyncio.gather(*(_search_hits(cl, query, filters, limit, profile) for query in queries))
+        if filters is not None and not any(hit_lists):
+            dbg.info("No objects matched filters %s, retrying without filters", entity_filters)
+            hit_lists = await asyncio.gather(*(_search_hits(cl, query, limit=limit, profile=profile) for query in queries))
+    hits = hit_lists[0] if len(hit_lists) == 1 else reciprocal_rank_fusion(hit_lists)
+    if len(queries) > 1:
+        dbg.info("Total %d unique objects fused from %d sub-queries", len(hits), len(queries))
+
+    # Empty results may come from a failed query; only cache real context
+    if hits:
+        await context_cache.set(cache_key, hits, namespace=cache_namespace)
+    return hits
+
+def select_hits(response: QueryReturn, profile: SearchProfile, limit: Optional[int] = None) -> list[dict]:
+    """
+    Turns a hybrid query response into hits ({"uuid", "score", "properties"}),
+    dropping those below the profile's min_score. Reranking candidates (a fixed
+    `limit`) keep low scores; the reranker decides.
+    """
+    hits = []
+    for obj in response.objects:
+        score = obj.metadata.score if obj.metadata and obj.metadata.score else 0.0
+        if limit is None and score < profile.min_score:
+            continue
+        hits.append({"uuid": str(obj.uuid), "score": score, "properties": obj.properties})
+    return hits
+
+async def _search_hits(cl: WeaviateAsyncClient, user_query_str: str, filters: Optional[_Filters] = None,
+                       limit: Optional[int] = None, profile: Optional[SearchProfile] = None) -> list[dict]:
     COLLECTION_NAME = "StocksInfo"
-    context_list = []
-    count = 1
-    select  = 1
-    with AppWeaviateClient(**db_config) as cl:
-        col = WeaviateCollection(client=cl)
-        response = col.retrieve_objects_for_query(COLLECTION_NAME, user_query_str.lower())
-        if not response or not response.objects:
-            return context_list
-        for obj in response.objects:
-            count += 1
-            score = obj.metadata.score if obj.metadata and obj.metadata.score else 0.0
-            if score < 0.3:
-                continue
-            
-            select += 1
-            stocks_str = format_investment_summary(obj.properties)
-            # print(f"Object from Vector DB: {stocks_str} \n")
-            context_list.append(stocks_str)
-        
-        print(f"Total {count} objects retrieved from Vector DB")
-        print(f"Total {select} objects selected from Vector DB")
-    return context_list
+    col = AsyncWeaviateCollection(client=cl)
+    query = user_query_str.lower()
+    embedder = get_query_embedder()
+    if embedder:
+        with stage_span("query_embedding"):
+            query_vector = await embedder.aembed_query(query)
+    else:
+        query_vector = None
+    profile = profile or get_settings().search_profile()
+    response = await col.retrieve_objects_for_query(COLLECTION_NAME, query, query_vector=query_vector, filters=filters,
+                                                    limit=limit, profile=profile)
+    if not response or not response.objects:
+        observe_retrieved("retrieved", 0)
+        return []
+    hits = select_hits(response, profile, limit)
+
+    dbg.info("Total %d objects retrieved from Vector DB", len(response.objects))
+    dbg.info("Total %d objects selected from Vector DB", len(hits))
+    observe_retrieved("retrieved", len(response.objects))
+    observe_retrieved("selected", len(hits))
+    return hits
@@ -0,0 +1,187 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from langchain_ollama import OllamaEmbeddings
+
+from debug.logger_config import dbg
+
+EMBEDDING_CACHE_DIR = os.environ.get(
+    "EMBEDDING_CACHE_DIR", os.path.join(os.path.expanduser("~"), "var_cache", "embeddings")
+)
+# Ollama endpoint as seen from this process (Weaviate reaches Ollama through OLLAMA_API_URL instead)
+CLIENT_EMBEDDING_URL = os.environ.get("CLIENT_EMBEDDING_URL", "http://localhost:11434")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", "4"))
+# "server": Weaviate's text2vec-ollama module embeds objects and queries
+# "client": vectors are computed here in batches, cached on disk and sent with objects / queries
+EMBEDDING_MODE = os.environ.get("EMBEDDING_MODE", "server")
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by a hash of (model, text).
+
+    Vectors are appended as raw float32 rows to `vectors.f32` and read through a
+    NumPy memory map; `keys.txt` holds one text hash per line in the same row
+    order. Appends take an exclusive file lock and first pick up rows written by
+    other processes, so the ingestion job and the API server can share a cache.
+    """
+    def __init__(self, model: str, cache_dir: str = EMBEDDING_CACHE_DIR):
+        self.model = model
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.keys_path = os.path.join(self.cache_dir, "keys.txt")
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+        self.lock_path = os.path.join(self.cache_dir, ".lock")
+        self.dim: Optional[int] = None
+        self._index: dict[str, int] = {}
+        self._keys_offset = 0
+        self._mmap: Optional[np.memmap] = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def text_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Loads key lines appended (possibly by another process) since the last refresh."""
+        if not os.path.exists(self.keys_path):
+            return
+        if os.path.getsize(self.keys_path) == self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for key in complete.decode("ascii").splitlines():
+            self._index.setdefault(key, len(self._index))
+        self._keys_offset += len(complete)
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._mmap = None
+
+    def _vectors(self) -> Optional[np.memmap]:
+        if self._mmap is None and self.dim and self._index:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self._index), self.dim))
+        return self._mmap
+
+    def get_many(self, texts: list[str]) -> list[Optional[np.ndarray]]:
+        """Returns the cached vector for each text, or None where it is not cached."""
+        keys = [self.text_key(text) for text in texts]
+        if any(key not in self._index for key in keys):
+            self._refresh()
+        vectors = self._vectors()
+        return [
+            np.array(vectors[self._index[key]]) if vectors is not None and key in self._index else None
+            for key in keys
+        ]
+
+    def put_many(self, texts: list[str], vectors: Iterable[Iterable[float]]) -> None:
+        """Appends vectors for texts that are not cached yet."""
+        matrix = np.asarray(list(vectors), dtype=np.float32)
+        if not len(texts):
+            return
+        with self._locked():
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cached dimension {self.dim}")
+            new_rows, new_keys = [], []
+            for text, vector in zip(texts, matrix):
+                key = self.text_key(text)
+                if key not in self._index and key not in new_keys:
+                    new_rows.append(vector)
+                    new_keys.append(key)
+            if not new_keys:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.vstack(new_rows).astype(np.float32).tobytes())
+            with open(self.keys_path, "a", encoding="ascii") as f:
+                f.write("".join(f"{key}\n" for key in new_keys))
+            self._refresh()
+
+
+class OllamaBatchEmbedder:
+    """
+    Computes embeddings client-side with batched, concurrent calls to Ollama's
+    embed endpoint, serving repeated texts from an EmbeddingCache.
+    """
+    def __init__(
+        self,
+        model: str,
+        base_url: str = CLIENT_EMBEDDING_URL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        if batch_size <= 0 or concurrency <= 0:
+            raise ValueError("Batch size and concurrency must be positive integers")
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else EmbeddingCache(model)
+        self.base_url = base_url
+        self._embeddings = OllamaEmbeddings(model=model, base_url=base_url)
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts, calling Ollama only for texts missing from the cache.
+        """
+        return await self._aembed(texts, self._embeddings)
+
+    async def _aembed(self, texts: list[str], embeddings: OllamaEmbeddings) -> list[list[float]]:
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def embed_batch(batch: list[str]) -> list[list[float]]:
+                async with semaphore:
+                    return await embeddings.aembed_documents(batch)
+
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+            computed = {text: vector for batch, vectors in zip(batches, results) for text, vector in zip(batch, vectors)}
+            self.cache.put_many(list(computed), list(computed.values()))
+            dbg.info("Embedded %d texts in %d batches (%d cache hits)", len(missing), len(batches), len(texts) - len(missing))
+            cached = [vector if vector is not None else np.asarray(computed[text], dtype=np.float32)
+                      for text, vector in zip(texts, cached)]
+        return [vector.tolist() for vector in cached]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed([text]))[0]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Synchronous wrapper for ingestion scripts that do not run an event loop.
+        Every call runs its own event loop, so it uses a client created for that
+        loop; the async HTTP client of a closed loop cannot be reused.
+        """
+        embeddings = OllamaEmbeddings(model=self.model, base_url=self.base_url)
+        return asyncio.run(self._aembed(texts, embeddings))
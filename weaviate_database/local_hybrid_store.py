@@ -0,0 +1,403 @@
+import asyncio
+import math
+import re
+import zlib
+from array import array
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Sequence
+
+import numpy as np
+from weaviate.classes.query import HybridFusion
+from weaviate.collections.classes.aggregate import (
+    AggregateGroup, AggregateGroupByReturn, AggregateNumber, AggregateReturn, GroupByAggregate, GroupedBy,
+)
+from weaviate.collections.classes.filters import _FilterAnd, _FilterOr, _Filters, _FilterValue
+
+from weaviate_database.db_collection import COLLECTION_NAME, VECTOR_NAMES, iter_object_ids
+
+# In-process stand-in for a Weaviate collection, answering the hybrid queries
+# built by hybrid_query_args without a server or an embedding model, so the
+# retrieval benchmarks can run offline. LocalClientPool serves the collections
+# to the server's async retrieval path (in place of the Weaviate client pool)
+# for load tests.
+#
+# It mirrors what the queries rely on, not Weaviate's exact scoring:
+# - keyword search is BM25 (k1=1.2, b=0.75) over the VECTOR_NAMES properties
+# - vectors are idf-weighted bag-of-words (numbers left out) hashed into `dim`
+#   buckets, so vector distances are not comparable to nomic-embed-text ones
+# - relative_score / ranked fusion, max_vector_distance, autocut (auto_limit),
+#   limit and property filters (and/or, equal, not equal, ranges) behave like Weaviate
+# - aggregate.over_all computes number metrics (count, sum, mean, min, max,
+#   median), optionally grouped by a text property, over the filtered rows
+
+_TOKEN_RE = re.compile(r"\w+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Candidates taken from each of the keyword and vector searches when no limit is given
+SEARCH_POOL = 100
+DEFAULT_DIM = 256
+RANKED_FUSION_K = 60
+
+_COMPARISONS = {
+    "Equal": np.equal,
+    "NotEqual": np.not_equal,
+    "GreaterThan": np.greater,
+    "GreaterThanEqual": np.greater_equal,
+    "LessThan": np.less,
+    "LessThanEqual": np.less_equal,
+}
+
+
+class LocalMetadata:
+    def __init__(self, score: float, distance: Optional[float] = None):
+        self.score = score
+        self.distance = distance
+        self.certainty = None if distance is None else 1 - distance / 2
+        self.explain_score = None
+
+
+class LocalObject:
+    def __init__(self, uuid: str, properties: dict, metadata: LocalMetadata):
+        self.uuid = uuid
+        self.properties = properties
+        self.metadata = metadata
+
+
+class LocalQueryReturn:
+    def __init__(self, objects: list[LocalObject]):
+        self.objects = objects
+
+
+def autocut(scores: Sequence[float], cut_off: int = 1) -> int:
+    """
+    Number of results kept by Weaviate's autocut: results are cut at the
+    `cut_off`-th jump in the (descending) score curve.
+    """
+    count = len(scores)
+    if count <= 1 or scores[0] == scores[-1]:
+        return count
+    step = 1 / (count - 1)
+    diff = [(scores[i] - scores[-1]) / (scores[0] - scores[-1]) - (1 - i * step) for i in range(count)]
+    extrema = 0
+    for i in range(1, count - 1):
+        if diff[i] > diff[i - 1] and diff[i] > diff[i + 1]:
+            extrema += 1
+            if extrema >= cut_off:
+                return i
+    return count
+
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    low, high = scores.min(), scores.max()
+    return np.ones_like(scores) if high == low else (scores - low) / (high - low)
+
+
+class LocalHybridCollection:
+    """
+    Holds preprocessed rows (see data_preprocess_stock) in memory with a BM25
+    index and hashed vectors. `collection.query.hybrid(**hybrid_query_args(...))`
+    returns objects with uuid, properties and metadata.score like the Weaviate client.
+    """
+    def __init__(self, rows: list[dict], name: str = COLLECTION_NAME, dim: int = DEFAULT_DIM,
+                 text_properties: Sequence[str] = VECTOR_NAMES):
+        self.name = name
+        self.rows = rows
+        self.dim = dim
+        self.text_properties = list(text_properties)
+        self.uuids = [obj_id for _, obj_id in iter_object_ids(rows)]
+        self.query = _LocalQuery(self)
+        self.aggregate = _LocalAggregate(self)
+        self._build_keyword_index()
+        self._build_vectors()
+        self._build_columns()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _build_keyword_index(self) -> None:
+        count = len(self.rows)
+        vocab: dict[str, int] = {}
+        terms, docs = array("i"), array("i")
+        lengths = np.zeros(count, dtype=np.float32)
+        for i, row in enumerate(self.rows):
+            text = " ".join(str(row.get(prop) or "") for prop in self.text_properties).lower()
+            ids = [vocab.setdefault(token, len(vocab)) for token in _TOKEN_RE.findall(text)]
+            terms.extend(ids)
+            docs.extend(array("i", [i]) * len(ids))
+            lengths[i] = len(ids)
+        # One posting per (term, document) with its term frequency, grouped by term
+        pairs = np.frombuffer(terms, dtype=np.int32).astype(np.int64) * count + np.frombuffer(docs, dtype=np.int32)
+        pairs, frequencies = np.unique(pairs, return_counts=True)
+        self._vocab = vocab
+        self._posting_terms = (pairs // count).astype(np.int32)
+        self._posting_docs = (pairs % count).astype(np.int32)
+        self._posting_tf = frequencies.astype(np.float32)
+        self._offsets = np.searchsorted(self._posting_terms, np.arange(len(vocab) + 1))
+        document_frequency = np.diff(self._offsets)
+        self._idf = np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        self._length_norm = (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()), 1.0)).astype(np.float32)
+
+    def _term_slot(self, term: str) -> tuple[int, float]:
+        # Bucket and sign of a term in the hashed vector space; crc32 is stable across
+        # processes, unlike hash() on str (PYTHONHASHSEED), so results are reproducible
+        code = zlib.crc32(term.encode("utf-8"))
+        return code % self.dim, 1.0 if (code // self.dim) % 2 else -1.0
+
+    def _build_vectors(self) -> None:
+        slots = [self._term_slot(term) for term in self._vocab]
+        buckets = np.array([bucket for bucket, _ in slots], dtype=np.int64)
+        # Numbers are unique per row and would dominate the idf weights; embeddings hardly encode them
+        signs = np.array([0.0 if term.isdigit() else sign for term, (_, sign) in zip(self._vocab, slots)],
+                         dtype=np.float32)
+        weights = (1 + np.log(self._posting_tf)) * self._idf[self._posting_terms] * signs[self._posting_terms]
+        self._vectors = np.zeros((len(self.rows), self.dim), dtype=np.float32)
+        np.add.at(self._vectors, (self._posting_docs, buckets[self._posting_terms]), weights)
+        norms = np.linalg.norm(self._vectors, axis=1, keepdims=True)
+        self._vectors /= np.where(norms == 0, 1, norms)
+
+    def _build_columns(self) -> None:
+        # Text properties as integer codes, numeric ones as float arrays (NaN for missing)
+        self._text_codes: dict[str, tuple[dict[str, int], np.ndarray]] = {}
+        self._numbers: dict[str, np.ndarray] = {}
+        for prop in (self.rows[0].keys() if self.rows else []):
+            values = [row.get(prop) for row in self.rows]
+            if all(value is None or isinstance(value, (int, float)) for value in values):
+                self._numbers[prop] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            else:
+                codes: dict[str, int] = {}
+                self._text_codes[prop] = (codes, np.array([codes.setdefault(str(value), len(codes)) for value in values],
+                                                          dtype=np.int32))
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.lower())
+        for token in set(tokens):
+            if token.isdigit():
+                continue
+            bucket, sign = self._term_slot(token)
+            term_id = self._vocab.get(token)
+            idf = self._idf[term_id] if term_id is not None else float(self._idf.max(initial=1.0))
+            vector[bucket] += sign * (1 + math.log(tokens.count(token))) * idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def filter_mask(self, filters: Optional[_Filters]) -> Optional[np.ndarray]:
+        """Boolean row mask of a weaviate filter; None when there is no filter."""
+        if filters is None:
+            return None
+        if isinstance(filters, (_FilterAnd, _FilterOr)):
+            masks = [self.filter_mask(f) for f in filters.filters]
+            return np.logical_and.reduce(masks) if isinstance(filters, _FilterAnd) else np.logical_or.reduce(masks)
+        if not isinstance(filters, _FilterValue) or not isinstance(filters.target, str):
+            raise NotImplementedError(f"Filter not supported by the local stand-in: {filters!r}")
+        operator = _COMPARISONS.get(filters.operator.value)
+        if operator is None:
+            raise NotImplementedError(f"Filter operator not supported by the local stand-in: {filters.operator.value}")
+        if filters.target in self._numbers:
+            return operator(self._numbers[filters.target], float(filters.value))
+        codes, column = self._text_codes[filters.target]
+        return operator(column, codes.get(str(filters.value), -1))
+
+    def _keyword_search(self, query: str, mask: Optional[np.ndarray], pool: int) -> tuple[np.ndarray, np.ndarray]:
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        for token in set(_TOKEN_RE.findall(query.lower())):
+            term_id = self._vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs, tf = self._posting_docs[start:end], self._posting_tf[start:end]
+            scores[docs] += self._idf[term_id] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * self._length_norm[docs])
+        if mask is not None:
+            scores[~mask] = 0
+        return self._top(scores, scores > 0, pool)
+
+    def _vector_search(self, vector: np.ndarray, mask: Optional[np.ndarray], pool: int,
+                       max_distance: Optional[float]) -> tuple[np.ndarray, np.ndarray]:
+        similarities = self._vectors @ vector.astype(np.float32)
+        keep = np.ones(len(self.rows), dtype=bool) if mask is None else mask.copy()
+        if max_distance is not None:
+            keep &= (1 - similarities) <= max_distance
+        return self._top(similarities, keep, pool)
+
+    @staticmethod
+    def _top(scores: np.ndarray, keep: np.ndarray, pool: int) -> tuple[np.ndarray, np.ndarray]:
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > pool:
+            candidates = candidates[np.argpartition(-scores[candidates], pool - 1)[:pool]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates]
+
+    def hybrid(self, query: str, vector: Optional[Sequence[float]] = None, alpha: float = 0.7,
+               max_vector_distance: Optional[float] = None, limit: Optional[int] = None,
+               fusion_type: HybridFusion = HybridFusion.RELATIVE_SCORE, auto_limit: Optional[int | bool] = None,
+               filters: Optional[_Filters] = None, return_properties: Optional[Sequence[str]] = None,
+               **_: Any) -> LocalQueryReturn:
+        mask = self.filter_mask(filters)
+        pool = limit or SEARCH_POOL
+        query_vector = np.asarray(vector, dtype=np.float32) if vector is not None else self.vectorize(query)
+        keyword_ids, keyword_scores = self._keyword_search(query, mask, pool)
+        vector_ids, vector_scores = self._vector_search(query_vector, mask, pool, max_vector_distance)
+
+        fused: dict[int, float] = {}
+        if fusion_type == HybridFusion.RANKED:
+            for weight, ids in ((1 - alpha, keyword_ids), (alpha, vector_ids)):
+                for rank, doc in enumerate(ids.tolist()):
+                    fused[doc] = fused.get(doc, 0.0) + weight / (RANKED_FUSION_K + rank)
+        else:
+            for weight, ids, scores in ((1 - alpha, keyword_ids, keyword_scores), (alpha, vector_ids, vector_scores)):
+                if len(ids):
+                    for doc, score in zip(ids.tolist(), _normalize(scores).tolist()):
+                        fused[doc] = fused.get(doc, 0.0) + weight * score
+        distances = dict(zip(vector_ids.tolist(), (1 - vector_scores).tolist()))
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        if auto_limit:
+            ranked = ranked[:autocut([score for _, score in ranked], int(auto_limit))]
+        ranked = ranked[:pool]
+        return LocalQueryReturn([
+            LocalObject(
+                self.uuids[doc],
+                {prop: self.rows[doc].get(prop) for prop in return_properties} if return_properties else dict(self.rows[doc]),
+                LocalMetadata(score, distances.get(doc)),
+            )
+            for doc, score in ranked
+        ])
+
+
+    def _number_metrics(self, metrics: list, rows: np.ndarray) -> dict[str, AggregateNumber]:
+        properties = {}
+        for metric in metrics:
+            values = self._numbers[metric.property_name][rows]
+            values = values[~np.isnan(values)]
+
+            def stat(requested: bool, fn) -> Optional[float]:
+                return float(fn(values)) if requested and len(values) else None
+            properties[metric.property_name] = AggregateNumber(
+                count=int(len(values)) if metric.count else None,
+                maximum=stat(metric.maximum, np.max), mean=stat(metric.mean, np.mean),
+                median=stat(metric.median, np.median), minimum=stat(metric.minimum, np.min),
+                mode=None, sum_=stat(metric.sum_, np.sum),
+            )
+        return properties
+
+    def aggregate_over_all(self, filters: Optional[_Filters] = None, group_by: Optional[GroupByAggregate] = None,
+                           total_count: bool = False, return_metrics: Any = None,
+                           **_: Any) -> AggregateReturn | AggregateGroupByReturn:
+        """Number metrics over the filtered rows, like `collection.aggregate.over_all(...)` (mode is not computed)."""
+        mask = self.filter_mask(filters)
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(self.rows))
+        if return_metrics is None:
+            metrics = []
+        else:
+            metrics = list(return_metrics) if isinstance(return_metrics, (list, tuple)) else [return_metrics]
+        if group_by is None:
+            return AggregateReturn(properties=self._number_metrics(metrics, rows),
+                                   total_count=int(len(rows)) if total_count else None)
+
+        codes, column = self._text_codes[group_by.prop]
+        values = {code: value for value, code in codes.items()}
+        # Rows sorted by group code, split where the code changes
+        ordered = rows[np.argsort(column[rows], kind="stable")]
+        group_codes, starts = np.unique(column[ordered], return_index=True)
+        groups = [
+            AggregateGroup(
+                grouped_by=GroupedBy(prop=group_by.prop, value=values[int(code)]),
+                properties=self._number_metrics(metrics, group_rows),
+                total_count=int(len(group_rows)) if total_count else None,
+            )
+            for code, group_rows in zip(group_codes, np.split(ordered, starts[1:]))
+        ]
+        return AggregateGroupByReturn(groups=groups[:group_by.limit] if group_by.limit else groups)
+
+
+class _LocalQuery:
+    # Gives LocalHybridCollection the client's `collection.query.hybrid(...)` shape
+    def __init__(self, collection: LocalHybridCollection):
+        self._collection = collection
+
+    def hybrid(self, *args, **kwargs) -> LocalQueryReturn:
+        return self._collection.hybrid(*args, **kwargs)
+
+
+class _LocalAggregate:
+    # Gives LocalHybridCollection the client's `collection.aggregate.over_all(...)` shape
+    def __init__(self, collection: LocalHybridCollection):
+        self._collection = collection
+
+    def over_all(self, **kwargs) -> AggregateReturn | AggregateGroupByReturn:
+        return self._collection.aggregate_over_all(**kwargs)
+
+
+class _LocalAsyncQuery:
+    # Async `collection.query.hybrid(...)`; the search runs in a worker thread
+    # (numpy releases the GIL), plus an optional simulated network round trip
+    def __init__(self, collection: LocalHybridCollection, latency: float):
+        self._collection = collection
+        self._latency = latency
+
+    async def hybrid(self, *args, **kwargs) -> LocalQueryReturn:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return await asyncio.to_thread(self._collection.hybrid, *args, **kwargs)
+
+
+class _LocalAsyncAggregate:
+    # Async `collection.aggregate.over_all(...)`, run like _LocalAsyncQuery
+    def __init__(self, collection: LocalHybridCollection, latency: float):
+        self._collection = collection
+        self._latency = latency
+
+    async def over_all(self, **kwargs) -> AggregateReturn | AggregateGroupByReturn:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return await asyncio.to_thread(self._collection.aggregate_over_all, **kwargs)
+
+
+class _LocalAsyncCollection:
+    def __init__(self, collection: LocalHybridCollection, latency: float):
+        self.name = collection.name
+        self.query = _LocalAsyncQuery(collection, latency)
+        self.aggregate = _LocalAsyncAggregate(collection, latency)
+
+
+class _LocalCollections:
+    def __init__(self, collections: dict[str, LocalHybridCollection], latency: float):
+        self._collections = {name: _LocalAsyncCollection(col, latency) for name, col in collections.items()}
+
+    def get(self, name: str) -> _LocalAsyncCollection:
+        return self._collections[name]
+
+    async def exists(self, name: str) -> bool:
+        return name in self._collections
+
+
+class LocalClientPool:
+    """
+    Stands in for WeaviateClientPool in load tests: set it as
+    db_collection.db_pool and the async retrieval path (vector_db_client)
+    queries the local collections instead of a Weaviate server.
+    `size` caps concurrent borrowers like the real pool's connection count;
+    `latency` (seconds) is added to every hybrid query.
+    """
+    def __init__(self, collections: list[LocalHybridCollection], size: int = 4, latency: float = 0.0):
+        self.size = size
+        self.collections = _LocalCollections({col.name: col for col in collections}, latency)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def started(self) -> bool:
+        return True
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["LocalClientPool"]:
+        # Created on first use, inside the server's event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            yield self
@@ -1,10 +1,25 @@
-from weaviate_database.db_collection import AppWeaviateClient, WeaviateCollection
+from weaviate_database.db_collection import AppWeaviateClient, WeaviateCollection, EMBEDDING_MODEL
+from weaviate_database.embedding_cache import EMBEDDING_MODE, OllamaBatchEmbedder
 import data_process.parse_xlsx_sheet as pe
 import data_process.data_preprocessing as data
+from data_process.entity_vocabulary import EntityVocabulary
+
+def stream_stock_objects(vocab: EntityVocabulary):
+    """
+    Lazily parses, preprocesses and yields stock objects chunk by chunk, so the
+    first batches reach Weaviate while later workbooks are still being parsed.
+    The entity vocabulary is collected on the way.
+    """
+    stock_chunks = pe.iter_stock_info_from_xlsx(pe.STOCK_INFO_PATH)
+    for processed_chunk in data.iter_preprocess_stock(stock_chunks):
+        vocab.update(processed_chunk)
+        yield from processed_chunk
 
 def db_test():
     db_config  = {"host": "127.0.0.1", "port": 80, "grpc_port": 50051}
     COLLECTION_NAME = "StocksInfo"
+    # EMBEDDING_MODE=client embeds objects here in batches and caches the vectors on disk
+    embedder = OllamaBatchEmbedder(model=EMBEDDING_MODEL) if EMBEDDING_MODE == "client" else None
     with AppWeaviateClient(**db_config) as cl:
         col = WeaviateCollection(client=cl)
         while True:
@@ -16,8 +31,10 @@ def db_test():
             print("5 - Get Collection config")
             print(f"6 - Fetch objects from collection:")
             print("7 - Exit the program")
+            print("8 - Incremental sync of collection with xlsx files")
+            print("9 - Migrate collection to the current schema version")
             print("---------------------------------------------------")
-            action = input("Enter Action (1/2/3/4/5/6/7): ").strip()
+            action = input("Enter Action (1/2/3/4/5/6/7/8/9): ").strip()
             
             if action == "1":
                 COLLECTION_NAME = input("Enter collection name (default 'StocksInfo'): ").strip() or "StocksInfo"
@@ -25,9 +42,9 @@ def db_test():
                     print(f"Collection '{COLLECTION_NAME}' already exists. Please choose a different name or delete the existing collection first.")
                     continue
                 col.create_collection(COLLECTION_NAME)
-                stocks_objects = pe.get_stock_info_from_xlsx(pe.STOCK_INFO_PATH)
-                processed_data = data.data_preprocess_stock(stocks_objects)
-                col.insert_objects_into_collection(COLLECTION_NAME, stocks_objects=processed_data)
+                vocab = EntityVocabulary()
+                col.insert_objects_into_collection(COLLECTION_NAME, stocks_objects=stream_stock_objects(vocab), embedder=embedder)
+                vocab.save()
                 print(f"Collection '{COLLECTION_NAME}' created and objects inserted.")
 
             elif action == "2":
@@ -70,6 +87,26 @@ def db_test():
             elif action == "7":
                 print("Exiting the program.")
                 break
+            elif action == "8":
+                COLLECTION_NAME = input("Enter collection name (default 'StocksInfo'): ").strip() or "StocksInfo"
+                if COLLECTION_NAME not in col.list_collection:
+                    print(f"Collection '{COLLECTION_NAME}' does not exist. Use action 1 to create it first.")
+                    continue
+                # Deleting objects missing from the xlsx files is opt-in (an empty folder would look like deleted data)
+                delete_missing = input("Delete objects no longer in the xlsx files? (y/N): ").strip().lower() == "y"
+                vocab = EntityVocabulary()
+                stats = col.sync_objects_into_collection(COLLECTION_NAME, stocks_objects=stream_stock_objects(vocab),
+                                                         delete_missing=delete_missing, embedder=embedder)
+                vocab.save()
+                print(f"Collection '{COLLECTION_NAME}' synced: {stats}")
+            elif action == "9":
+                COLLECTION_NAME = input("Enter collection name to migrate (default 'StocksInfo'): ").strip() or "StocksInfo"
+                if COLLECTION_NAME not in col.list_collection:
+                    print(f"Collection '{COLLECTION_NAME}' does not exist.")
+                    continue
+                swap = input("Replace it by an alias to the migrated collection once counts match? (y/N): ").strip().lower() == "y"
+                stats = col.migrate_collection(COLLECTION_NAME, swap_alias=swap)
+                print(f"Collection '{COLLECTION_NAME}' migrated: {stats}")
             else:
                 print("Invalid action. Please enter 'create', 'delete', or 'retrieve'.")
 
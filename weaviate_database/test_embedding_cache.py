@@ -0,0 +1,55 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from weaviate_database.embedding_cache import EmbeddingCache, OllamaBatchEmbedder
+
+# Client-side embedding against a minimal Ollama /api/embed server on localhost.
+# p3 -m pytest weaviate_database/test_embedding_cache.py
+
+
+class _EmbedHandler(BaseHTTPRequestHandler):
+    # Deterministic 4-dimensional vectors: text length, vowel count, and the call number.
+    # Keep-alive like Ollama, so a client reuses pooled connections across calls
+    protocol_version = "HTTP/1.1"
+    calls = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        _EmbedHandler.calls += 1
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        vectors = [[float(len(text)), float(sum(c in "aeiou" for c in text)), 1.0, float(_EmbedHandler.calls)]
+                   for text in texts]
+        payload = json.dumps({"model": body["model"], "embeddings": vectors}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_embed_can_be_called_repeatedly(tmp_path):
+    # Ingestion calls embed() once per chunk, each in a new event loop
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        embedder = OllamaBatchEmbedder(
+            model="mock-embed", base_url=f"http://127.0.0.1:{server.server_port}", batch_size=2,
+            cache=EmbeddingCache("mock-embed", cache_dir=str(tmp_path)),
+        )
+        first = embedder.embed(["hdfc bank", "helios pms", "july 2025"])
+        second = embedder.embed(["icici bank", "hdfc bank"])
+        third = embedder.embed(["sun pharma"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [len(vector) for vector in first + second + third] == [4] * 6
+    assert first[0][:2] == [9.0, 1.0]
+    # "hdfc bank" comes from the cache on the second call
+    assert second[1] == first[0]
+    assert third[0][:2] == [10.0, 3.0]